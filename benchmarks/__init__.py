@@ -0,0 +1,4 @@
+"""
+    Performance measurement tools for the redactor. Run from the repository root, e.g.
+    `python -m benchmarks.compare_tiers`.
+"""
@@ -0,0 +1,140 @@
+"""
+    Compare the NER model tiers on a corpus: docs/sec and entity recall per tier.
+
+    Recall is measured against the entities of a reference tier (the most accurate one by default),
+    restricted to the labels the detectors act on. Usage:
+
+        $ pipenv run python -m benchmarks.compare_tiers --corpus text.txt text2.txt --stats tiers.json
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+from redactor import Redactor, MODEL_TIERS, DEFAULT_MODEL_TIER
+
+# Entity labels used by redact_names, redact_dates and redact_addresses
+DETECTOR_LABELS = {'PERSON', 'DATE', 'GPE', 'LOC', 'FAC'}
+
+
+def extract_entities(redactor: Redactor, texts: List[str]) -> List[Set[Tuple[int, int, str]]]:
+    """
+        Run a tier's NER pipeline over the texts.
+        Args:
+            redactor: Redactor configured with the tier to run.
+            texts: The corpus documents.
+        Returns:
+            List: For each document, the set of (start, end, label) entities the detectors would use.
+    """
+    return [
+        {(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents if ent.label_ in DETECTOR_LABELS}
+        for doc in redactor.nlp.pipe(texts)
+    ]
+
+
+def entity_recall(found: List[Set[tuple]], reference: List[Set[tuple]]) -> Dict[str, float]:
+    """
+        Recall of the found entities against the reference entities, overall and per label.
+        Args:
+            found: Entities found per document.
+            reference: Reference entities per document.
+        Returns:
+            Dict: Recall per label plus "overall"; labels absent from the reference are omitted.
+    """
+    hits: Dict[str, int] = {}
+    totals: Dict[str, int] = {}
+    for doc_found, doc_reference in zip(found, reference):
+        for entity in doc_reference:
+            label = entity[2]
+            totals[label] = totals.get(label, 0) + 1
+            hits[label] = hits.get(label, 0) + (entity in doc_found)
+
+    recall = {label: hits[label] / totals[label] for label in sorted(totals)}
+    recall['overall'] = sum(hits.values()) / sum(totals.values()) if totals else 1.0
+    return recall
+
+
+def benchmark_tier(tier: str, texts: List[str], repeat: int, model: str = None) -> Tuple[dict, List[Set[tuple]]]:
+    """
+        Measure one tier's model load time and NER throughput.
+        Args:
+            tier: The model tier to measure.
+            texts: The corpus documents.
+            repeat: Number of timed passes over the corpus.
+            model: Optional spaCy package name or path overriding the tier's pipeline.
+        Returns:
+            Tuple: The tier's measurements and the entities it found per document.
+    """
+    redactor = Redactor(model_tier=tier, model=model)
+
+    start = time.perf_counter()
+    entities = extract_entities(redactor, texts)  # also loads and warms up the model
+    load_and_first_pass = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract_entities(redactor, texts)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "tier": tier,
+        "model": redactor.model_name,
+        "first_pass_seconds": round(load_and_first_pass, 3),
+        "docs_per_second": round(len(texts) * repeat / elapsed, 2) if elapsed else None,
+        "chars_per_second": round(sum(map(len, texts)) * repeat / elapsed, 1) if elapsed else None,
+        "entities": sum(map(len, entities)),
+    }, entities
+
+
+def main():
+    """
+        Parses command-line arguments, benchmarks each tier and prints or writes the comparison.
+    """
+    parser = argparse.ArgumentParser(description='Compare NER model tiers for speed and entity recall.')
+    parser.add_argument('--tiers', nargs='+', choices=list(MODEL_TIERS), default=list(MODEL_TIERS),
+                        help='Tiers to compare (default: all)')
+    parser.add_argument('--reference', choices=list(MODEL_TIERS), default=DEFAULT_MODEL_TIER,
+                        help=f'Tier whose entities count as ground truth (default: {DEFAULT_MODEL_TIER})')
+    parser.add_argument('--corpus', nargs='+', default=['text.txt', 'text2.txt'],
+                        help='Corpus files (default: the bundled samples)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the corpus (default: 3)')
+    parser.add_argument('--stats', help='Write the results as JSON to this file (default: stdout)')
+    args = parser.parse_args()
+
+    texts = []
+    for path in args.corpus:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+
+    tiers = list(dict.fromkeys([args.reference] + args.tiers))
+    results = {}
+    entities = {}
+    for tier in tiers:
+        try:
+            results[tier], entities[tier] = benchmark_tier(tier, texts, args.repeat)
+        except Exception as e:
+            logging.error(f"Error benchmarking tier {tier}: {str(e)}")
+
+    if args.reference not in entities:
+        logging.error(f"Reference tier {args.reference} could not be run")
+        sys.exit(1)
+    for tier in results:
+        results[tier]["recall"] = entity_recall(entities[tier], entities[args.reference])
+
+    report = {
+        "reference": args.reference,
+        "documents": len(texts),
+        "tiers": [results[tier] for tier in args.tiers if tier in results],
+    }
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
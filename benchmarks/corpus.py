@@ -0,0 +1,167 @@
+"""
+    Deterministic generator of synthetic documents seeded with PII: names, emails, phone numbers,
+    dates, addresses and concept sentences. The same seed always yields the same corpus. Usage:
+
+        $ pipenv run python -m benchmarks.corpus --docs 100 --size 5000 --density 0.3 --output synthetic/
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Charles', 'Karen', 'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Sean', 'Cherie']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Taylor', 'Thomas', 'Moore', 'Jackson',
+              'Martin', 'Lee', 'Thompson', 'White', 'Harris', 'Clark', 'Lewis', 'Walker', 'Crane', 'Leon']
+DOMAINS = ['example.com', 'enron.com', 'mail.example.org', 'corp.example.net']
+STREETS = ['Main', 'Oak', 'Pine', 'Maple', 'Cedar', 'Elm', 'Washington', 'Lake', 'Hill', 'Park']
+STREET_TYPES = ['Street', 'St', 'Avenue', 'Ave', 'Road', 'Boulevard', 'Lane', 'Drive']
+CITIES = [('New York', 'NY'), ('Houston', 'TX'), ('Gainesville', 'FL'), ('Chicago', 'IL'),
+          ('Portland', 'OR'), ('Denver', 'CO'), ('Boston', 'MA'), ('Seattle', 'WA')]
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December']
+CONCEPT_SENTENCES = {
+    'wine': ['We opened a bottle of Merlot from the vineyard last night.',
+             'The sommelier recommended a dry white wine with the fish.',
+             'Their cellar holds a few cases of vintage Bordeaux.'],
+    'kids': ['The children have soccer practice after school on Tuesdays.',
+             'Our daughter starts kindergarten in the fall.',
+             'The kids will stay with their grandparents this weekend.'],
+}
+FILLER = ['Please review the attached report before the meeting.',
+          'Let me know if you have any questions about the proposal.',
+          'The quarterly numbers look better than we expected.',
+          'I will forward the contract to legal for another review.',
+          'Thanks again for your help with the presentation.',
+          'We should revisit the pricing model next quarter.',
+          'The system migration is scheduled to finish soon.',
+          'Could you send me the latest version of the spreadsheet?',
+          'The vendor confirmed the shipment is on its way.',
+          'Everyone agreed the new process saves a lot of time.']
+
+# Kinds of seeded PII, used as labels of the ground truth spans
+CATEGORIES = ('names', 'emails', 'phones', 'dates', 'addresses', 'concepts')
+
+
+class SyntheticDocument:
+    def __init__(self, text: str, entities: List[Tuple[int, int, str]]):
+        """
+            A generated document.
+            Args:
+                text: The document text.
+                entities: Ground truth (start, end, category) spans of the seeded PII.
+        """
+        self.text = text
+        self.entities = entities
+
+
+def _pii(rng: random.Random, category: str, concepts: List[str]) -> Tuple[str, str, str]:
+    """
+        Generate one PII value wrapped in a sentence.
+        Returns:
+            Tuple: Text before the value, the value, and text after it.
+    """
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    if category == 'names':
+        return rng.choice(['I spoke with ', 'Please ask ', 'A note from ']), f"{first} {last}", \
+            rng.choice([' about the schedule.', ' to confirm.', ' this morning.'])
+    if category == 'emails':
+        return 'You can reach them at ', f"{first.lower()}.{last.lower()}@{rng.choice(DOMAINS)}", '.'
+    if category == 'phones':
+        area, prefix, line = rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)
+        number = rng.choice([f"{area}-{prefix}-{line:04d}", f"({area}) {prefix}-{line:04d}",
+                             f"+1 {area}.{prefix}.{line:04d}"])
+        return 'Call me at ', number, ' if anything changes.'
+    if category == 'dates':
+        year, month, day = rng.randint(1995, 2030), rng.randint(1, 12), rng.randint(1, 28)
+        date = rng.choice([f"{year}-{month:02d}-{day:02d}", f"{month:02d}/{day:02d}/{year}",
+                           f"{MONTHS[month - 1]} {day}, {year}", f"{day} {MONTHS[month - 1]} {year}"])
+        return 'The deadline is ', date, '.'
+    if category == 'addresses':
+        city, state = rng.choice(CITIES)
+        address = (f"{rng.randint(1, 9999)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}, "
+                   f"{city}, {state} {rng.randint(10000, 99999)}")
+        return 'Send the package to ', address, '.'
+    concept = rng.choice(concepts)
+    return '', rng.choice(CONCEPT_SENTENCES.get(concept, [f"This line is about {concept}."])), ''
+
+
+def generate_document(rng: random.Random, size: int, density: float,
+                      concepts: List[str] = ('wine',)) -> SyntheticDocument:
+    """
+        Generate one document of roughly size characters.
+        Args:
+            rng: Random generator; the document depends only on its state.
+            size: Approximate document length in characters.
+            density: Probability that a sentence carries a PII value.
+            concepts: Concepts whose sentences may be seeded (see CONCEPT_SENTENCES).
+        Returns:
+            SyntheticDocument: The document and its ground truth spans.
+    """
+    pieces = []
+    entities = []
+    length = 0
+    while length < size:
+        if rng.random() < density:
+            category = rng.choice(CATEGORIES)
+            before, value, after = _pii(rng, category, list(concepts))
+            start = length + len(before)
+            entities.append((start, start + len(value), category))
+            sentence = before + value + after
+        else:
+            sentence = rng.choice(FILLER)
+        # Roughly one paragraph break every five sentences, like the sample emails
+        sentence += '\n\n' if rng.random() < 0.2 else '\n'
+        pieces.append(sentence)
+        length += len(sentence)
+    return SyntheticDocument(''.join(pieces), entities)
+
+
+def generate_corpus(docs: int, size: int, density: float, seed: int = 0,
+                    concepts: List[str] = ('wine',)) -> List[SyntheticDocument]:
+    """
+        Generate a deterministic corpus.
+        Args:
+            docs: Number of documents.
+            size: Approximate length of each document in characters.
+            density: Probability that a sentence carries a PII value.
+            seed: Random seed.
+            concepts: Concepts whose sentences may be seeded.
+        Returns:
+            List: The generated documents.
+    """
+    rng = random.Random(seed)
+    return [generate_document(rng, size, density, concepts) for _ in range(docs)]
+
+
+def main():
+    """
+        Parses command-line arguments and writes a synthetic corpus as .txt files plus ground truth JSON.
+    """
+    parser = argparse.ArgumentParser(description='Generate a synthetic PII corpus.')
+    parser.add_argument('--docs', type=int, default=100, help='Number of documents (default: 100)')
+    parser.add_argument('--size', type=int, default=5000, help='Characters per document (default: 5000)')
+    parser.add_argument('--density', type=float, default=0.3, help='Fraction of sentences with PII (default: 0.3)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--concept', action='append', help='Concepts to seed (default: wine)')
+    parser.add_argument('--output', required=True, help='Output directory')
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    truth = {}
+    for i, document in enumerate(generate_corpus(args.docs, args.size, args.density, args.seed,
+                                                 args.concept or ['wine'])):
+        name = f"doc{i:06d}.txt"
+        with open(output_dir / name, 'w', encoding='utf-8') as f:
+            f.write(document.text)
+        truth[name] = document.entities
+    with open(output_dir / 'entities.json', 'w') as f:
+        json.dump(truth, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+    Benchmark harness: throughput, latency and memory of each detector and of end-to-end redaction
+    on a synthetic corpus, written as JSON that can be diffed between releases. Usage:
+
+        $ pipenv run python -m benchmarks.harness --docs 200 --size 5000 --density 0.3 --output bench.json
+
+    Per-detector stages call the detector exactly as redact_content() would, given an already parsed
+    doc; the "nlp" stage times that parse. The "end_to_end" stage times redact_content() including the
+    parse, and also reports which fraction of the seeded PII ended up redacted.
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.corpus import generate_corpus, SyntheticDocument
+from redactor import Redactor, setup_argparse, package_version
+
+
+def peak_rss_mb() -> float:
+    """
+        Returns:
+            float: Peak resident set size of this process so far, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(latencies: List[float], total_chars: int) -> dict:
+    """
+        Summarize per-document latencies of one stage.
+        Args:
+            latencies: Seconds spent per document.
+            total_chars: Characters processed over all documents.
+        Returns:
+            dict: Throughput and latency percentiles.
+    """
+    ordered = sorted(latencies)
+    elapsed = sum(ordered)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {
+        "seconds": round(elapsed, 4),
+        "docs_per_second": round(len(ordered) / elapsed, 2) if elapsed else None,
+        "mb_per_second": round(total_chars / (1024 * 1024) / elapsed, 3) if elapsed else None,
+        "latency_ms_p50": percentile(0.5),
+        "latency_ms_p99": percentile(0.99),
+    }
+
+
+def time_stage(documents: List[str], run: Callable[[int, str], object]) -> dict:
+    """
+        Time one stage over every document.
+        Args:
+            documents: Document texts.
+            run: Called with the index and text of each document.
+        Returns:
+            dict: The stage summary, plus how much the process peak RSS grew during it.
+    """
+    rss_before = peak_rss_mb()
+    latencies = []
+    for i, text in enumerate(documents):
+        start = time.perf_counter()
+        run(i, text)
+        latencies.append(time.perf_counter() - start)
+    summary = summarize(latencies, sum(map(len, documents)))
+    summary["peak_rss_growth_mb"] = round(peak_rss_mb() - rss_before, 1)
+    return summary
+
+
+# Seeded categories and the redaction flag expected to remove them
+CATEGORY_FLAGS = {
+    'names': 'names',
+    'emails': 'names',
+    'phones': 'phones',
+    'dates': 'dates',
+    'addresses': 'address',
+    'concepts': 'concept',
+}
+
+
+def seeded_recall(corpus: List[SyntheticDocument], redacted: List[str],
+                  flags: argparse.Namespace) -> Dict[str, float]:
+    """
+        Fraction of seeded PII values, per requested category, that were completely redacted.
+        Args:
+            corpus: The generated documents with ground truth.
+            redacted: The redacted text of each document.
+            flags: Redaction flags; categories whose detector was not requested are skipped.
+        Returns:
+            Dict: Recall per seeded category.
+    """
+    found: Dict[str, int] = {}
+    totals: Dict[str, int] = {}
+    for document, text in zip(corpus, redacted):
+        for start, end, category in document.entities:
+            if not getattr(flags, CATEGORY_FLAGS[category]):
+                continue
+            totals[category] = totals.get(category, 0) + 1
+            found[category] = found.get(category, 0) + all(c == '█' for c in text[start:end])
+    return {category: round(found[category] / totals[category], 4) for category in sorted(totals)}
+
+
+def run_benchmark(corpus: List[SyntheticDocument], flags: argparse.Namespace) -> dict:
+    """
+        Benchmark every requested detector and end-to-end redaction on the corpus.
+        Args:
+            corpus: The documents to redact.
+            flags: Redaction flags as parsed by setup_argparse().
+        Returns:
+            dict: Results per stage.
+    """
+    texts = [document.text for document in corpus]
+    redactor = Redactor.from_args(flags)
+    results = {}
+
+    # Load models outside the timed stages
+    start = time.perf_counter()
+    if redactor.needs_nlp(flags):
+        redactor.nlp(texts[0])
+    if flags.concept:
+        redactor.redact_concepts(texts[0], flags.concept)
+    results["model_load_seconds"] = round(time.perf_counter() - start, 3)
+
+    docs = [None] * len(texts)
+    if redactor.needs_nlp(flags):
+        def parse(i, text):
+            docs[i] = redactor.nlp(text)
+        results["nlp"] = time_stage(texts, parse)
+
+    detectors = {
+        "redact_names": (flags.names, lambda i, text: redactor.redact_names(docs[i], text)),
+        "redact_dates": (flags.dates, lambda i, text: redactor.redact_dates(docs[i], text)),
+        "redact_phones": (flags.phones, lambda i, text: redactor.redact_phones(text)),
+        "redact_addresses": (flags.address, lambda i, text: redactor.redact_addresses(docs[i], text)),
+        "redact_concepts": (flags.concept, lambda i, text: redactor.redact_concepts(text, flags.concept)),
+    }
+    for name, (enabled, run) in detectors.items():
+        if enabled:
+            results[name] = time_stage(texts, run)
+    docs.clear()
+
+    redacted = [None] * len(texts)
+
+    def redact(i, text):
+        redacted[i] = redactor.redact_content(text, flags)
+    results["end_to_end"] = time_stage(texts, redact)
+    results["end_to_end"]["seeded_recall"] = seeded_recall(corpus, redacted, flags)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def main():
+    """
+        Parses command-line arguments, generates the corpus, runs the benchmark and writes JSON results.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the redaction detectors on a synthetic corpus.')
+    parser.add_argument('--docs', type=int, default=100, help='Number of documents (default: 100)')
+    parser.add_argument('--size', type=int, default=5000, help='Characters per document (default: 5000)')
+    parser.add_argument('--density', type=float, default=0.3, help='Fraction of sentences with PII (default: 0.3)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--output', help='Write the results as JSON to this file (default: stdout)')
+    parser.add_argument('redactor_args', nargs=argparse.REMAINDER,
+                        help='Redactor options after "--", e.g. -- --names --phones --model-tier fast '
+                             '(default: all detectors with --concept wine)')
+    args = parser.parse_args()
+
+    redactor_args = [arg for arg in args.redactor_args if arg != '--'] or \
+        ['--names', '--dates', '--phones', '--address', '--concept', 'wine']
+    flags = setup_argparse().parse_args(redactor_args)
+    corpus = generate_corpus(args.docs, args.size, args.density, args.seed, flags.concept or ['wine'])
+
+    report = {
+        "config": {
+            "docs": args.docs,
+            "size": args.size,
+            "density": args.density,
+            "seed": args.seed,
+            "redactor_args": redactor_args,
+            "corpus_mb": round(sum(len(document.text) for document in corpus) / (1024 * 1024), 3),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "spacy": package_version('spacy'),
+            "sentence_transformers": package_version('sentence-transformers'),
+        },
+        "results": run_benchmark(corpus, flags),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,444 +1,4387 @@
-import spacy
+from __future__ import annotations
+
 import re
 from pathlib import Path
 import argparse
+import bisect
+import bz2
+import csv
+import gc
 import glob
+import gzip
+import hashlib
+import io
 import json
-from typing import List, Set, Dict
+import os
+from contextlib import ExitStack, contextmanager
+from stat import S_ISSOCK
+from typing import List, Set, Dict, Iterable, Iterator, Tuple, TYPE_CHECKING
+import itertools
 import logging
-import pyap
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+import lzma
+import mmap
+import multiprocessing
+import multiprocessing.util
+import queue
+import socketserver
 import sys
+import tarfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+# spaCy, pyap, numpy and sentence-transformers are imported where they are first used,
+# so runs that only need the regex detectors never pay for loading them
+if TYPE_CHECKING:
+    import numpy as np
+    import spacy
 
-class RedactionStats:
-    def __init__(self):
+
+# spaCy pipelines behind each --model-tier, from fastest to most accurate
+MODEL_TIERS = {
+    "fast": "en_core_web_sm",
+    "balanced": "en_core_web_md",
+    "accurate": "en_core_web_trf",
+}
+DEFAULT_MODEL_TIER = "accurate"
+SENTENCE_MODEL = 'all-MiniLM-L6-v2'
+# Minimum cosine similarity for a line to semantically match a concept
+CONCEPT_SIMILARITY_THRESHOLD = 0.45
+# Concept stores (--build-concept-store): vocabularies of at least CONCEPT_IVF_MIN_CONCEPTS concepts are
+# clustered so each line is only compared with the concepts of its CONCEPT_NPROBE nearest clusters
+CONCEPT_STORE_FORMAT = 1
+CONCEPT_IVF_MIN_CONCEPTS = 1024
+CONCEPT_NPROBE = 8
+# Countries whose address formats pyap looks for by default
+ADDRESS_COUNTRIES = ('US', 'CA', 'GB')
+# Bump when a change to the detectors makes previously cached spans stale
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_MAX_MB = 1024
+# --serve defaults: requests arriving within SERVE_BATCH_WAIT_MS of each other share one nlp.pipe call
+SERVE_PORT = 8765
+SERVE_BATCH_SIZE = 32
+SERVE_BATCH_WAIT_MS = 5
+SERVE_MAX_REQUEST_BYTES = 64 * 1024 * 1024
+# Per-request options of --serve, a subset of setup_argparse()
+REQUEST_OPTIONS = ('names', 'dates', 'phones', 'address', 'concept')
+# Pipeline components no detector uses; only the NER (and the embedding layer it listens to) is needed
+UNUSED_SPACY_COMPONENTS = ["tagger", "parser", "senter", "attribute_ruler", "lemmatizer"]
+# Number of nlp.pipe batches read ahead and sorted into length buckets at a time
+BATCH_SORT_WINDOW = 8
+# Default window and overlap sizes, in lines, for --stream mode
+STREAM_WINDOW_LINES = 200
+STREAM_OVERLAP_LINES = 5
+
+# Bytes of a memory-mapped input scanned before its pages are released from the resident set
+MAPPED_RELEASE_BYTES = 64 * 1024 * 1024
+
+# Files read ahead of, and outputs queued behind, the redaction thread (--prefetch)
+PREFETCH_FILES = 4
+# Records whose fields are redacted together, sharing NLP and sentence encoder calls (--records)
+RECORD_FORMATS = ('jsonl', 'csv')
+RECORD_BATCH_SIZE = 256
+
+# Gazetteer categories with the redaction flag and RedactionStats counter they belong to
+GAZETTEER_CATEGORIES = {'names': ('names', 'names_count'), 'addresses': ('address', 'addresses_count')}
+# Shortest entity the gazetteer learns; shorter ones match too much unrelated text
+GAZETTEER_MIN_LENGTH = 3
+# The automaton is rebuilt once the gazetteer has grown by this fraction, so learning costs amortized linear time
+GAZETTEER_REBUILD_GROWTH = 0.25
+
+# Paragraphs remembered by --paragraph-memo, and the shortest paragraph worth remembering
+PARAGRAPH_MEMO_SIZE = 100000
+PARAGRAPH_MEMO_MIN_CHARS = 32
+# Reply quote markers and indentation at the start of a line, ignored when memoizing paragraphs
+QUOTE_PREFIX = re.compile(r'(?:[ \t]*>)*[ \t]*')
+
+# Compressed formats read and written transparently, by file extension
+COMPRESSORS = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+TAR_SUFFIXES = ('.tar', '.tgz', '.tbz2', '.txz', '.tar.gz', '.tar.bz2', '.tar.xz')
+# Separates a tar archive from a member in the paths of documents read from archives
+TAR_MEMBER_SEPARATOR = '::'
+
+# Tasks queued ahead per --workers process, so a huge input tree is never listed in memory up front
+WORKER_QUEUED_TASKS = 4
+
+
+class RedactionSpans:
+    def __init__(self, spans: Iterable[tuple] = ()):
         """
-            Initialize RedactionStats
+            Collection of (start, end) character spans to redact. Detectors append spans in any
+            order; overlapping and touching spans are merged into their union on demand.
+            Args:
+                spans: Initial spans.
         """
-        self.names_count = 0
-        self.dates_count = 0
-        self.phones_count = 0
-        self.addresses_count = 0
-        self.concepts: Dict[str, int] = {}
-        self.files_processed = 0
-        self.total_words_redacted = 0
+        self._spans: List[tuple] = []
+        self._merged = False
+        self.update(spans)
 
-    def to_dict(self) -> dict:
+    def add(self, start: int, end: int):
         """
-            Convert the redaction statistics to a dictionary suitable for JSON output.
-            Returns:
-                dict: redaction statistics dictionary.
+            Add one span.
+            Args:
+                start: Start offset (inclusive).
+                end: End offset (exclusive).
         """
-        self.total_words_redacted = self.names_count + self.dates_count + self.phones_count + self.addresses_count + sum(self.concepts.values())
-        return {
-            "files_processed": self.files_processed,
-            "total_words_redacted": self.total_words_redacted,
-            "names_redacted": self.names_count,
-            "dates_redacted": self.dates_count,
-            "phones_redacted": self.phones_count,
-            "addresses_redacted": self.addresses_count,
-            "concepts_redacted": self.concepts
-        }
+        if start < end:
+            self._spans.append((start, end))
+            self._merged = False
 
+    def update(self, spans: Iterable[tuple]):
+        """
+            Add many spans, e.g. the result of a detector.
+            Args:
+                spans: (start, end) spans.
+        """
+        for start, end in spans:
+            self.add(start, end)
 
-class Redactor:
-    def __init__(self):
+    def merged(self) -> List[tuple]:
         """
-            Sets up the NLP model, compiles regex patterns, and initializes models for NER and sentence embeddings.
+            Merge the spans into a disjoint union, sorted by start.
+            Returns:
+                List: The merged spans.
         """
-        self.nlp = spacy.load("en_core_web_trf")
-        self.stats = RedactionStats()
+        if not self._merged:
+            merged = []
+            for start, end in sorted(self._spans):
+                if merged and start <= merged[-1][1]:
+                    if end > merged[-1][1]:
+                        merged[-1] = (merged[-1][0], end)
+                else:
+                    merged.append((start, end))
+            self._spans = merged
+            self._merged = True
+        return self._spans
 
-        try:
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            logging.error(f"Error loading sentence transformer: {str(e)}")
-            self.sentence_model = None
-
-        self.phone_pattern = re.compile(
-            r'\b(\+?\d{1,3})?[-.\s]?\(?(\d{1,4})\)?[-.\s]?(\d{2,5})([-.\s]?\d{2,4}){1,4}\b'
-        )
-        self.date_pattern = re.compile(
-            r'\b(?:(?:(\d{4})[-/.](\d{2})[-/.](\d{2}))|'                # Matches YYYY-MM-DD, YYYY/MM/DD, YYYY.MM.DD
-            r'(?:(\d{2})[-/.](\d{2})[-/.](\d{4}))|'                      # Matches DD-MM-YYYY, DD/MM/YYYY, DD.MM.YYYY
-            r'(?:(\d{2})[-/.](\d{2})[-/.](\d{2}))|'                      # Matches MM-DD-YY, MM/DD/YY
-            r'(?:(\d{4})年(\d{2})月(\d{2})日)|'                          # Matches YYYY年MM月DD日 (Japanese format)
-            r'(?:(\d{2})[-/.](\d{2})[-/.](\d{4}))|'                      # Matches MM-DD-YYYY, MM/DD/YYYY, MM.DD.YYYY
-            r'(?:(\d{1,2})(?:st|nd|rd|th)?\s'                            # Matches ordinal dates, e.g., "31st December 2024"
-            r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|'
-            r'Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s(\d{4}))|'
-            r'(?:(\d{4})\s'                                              # Matches formats like "2024, December 31"
-            r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|'
-            r'Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s(\d{1,2}))|'
-            r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|'
-            r'Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s(\d{4}))\b'  # Matches "Dec 2024" or "December 2024"
-        )
-        self.address_patterns = [
-            # Street addresses with numbers and common street types
-            re.compile(
-                r'\b\d+\s+[A-Za-z\s]+(?:Street|St\.?|Avenue|Ave\.?|Road|Rd\.?|Boulevard|Blvd\.?|'
-                r'Lane|Ln\.?|Drive|Dr\.?|Court|Ct\.?|Circle|Cir\.?|Trail|Trl\.?|Way|Place|Pl\.?|'
-                r'Terrace|Ter\.?|Plaza|Highway|Hwy\.?|Parkway|Pkwy\.?)'
-                r'(?:[,\s]+(?:Suite|Ste\.?|Floor|Fl\.?|Unit|Apt\.?|Apartment|Room|Rm\.?)?\s*'
-                r'[#]?\d*[A-Za-z]?)?\s*[,\s]*(?:[A-Za-z\s]+[,\s]+[A-Z]{2}\s*\d{5}(?:-\d{4})?)?',
-                re.IGNORECASE
-            ),
-            # PO Boxes
-            re.compile(r'\b(?:P\.?\s*O\.?\s*Box|PO\s*Box)\s+\d+', re.IGNORECASE),
-            # ZIP codes
-            re.compile(r'\b[A-Z]{2}\s*\d{5}(?:-\d{4})?\b'),
-            # Floor/Suite/Unit patterns
-            re.compile(r'\b(?:Suite|Ste\.?|Floor|Fl\.?|Unit|Apt\.?|Apartment|Room|Rm\.?)\s*[#]?\d+[A-Za-z]?\b', re.IGNORECASE),
-            # Building numbers with ordinal indicators
-            re.compile(r'\b\d+(?:st|nd|rd|th)\s+(?:Floor|Fl\.?)', re.IGNORECASE)
-        ]
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self.merged())
 
-        # Load Hugging Face NER model for additional entity recognition
-        # self.tokenizer = AutoTokenizer.from_pretrained("dslim/bert-base-NER")
-        # self.ner_model = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER")
-        # self.ner_pipeline = pipeline("ner", model=self.ner_model, tokenizer=self.tokenizer, aggregation_strategy="simple")
+    def __len__(self) -> int:
+        return len(self.merged())
 
-    def redact_text(self, text: str, redact_chars: str = '█') -> str:
+    def render(self, text: str, redact_chars: str = '█') -> str:
         """
-            Add redaction character
+            Build the redacted text in a single join pass over the merged spans.
             Args:
-                text: text for redaction
+                text: The original text.
                 redact_chars: Defaults to '█'.
             Returns:
                 str: The redacted text.
         """
-        return redact_chars * len(text)
+        pieces = []
+        last_end = 0
+        for start, end in self.merged():
+            pieces.append(text[last_end:start])
+            pieces.append(redact_chars * (end - start))
+            last_end = end
+        pieces.append(text[last_end:])
+        return ''.join(pieces)
 
-    def redact_email(self, email: str) -> str:
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+        Scale each row of a matrix to unit L2 norm, so dot products become cosine similarities.
+        Args:
+            matrix: A 2-D array of embeddings.
+        Returns:
+            np.ndarray: The row-normalized matrix; all-zero rows are left as zeros.
+    """
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def spherical_kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10,
+                     seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Cluster unit-length vectors by cosine similarity (deterministic for a given seed).
+        Args:
+            vectors: A (n, dim) matrix of unit-length rows.
+            clusters: Number of clusters, at most n.
+            iterations: Number of assignment/update rounds.
+            seed: Seed for choosing the initial centroids.
+        Returns:
+            Tuple: The (clusters, dim) unit-length centroids and the cluster of each vector.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        # Clusters that lost all their vectors keep their previous centroid
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums).astype(np.float32)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class ConceptIndex:
+    """
+        A concept vocabulary prepared for redact_concepts(): lowercased concepts for exact matching, and
+        unit-length embeddings (float32, or int8 with a scale per row) for finding the most similar concept
+        of each line. Large vocabularies are stored in clusters ("inverted lists") of similar concepts, so a
+        line is only compared with the clusters nearest to it. An index is either built in memory from the
+        sentence model, or saved to a directory with save() and memory-mapped back with load().
+    """
+    def __init__(self, concepts: List[str], embeddings: np.ndarray = None, scales: np.ndarray = None,
+                 ids: np.ndarray = None, centroids: np.ndarray = None, list_offsets: List[int] = None,
+                 nprobe: int = CONCEPT_NPROBE, fingerprint: str = None):
         """
-            Email redaction.
             Args:
-                email: input email.
-            Returns:
-                str: redacted email
+                concepts: The concepts, in the order exact matches are tried.
+                embeddings: (n, dim) unit-length concept embeddings, grouped by cluster; None if semantic
+                    matching is unavailable.
+                scales: For int8 embeddings, the scale of each row (float value = int8 value * scale / 127).
+                ids: Index into concepts of each embedding row; rows are in concept order if omitted.
+                centroids: (clusters, dim) cluster centroids; None compares every line with every concept.
+                list_offsets: Start row of each cluster, plus the total number of rows.
+                nprobe: Number of nearest clusters searched per line.
+                fingerprint: Identifies a saved index, for cache keys.
         """
-        if '@' not in email:
-            return email  # If it's not a valid email, return it unchanged
-
-        local_part, domain = email.split('@', 1)
-        # Redact each alphabetic character in the local part, while preserving numeric parts
-        redacted_local = ''.join('█' if c.isalpha() else c for c in local_part)
-        return f"{redacted_local}@{domain}"
+        self.concepts = list(concepts)
+        self.key = tuple(self.concepts)
+        self.lowered = [concept.lower() for concept in self.concepts]
+        # One pass of a single pattern tells whether any concept occurs in a line at all
+        self.exact_pattern = re.compile('|'.join(re.escape(concept) for concept in
+                                                 sorted(set(self.lowered), key=len, reverse=True)))
+        self.embeddings = embeddings
+        self.scales = scales
+        self.ids = ids
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+        self.fingerprint = fingerprint
 
-    def redact_names(self, doc: spacy.tokens.Doc, text: str) -> Set[tuple]:
+    @classmethod
+    def build(cls, concepts: List[str], sentence_model, quantize: bool = False,
+              batch_size: int = 256) -> 'ConceptIndex':
         """
-            Find and mark names for redaction.
+            Embed and, if the vocabulary is large, cluster the concepts.
             Args:
-                doc: The spaCy document containing the parsed text.
-                texr: The original text.
+                concepts: The concepts.
+                sentence_model: The sentence transformer that also embeds the lines.
+                quantize: Whether to store the embeddings as int8.
+                batch_size: Concepts encoded per batch.
             Returns:
-                Set: A set of tuples representing the spans (start, end) of names to be redacted.
+                ConceptIndex: The index.
         """
-        spans = set()
-        redacted_text = text
-        shift = 0
+        import numpy as np
 
-        # Redact person names identified by spaCy
-        for ent in doc.ents:
-            if ent.label_ == 'PERSON':
-                redacted_name = '█' * (ent.end_char - ent.start_char)
-                start, end = ent.start_char + shift, ent.end_char + shift
-                redacted_text = redacted_text[:start] + redacted_name + redacted_text[end:]
-                shift += len(redacted_name) - (ent.end_char - ent.start_char)
-                spans.add((start, start + len(redacted_name)))
-                self.stats.names_count += 1
+        embeddings = normalize_rows(sentence_model.encode(
+            concepts, batch_size=batch_size, convert_to_numpy=True)).astype(np.float32)
+        ids = np.arange(len(concepts))
+        centroids, list_offsets = None, [0, len(concepts)]
+        if len(concepts) >= CONCEPT_IVF_MIN_CONCEPTS:
+            centroids, assignment = spherical_kmeans(embeddings, int(np.sqrt(len(concepts))))
+            ids = np.argsort(assignment, kind='stable')
+            embeddings = embeddings[ids]
+            list_offsets = np.searchsorted(assignment[ids], np.arange(len(centroids) + 1)).tolist()
 
-        # Find and redact email addresses
-        email_pattern = re.compile(r'\b([a-zA-Z0-9._\'-]+)@([\w.-]+\.[a-zA-Z]{2,})\b')
-        for match in email_pattern.finditer(text):
-            original_email = match.group()
-            redacted_email = self.redact_email(original_email)
-            start, end = match.start() + shift, match.end() + shift
+        scales = None
+        if quantize:
+            scales = np.abs(embeddings).max(axis=1).astype(np.float32)
+            scales[scales == 0] = 1
+            embeddings = np.round(embeddings / scales[:, None] * 127).astype(np.int8)
+        return cls(concepts, embeddings, scales, ids, centroids, list_offsets)
 
-            # Only add to spans and increment count if the email was actually redacted
-            if original_email != redacted_email:
-                redacted_text = redacted_text[:start] + redacted_email + redacted_text[end:]
-                shift += len(redacted_email) - len(original_email)
-                spans.add((start, start + len(redacted_email)))
-                self.stats.names_count += 1
+    def save(self, directory: str):
+        """
+            Save the index to a directory: concepts.json plus .npy arrays that load() memory-maps.
+            Args:
+                directory: The directory, created if needed.
+        """
+        import numpy as np
 
-        return spans
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / 'embeddings.npy', self.embeddings)
+        np.save(path / 'ids.npy', self.ids)
+        if self.scales is not None:
+            np.save(path / 'scales.npy', self.scales)
+        if self.centroids is not None:
+            np.save(path / 'centroids.npy', self.centroids)
+        with open(path / 'concepts.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                "format": CONCEPT_STORE_FORMAT,
+                "sentence_model": SENTENCE_MODEL,
+                "dtype": str(self.embeddings.dtype),
+                "list_offsets": self.list_offsets,
+                "nprobe": self.nprobe,
+                "concepts": self.concepts,
+            }, f, indent=2)
 
-    def redact_dates(self, doc: spacy.tokens.Doc, text: str) -> Set[tuple]:
+    @classmethod
+    def load(cls, directory: str) -> 'ConceptIndex':
         """
-            Redact dates using regex and spaCy NER.
+            Load an index saved by save(), memory-mapping the embeddings.
             Args:
-                doc: The spaCy document containing the parsed text.
-                text: The original text.
+                directory: The directory.
             Returns:
-                Set: A set of tuples representing the spans (start, end) of dates to be redacted.
+                ConceptIndex: The index.
+            Raises:
+                ValueError: If the store has an unknown format or was built with another sentence model.
         """
-        spans = set()
-
-        # Redact dates identified by spaCy
-        for ent in doc.ents:
-            if ent.label_ == 'DATE':
-                spans.add((ent.start_char, ent.end_char))
-                self.stats.dates_count += 1
-
-        # Redact dates using regex patterns
-        for match in self.date_pattern.finditer(text):
-            spans.add((match.start(), match.end()))
-            self.stats.dates_count += 1
+        import numpy as np
 
-        return spans
+        path = Path(directory)
+        raw = (path / 'concepts.json').read_bytes()
+        meta = json.loads(raw)
+        if meta.get("format") != CONCEPT_STORE_FORMAT:
+            raise ValueError(f"Unsupported concept store format in {directory}: {meta.get('format')}")
+        if meta.get("sentence_model") != SENTENCE_MODEL:
+            raise ValueError(f"Concept store {directory} was built with {meta.get('sentence_model')}, "
+                             f"not {SENTENCE_MODEL}")
+        scales = np.load(path / 'scales.npy') if (path / 'scales.npy').exists() else None
+        centroids = np.load(path / 'centroids.npy') if (path / 'centroids.npy').exists() else None
+        return cls(meta["concepts"], np.load(path / 'embeddings.npy', mmap_mode='r'), scales,
+                   np.load(path / 'ids.npy', mmap_mode='r'), centroids, meta["list_offsets"], meta["nprobe"],
+                   hashlib.sha256(raw).hexdigest())
 
-    def redact_phones(self, text: str) -> Set[tuple]:
+    def exact_match(self, line_lower: str) -> str:
         """
-            Redact phone numbers using regex.
+            Find the first concept (in vocabulary order) contained in a lowercased line.
             Args:
-                text: The original text.
+                line_lower: The lowercased line.
             Returns:
-                Set: A set of tuples representing the spans (start, end) of phone numbers to be redacted.
+                str: The concept, or None.
         """
-        spans = set()
-        for match in self.phone_pattern.finditer(text):
-            spans.add((match.start(), match.end()))
-            self.stats.phones_count += 1
-        return spans
+        if not self.concepts or not self.exact_pattern.search(line_lower):
+            return None
+        return next(concept for concept, lowered in zip(self.concepts, self.lowered) if lowered in line_lower)
+
+    def _similarities(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        block = queries @ self.embeddings[start:end].T.astype(queries.dtype)
+        if self.scales is not None:
+            block *= self.scales[start:end] / 127
+        return block
 
-    def redact_addresses(self, doc: spacy.tokens.Doc, text: str) -> Set[tuple]:
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-            Find and mark addresses for redaction using enhanced patterns, spaCy NER, and pyap2.
+            Find the most similar concept of each query.
             Args:
-                doc: The spaCy document containing the parsed text.
-                text: The original text.
+                queries: A (m, dim) matrix of unit-length line embeddings.
             Returns:
-                Set: A set of tuples representing the spans (start, end) of addresses to be redacted.
+                Tuple: The best cosine similarity of each query, and the index into concepts of that concept.
         """
-        spans = set()
+        import numpy as np
 
-        # Use enhanced regex patterns for address detection
-        for pattern in self.address_patterns:
-            for match in pattern.finditer(text):
-                # Get surrounding context
-                start = max(0, match.start() - 30)
-                end = min(len(text), match.end() + 30)
-                context = text[start:end]
+        queries = np.asarray(queries, dtype=np.float32)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        best_rows = np.zeros(len(queries), dtype=np.int64)
+        lists = len(self.list_offsets) - 1
+        if self.centroids is not None:
+            nprobe = min(self.nprobe, lists)
+            probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
 
-                # If it looks like a complete address, add it
-                if any(indicator in context.lower() for indicator in ['street', 'st', 'ave', 'road', 'floor', 'suite']):
-                    spans.add((match.start(), match.end()))
-                    self.stats.addresses_count += 1
+        # Score each cluster against all queries probing it at once
+        for cluster in range(lists):
+            start, end = self.list_offsets[cluster], self.list_offsets[cluster + 1]
+            if start == end:
+                continue
+            members = (np.arange(len(queries)) if self.centroids is None
+                       else np.nonzero((probes == cluster).any(axis=1))[0])
+            if not len(members):
+                continue
+            block = self._similarities(queries[members], start, end)
+            columns = block.argmax(axis=1)
+            scores = block[np.arange(len(members)), columns]
+            better = scores > best_scores[members]
+            best_scores[members[better]] = scores[better]
+            best_rows[members[better]] = start + columns[better]
+        return best_scores, np.asarray(self.ids)[best_rows]
 
-        # Use spaCy NER to detect location-based entities
-        for ent in doc.ents:
-            if ent.label_ in ['GPE', 'LOC', 'FAC']:
-                # Get surrounding context
-                start = max(0, ent.start_char - 30)
-                end = min(len(text), ent.end_char + 30)
-                context = text[start:end]
 
-                # If it appears to be part of an address, add it
-                if any(pattern.search(context) for pattern in self.address_patterns):
-                    spans.add((ent.start_char, ent.end_char))
-                    self.stats.addresses_count += 1
-
-        # Use pyap to detect addresses in the text
-        for country in ('US', 'CA', 'GB'):  # Modify as needed for specific countries
-            pyap_addresses = pyap.parse(text, country=country)
-            for address in pyap_addresses:
-                # Get the position of the address text within the full text
-                start = text.find(address.full_address)
-                end = start + len(address.full_address)
-                if start != -1:  # Ensure address is found in the text
-                    spans.add((start, end))
-                    self.stats.addresses_count += 1
+class RegexScanner:
+    """
+        The regex detectors for phones, dates, emails and addresses, compiled once and shared by every
+        Redactor. scan() finds all requested categories in one call; before running a category's patterns
+        it checks a cheap signal every hit of the category contains, and skips the category without it.
+    """
+    def __init__(self, address_countries: Iterable[str] = ADDRESS_COUNTRIES):
+        """
+            Args:
+                address_countries: Countries whose address formats pyap looks for.
+        """
+        self.address_countries = tuple(address_countries)
 
-        return spans
+    phone_pattern = re.compile(
+        r'\b(\+?\d{1,3})?[-.\s]?\(?(\d{1,4})\)?[-.\s]?(\d{2,5})([-.\s]?\d{2,4}){1,4}\b'
+    )
+    date_pattern = re.compile(
+        r'\b(?:(?:(\d{4})[-/.](\d{2})[-/.](\d{2}))|'                # Matches YYYY-MM-DD, YYYY/MM/DD, YYYY.MM.DD
+        r'(?:(\d{2})[-/.](\d{2})[-/.](\d{4}))|'                      # Matches DD-MM-YYYY, DD/MM/YYYY, DD.MM.YYYY
+        r'(?:(\d{2})[-/.](\d{2})[-/.](\d{2}))|'                      # Matches MM-DD-YY, MM/DD/YY
+        r'(?:(\d{4})年(\d{2})月(\d{2})日)|'                          # Matches YYYY年MM月DD日 (Japanese format)
+        r'(?:(\d{2})[-/.](\d{2})[-/.](\d{4}))|'                      # Matches MM-DD-YYYY, MM/DD/YYYY, MM.DD.YYYY
+        r'(?:(\d{1,2})(?:st|nd|rd|th)?\s'                            # Matches ordinal dates, e.g., "31st December 2024"
+        r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|'
+        r'Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s(\d{4}))|'
+        r'(?:(\d{4})\s'                                              # Matches formats like "2024, December 31"
+        r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|'
+        r'Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s(\d{1,2}))|'
+        r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|'
+        r'Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s(\d{4}))\b'  # Matches "Dec 2024" or "December 2024"
+    )
+    address_patterns = [
+        # Street addresses with numbers and common street types
+        re.compile(
+            r'\b\d+\s+[A-Za-z\s]+(?:Street|St\.?|Avenue|Ave\.?|Road|Rd\.?|Boulevard|Blvd\.?|'
+            r'Lane|Ln\.?|Drive|Dr\.?|Court|Ct\.?|Circle|Cir\.?|Trail|Trl\.?|Way|Place|Pl\.?|'
+            r'Terrace|Ter\.?|Plaza|Highway|Hwy\.?|Parkway|Pkwy\.?)'
+            r'(?:[,\s]+(?:Suite|Ste\.?|Floor|Fl\.?|Unit|Apt\.?|Apartment|Room|Rm\.?)?\s*'
+            r'[#]?\d*[A-Za-z]?)?\s*[,\s]*(?:[A-Za-z\s]+[,\s]+[A-Z]{2}\s*\d{5}(?:-\d{4})?)?',
+            re.IGNORECASE
+        ),
+        # PO Boxes
+        re.compile(r'\b(?:P\.?\s*O\.?\s*Box|PO\s*Box)\s+\d+', re.IGNORECASE),
+        # ZIP codes
+        re.compile(r'\b[A-Z]{2}\s*\d{5}(?:-\d{4})?\b'),
+        # Floor/Suite/Unit patterns
+        re.compile(r'\b(?:Suite|Ste\.?|Floor|Fl\.?|Unit|Apt\.?|Apartment|Room|Rm\.?)\s*[#]?\d+[A-Za-z]?\b', re.IGNORECASE),
+        # Building numbers with ordinal indicators
+        re.compile(r'\b\d+(?:st|nd|rd|th)\s+(?:Floor|Fl\.?)', re.IGNORECASE)
+    ]
+    email_pattern = re.compile(r'\b([a-zA-Z0-9._\'-]+)@([\w.-]+\.[a-zA-Z]{2,})\b')
+    # Words near an address pattern hit that make it look like a complete address. 'street' is covered
+    # by 'st'; no two of these can start at the same position, so one lookahead scan finds them all.
+    address_indicator_pattern = re.compile(r'(?=(st|ave|road|floor|suite))', re.IGNORECASE | re.ASCII)
+    # Characters of context on each side of a hit that are checked for indicators or address patterns
+    address_context = 30
+    digit_pattern = re.compile(r'\d')
+    # Signals checked by scan() before the full patterns run. Each is contained in every hit of its category:
+    # a phone number has two adjacent digits; a date has a separator between digits (-/.年) or a capitalized
+    # month name, as date_pattern is case-sensitive; emails have an '@' and addresses a digit
+    phone_signal_pattern = re.compile(r'\d\d')
+    date_signal_pattern = re.compile(r'\d[-/.年]\d|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec')
+    # Byte-level twin of phone_pattern for Redactor.redact_mapped(). On bytes \d, \s and \b are ASCII-only,
+    # and \s does not take the separators \x1c-\x1f that it matches in str, so it finds exactly what
+    # phone_pattern finds in the decoded text only as long as mapped_unsafe_pattern (non-ASCII bytes, those
+    # separators, or carriage returns that text mode would translate) does not match.
+    phone_bytes_pattern = re.compile(phone_pattern.pattern.encode('ascii'))
+    mapped_unsafe_pattern = re.compile(rb'[^\x00-\x7f]|[\x1c-\x1f\r]')
 
-    def redact_concepts(self, text: str, concepts: List[str]) -> Set[tuple]:
+    CATEGORIES = ('phones', 'dates', 'emails', 'addresses')
+    # scan() results for 'addresses' also include these keys
+    ADDRESS_KEYS = ('addresses', 'address_patterns', 'postal_addresses')
+
+    def scan(self, text: str, categories: Iterable[str] = CATEGORIES) -> Dict[str, List[tuple]]:
         """
-            Redact entire lines containing specific concepts.
+            Find the regex hits of every requested category.
             Args:
                 text: The original text.
-                concepts: A list of concepts (keywords or phrases) to search for in the text.
+                categories: Categories to scan for, from CATEGORIES.
             Returns:
-                Set: A set of tuples representing the spans (start, end) of lines to be redacted.
+                Dict: For each category, the list of (start, end) hits. 'addresses' additionally adds
+                    'address_patterns' (all address pattern hits, sorted) and 'postal_addresses' (pyap hits).
         """
+        has_digit = self.digit_pattern.search(text) is not None
+        hits = {}
+        for category in categories:
+            if category == 'emails':
+                hits[category] = self.find_emails(text) if '@' in text else []
+            elif category == 'addresses':
+                if has_digit:
+                    hits['address_patterns'] = self.find_address_patterns(text)
+                    hits['addresses'] = self.find_addresses(text, hits['address_patterns'])
+                    hits['postal_addresses'] = self.find_postal_addresses(text)
+                else:
+                    hits.update((key, []) for key in self.ADDRESS_KEYS)
+            elif category == 'phones':
+                hits[category] = self.find_phones(text) if self.phone_signal_pattern.search(text) else []
+            elif category == 'dates':
+                # Every date also has a digit, which rules out texts merely mentioning a month
+                hits[category] = self.find_dates(text) if has_digit and self.date_signal_pattern.search(text) else []
+            else:
+                raise ValueError(f"Unknown regex category: {category}")
+        return hits
 
-        spans = set()
-        if not text.strip() or not concepts:
-            return spans
-
-        current_pos = 0
-        for line in text.split('\n'):
-            if line.strip():
-                line_lower = line.lower()
-                # Check exact matches first
-                if any(concept.lower() in line_lower for concept in concepts):
-                    matched_concept = next(c for c in concepts if c.lower() in line_lower)
-                    self.stats.concepts[matched_concept] = self.stats.concepts.get(matched_concept, 0) + 1
-                    spans.add((current_pos, current_pos + len(line)))
-                # Try semantic matching if available and no exact match found
-                elif self.sentence_model:
-                    try:
-                        similarities = cosine_similarity(
-                            [self.sentence_model.encode(line_lower, convert_to_numpy=True)],
-                            self.sentence_model.encode(concepts, convert_to_numpy=True)
-                        )[0]
-                        if max(similarities) > 0.45:
-                            concept = concepts[np.argmax(similarities)]
-                            self.stats.concepts[concept] = self.stats.concepts.get(concept, 0) + 1
-                            spans.add((current_pos, current_pos + len(line)))
-                    except Exception as e:
-                        logging.warning(f"Error in semantic similarity calculation: {str(e)}")
-            current_pos += len(line) + 1
-
-        return spans
+    def find_phones(self, text: str) -> List[tuple]:
+        """
+            Find phone number hits.
+            Args:
+                text: The original text.
+            Returns:
+                List: (start, end) spans of phone numbers.
+        """
+        return [match.span() for match in self.phone_pattern.finditer(text)]
 
-    def redact_document(self, input_path: str, flags: argparse.Namespace) -> str:
+    def find_dates(self, text: str) -> List[tuple]:
         """
-            Process a single document and apply all requested redactions.
+            Find date hits.
             Args:
-                input_path: The path to the input file.
-                flags: The parsed command-line arguments containing redaction options.
+                text: The original text.
             Returns:
-                str: The redacted text.
+                List: (start, end) spans of dates.
         """
-        with open(input_path, 'r', encoding='utf-8') as f:
-            text = f.read()
+        return [match.span() for match in self.date_pattern.finditer(text)]
 
-        doc = self.nlp(text)
-        spans_to_redact = set()
+    def find_emails(self, text: str) -> List[tuple]:
+        """
+            Find email address hits.
+            Args:
+                text: The original text.
+            Returns:
+                List: (start, end) spans of email addresses.
+        """
+        return [match.span() for match in self.email_pattern.finditer(text)]
 
-        if flags.names:
-            spans_to_redact.update(self.redact_names(doc, text))
+    def find_address_patterns(self, text: str) -> List[tuple]:
+        """
+            Find the hits of every address pattern, regardless of context.
+            Args:
+                text: The original text.
+            Returns:
+                List: (start, end) spans of pattern hits sorted by start, once per matching pattern.
+        """
+        return sorted(match.span() for pattern in self.address_patterns for match in pattern.finditer(text))
 
-        if flags.dates:
-            spans_to_redact.update(self.redact_dates(doc, text))
+    def find_addresses(self, text: str, pattern_hits: List[tuple] = None) -> List[tuple]:
+        """
+            Find address pattern hits that have an address indicator word within their context.
+            A span matched by several patterns is returned once per pattern.
+            Args:
+                text: The original text.
+                pattern_hits: Result of find_address_patterns(), computed here if omitted.
+            Returns:
+                List: (start, end) spans of address hits.
+        """
+        if pattern_hits is None:
+            pattern_hits = self.find_address_patterns(text)
+        indicators = [(match.start(), match.start() + len(match.group(1)))
+                      for match in self.address_indicator_pattern.finditer(text)]
+        indicator_starts = [start for start, _ in indicators]
 
-        if flags.phones:
-            spans_to_redact.update(self.redact_phones(text))
+        hits = []
+        for start, end in pattern_hits:
+            context_start = max(0, start - self.address_context)
+            context_end = min(len(text), end + self.address_context)
 
-        if flags.address:
-            spans_to_redact.update(self.redact_addresses(doc, text))
+            # Is any indicator fully inside the context window?
+            i = bisect.bisect_left(indicator_starts, context_start)
+            while i < len(indicators) and indicators[i][0] < context_end:
+                if indicators[i][1] <= context_end:
+                    hits.append((start, end))
+                    break
+                i += 1
+        return hits
 
-        if flags.concept:
-            spans_to_redact.update(self.redact_concepts(text, flags.concept))
+    def find_postal_addresses(self, text: str) -> List[tuple]:
+        """
+            Find addresses with pyap for every configured country, at every place they occur.
+            pyap reports addresses from whitespace-normalized text without offsets, so each distinct
+            address is located again in the original text allowing any whitespace between its words.
+            Args:
+                text: The original text.
+            Returns:
+                List: (start, end) spans of every occurrence of each distinct address, sorted.
+        """
+        import pyap
 
-        spans_to_redact = sorted(spans_to_redact)
-        redacted_text = ''
-        last_end = 0
+        found = set()
+        for country in self.address_countries:
+            found.update(address.full_address for address in pyap.parse(text, country=country))
 
-        for start, end in spans_to_redact:
-            if start < last_end:
+        hits = set()
+        for full_address in found:
+            words = full_address.split()
+            if not words:
                 continue
-            redacted_text += text[last_end:start]
-            redacted_text += self.redact_text(text[start:end])
-            last_end = end
+            pattern = re.compile(r'\s+'.join(re.escape(word) for word in words))
+            hits.update(match.span() for match in pattern.finditer(text))
+        return sorted(hits)
 
-        redacted_text += text[last_end:]
-        self.stats.files_processed += 1
 
-        return redacted_text
+class AddressContext:
+    def __init__(self, pattern_hits: List[tuple]):
+        """
+            Lookup table telling whether any address pattern hit overlaps a range of the text,
+            built once per document from RegexScanner.find_address_patterns().
+            Args:
+                pattern_hits: Address pattern hits sorted by start.
+        """
+        self._starts = [start for start, _ in pattern_hits]
+        # _max_ends[i] is the furthest end among the first i + 1 hits
+        self._max_ends = list(itertools.accumulate((end for _, end in pattern_hits), max))
 
+    def overlaps(self, start: int, end: int) -> bool:
+        """
+            Args:
+                start: Start offset of the range.
+                end: End offset of the range.
+            Returns:
+                bool: True if some pattern hit overlaps [start, end).
+        """
+        i = bisect.bisect_left(self._starts, end)
+        return i > 0 and self._max_ends[i - 1] > start
 
-def setup_argparse() -> argparse.ArgumentParser:
-    """
-    Set up command line argument parsing with flexible argument combinations.
-    Returns:
-        argparse.ArgumentParser: The argument parser with configured options.
-    """
-    parser = argparse.ArgumentParser(description='Redact sensitive information from text files.')
-    
-    # Required argument
-    parser.add_argument('--input', required=True, help='Input files glob pattern')
-    
-    # Optional redaction flags
-    redaction_group = parser.add_argument_group('redaction options')
-    redaction_group.add_argument('--names', action='store_true', help='Redact names')
-    redaction_group.add_argument('--dates', action='store_true', help='Redact dates')
-    redaction_group.add_argument('--phones', action='store_true', help='Redact phone numbers')
-    redaction_group.add_argument('--address', action='store_true', help='Redact addresses')
-    redaction_group.add_argument('--concept', action='append', help='Redact concepts (can be specified multiple times)')
-    
-    # Output options
-    output_group = parser.add_argument_group('output options')
-    output_group.add_argument('--output', default='files', 
-                              help='Output directory (default: files)')
-    output_group.add_argument('--stats', help='Statistics output file (optional, can be "stdout" or "stderr")')
-    
-    return parser
 
-def validate_args(args: argparse.Namespace) -> bool:
+class NerPrefilter:
     """
-    Validate command line arguments.
-    
-    Args:
-        args: Parsed command line arguments
-        
-    Returns:
-        bool: True if arguments are valid, False otherwise
+        Picks the sentences worth running NER on (--ner-prefilter). A sentence is a candidate if it contains
+        a digit, a month, weekday or other date word, or a capitalized word, except a capitalized common
+        word starting the sentence. Adjacent candidate sentences are merged into chunks, so entities spanning
+        a sentence break (e.g. after "Mr.") keep their context; everything else is never parsed.
     """
-    # Check if at least one redaction option is specified
-    redaction_options = [args.names, args.dates, args.phones, args.address]
-    if not any(redaction_options) and not args.concept:
-        logging.error("Error: At least one redaction option must be specified "
-                     "(--names, --dates, --phones, --address, or --concept)")
-        return False
-    return True
+    sentence_break_pattern = re.compile(r'(?<=[.!?])\s+|\n\s*')
+    date_signal_pattern = re.compile(
+        r'\d|\b(?:january|february|march|april|may|june|july|august|september|october|november|december|'
+        r'jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec|'
+        r'monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend|'
+        r'today|tonight|yesterday|tomorrow|day|days|week|weeks|month|months|year|years|decade|decades|'
+        r'century|ago|morning|afternoon|evening|night|noon|midnight|spring|summer|autumn|fall|winter)\b',
+        re.IGNORECASE
+    )
+    word_pattern = re.compile(r'\w+')
+    # Word starts that are not lowercase ASCII letters: capitals, but also caseless scripts, to stay safe
+    capital_pattern = re.compile(r'\b(?![a-z\d_])\w')
+    sentence_starters = frozenset("""
+        a about after all also although an and any are as at be because before both but by can could did do
+        does each either every for from had has have he her here hers his how however i if in is it its just
+        let many more most my neither no nor not now of on once one only or our please she should since so
+        some such than thank thanks that the their them then there these they this those though thus to too
+        under unless until was we were what when where whether which while who why will with would yes you
+        your
+    """.split())
 
+    def is_candidate(self, sentence: str) -> bool:
+        """
+            Whether a sentence might contain a PERSON, DATE, GPE, LOC or FAC entity.
+            Args:
+                sentence: The sentence.
+            Returns:
+                bool: True if the sentence should be parsed.
+        """
+        if self.date_signal_pattern.search(sentence):
+            return True
+        first = self.word_pattern.search(sentence)
+        if first is None:
+            return False
+        if self.capital_pattern.search(sentence, first.end()):
+            return True
+        return bool(self.capital_pattern.match(sentence, first.start())) and \
+            first.group().lower() not in self.sentence_starters
 
-def main():
-    """
-        Parses command-line arguments, processes input files, applies redactions, and outputs results.
-    """
-    parser = setup_argparse()
-    args = parser.parse_args()
+    def candidate_chunks(self, text: str) -> List[Tuple[int, int]]:
+        """
+            Split text into sentences and merge adjacent candidate sentences.
+            Args:
+                text: The text.
+            Returns:
+                List[Tuple[int, int]]: (start, end) offsets of the chunks to parse, in order.
+        """
+        chunks = []
+        start = 0
+        # Where the break after the last candidate sentence ends; a candidate starting there extends its chunk
+        joined_at = None
+        for boundary in itertools.chain(self.sentence_break_pattern.finditer(text), [None]):
+            end, next_start = (boundary.start(), boundary.end()) if boundary is not None else (len(text), len(text))
+            if end > start and self.is_candidate(text[start:end]):
+                if start == joined_at:
+                    chunks[-1] = (chunks[-1][0], end)
+                else:
+                    chunks.append((start, end))
+                joined_at = next_start
+            start = next_start
+        return chunks
 
-    # Validate arguments
-    if not validate_args(args):
-        sys.exit(1)
 
-    output_dir = Path(args.output)
-    output_dir.mkdir(parents=True, exist_ok=True)
+class PrefilteredEntity:
+    def __init__(self, text: str, label: str, start_char: int, end_char: int):
+        """
+            An entity found by NER in a prefiltered chunk, with offsets into the whole text
+            (the attributes of spacy.tokens.Span the detectors use).
+        """
+        self.text = text
+        self.label_ = label
+        self.start_char = start_char
+        self.end_char = end_char
 
-    redactor = Redactor()
 
-    input_files = list(glob.glob(args.input))
-    if not input_files:
-        logging.error(f"No files found matching pattern: {args.input}")
-        sys.exit(1)
+class PrefilteredDoc:
+    def __init__(self, text: str, ents: List[PrefilteredEntity], parsed_chars: int):
+        """
+            Stands in for a spacy.tokens.Doc when only the candidate chunks of text were parsed.
+            Args:
+                text: The whole text.
+                ents: The entities of all chunks, with offsets into text.
+                parsed_chars: Characters of text that were parsed.
+        """
+        self.text = text
+        self.ents = ents
+        self.parsed_chars = parsed_chars
+
+
+class Gazetteer:
+    def __init__(self, entries: Dict[str, str] = None):
+        """
+            Known PII strings (names, emails, addresses) matched all at once with an Aho-Corasick automaton,
+            in one pass over a document however many entries there are. Matching is case-sensitive and only
+            accepts hits on word boundaries. Entries added after the automaton was built are matched once
+            the gazetteer has grown by GAZETTEER_REBUILD_GROWTH and the automaton is rebuilt.
+            Args:
+                entries: Entity text mapped to its category, a key of GAZETTEER_CATEGORIES.
+        """
+        self.entries: Dict[str, str] = dict(entries or {})
+        # Automaton: goto transitions, failure links and, per state, the (length, category) of entries ending there
+        self._goto: List[Dict[str, int]] = None
+        self._fail: List[int] = None
+        self._output: List[List[Tuple[int, str]]] = None
+        self._built_size = 0
+        self.digest = ''
+
+    @classmethod
+    def load(cls, path: str) -> 'Gazetteer':
+        """
+            Load a gazetteer file: one entity per line, optionally preceded by its category and a tab
+            (names if omitted). Blank lines and lines starting with # are skipped.
+            Args:
+                path: The gazetteer file.
+            Returns:
+                Gazetteer: The gazetteer.
+            Raises:
+                ValueError: If a line has an unknown category.
+        """
+        entries = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip('\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+                category, _, text = line.rpartition('\t')
+                category = category or 'names'
+                if category not in GAZETTEER_CATEGORIES:
+                    raise ValueError(f"{path}:{line_number}: unknown gazetteer category {category!r}")
+                entries[text.strip()] = category
+        return cls(entries)
+
+    def save(self, path: str):
+        """
+            Write the gazetteer in the format load() reads, sorted, replacing the file atomically.
+            Args:
+                path: The gazetteer file.
+        """
+        path = Path(path)
+        tmp_path = temporary_path(path)
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for text, category in sorted(self.entries.items(), key=lambda item: (item[1], item[0])):
+                    f.write(f"{category}\t{text}\n")
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def add(self, text: str, category: str) -> bool:
+        """
+            Add an entity, unless it is already known or too short to match reliably.
+            Args:
+                text: The entity text.
+                category: Its category, a key of GAZETTEER_CATEGORIES.
+            Returns:
+                bool: True if the entity is new.
+        """
+        text = ' '.join(text.split())
+        if len(text) < GAZETTEER_MIN_LENGTH or text in self.entries or not any(c.isalpha() for c in text):
+            return False
+        self.entries[text] = category
+        return True
+
+    def _build(self):
+        """
+            Build the Aho-Corasick automaton of all entries: a trie whose failure links point to the state of
+            the longest proper suffix that is also a trie path, so matching never backtracks.
+        """
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[Tuple[int, str]]] = [[]]
+        for text, category in self.entries.items():
+            state = 0
+            for char in text:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append((len(text), category))
+
+        fail = [0] * len(goto)
+        states = deque(goto[0].values())
+        while states:
+            state = states.popleft()
+            for char, next_state in goto[state].items():
+                states.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                output[next_state] = output[next_state] + output[fail[next_state]]
+
+        self._goto, self._fail, self._output = goto, fail, output
+        self._built_size = len(self.entries)
+        self.digest = hashlib.sha256(json.dumps(sorted(self.entries.items())).encode('utf-8')).hexdigest()
+
+    def automaton(self):
+        """
+            Build the automaton if it is missing or the entries have grown enough since it was built.
+        """
+        if self._goto is None or len(self.entries) > self._built_size * (1 + GAZETTEER_REBUILD_GROWTH):
+            self._build()
+
+    def matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+            Find every occurrence of the entries in text, in a single pass.
+            Args:
+                text: The text to search.
+            Returns:
+                List[Tuple[int, int, str]]: The start, end and category of each hit on word boundaries.
+        """
+        self.automaton()
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, category in output[state]:
+                start, end = i + 1 - length, i + 1
+                if (start == 0 or not (text[start - 1].isalnum() and text[start].isalnum())) and \
+                        (end == len(text) or not (text[end].isalnum() and text[end - 1].isalnum())):
+                    hits.append((start, end, category))
+        return hits
+
+
+class RedactionStats:
+    def __init__(self):
+        """
+            Initialize RedactionStats
+        """
+        self.names_count = 0
+        self.dates_count = 0
+        self.phones_count = 0
+        self.addresses_count = 0
+        self.concepts: Dict[str, int] = {}
+        self.files_processed = 0
+        self.total_words_redacted = 0
+        self.model_tier = None
+        self.ner_model = None
+        # Per-stage wall time, CPU time, characters and calls, recorded when profiling is on
+        self.timings: Dict[str, Dict[str, float]] = {}
+        # Characters that needed NER, and how many of them the NER prefilter let through
+        self.ner_chars = 0
+        self.ner_chars_parsed = 0
+        # Records written by --records mode, and those dropped because they could not be parsed or redacted
+        self.records_processed = 0
+        self.records_dropped = 0
+        # Spans only the gazetteer found, and entities learned for it (entity -> category; not serialized)
+        self.gazetteer_hits = 0
+        self.gazetteer_learned: Dict[str, str] = {}
+        # Paragraphs looked up in the --paragraph-memo, and those redacted from it
+        self.memo_paragraphs = 0
+        self.memo_hits = 0
+        # Per-file bookkeeping for the --manifest (not serialized): the input as it was read (see open_input())
+        # and the wall-clock seconds spent reading, redacting and writing it
+        self.source: dict = None
+        self.seconds = 0.0
+
+    def add_timing(self, stage: str, wall: float, cpu: float, chars: int = 0, calls: int = 1):
+        """
+            Add measured time to a pipeline stage.
+            Args:
+                stage: The stage name, e.g. "nlp" or "render".
+                wall: Elapsed wall-clock seconds.
+                cpu: CPU seconds used by the process (all threads) meanwhile.
+                chars: Characters of text the stage processed.
+                calls: Number of times the stage ran.
+        """
+        timing = self.timings.setdefault(stage, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "chars": 0, "calls": 0})
+        timing["wall_seconds"] += wall
+        timing["cpu_seconds"] += cpu
+        timing["chars"] += chars
+        timing["calls"] += calls
+
+    def timings_dict(self) -> dict:
+        """
+            The stage timings rounded for JSON output, slowest stage first.
+            Returns:
+                dict: Timings per stage.
+        """
+        return {
+            stage: {
+                "wall_seconds": round(timing["wall_seconds"], 6),
+                "cpu_seconds": round(timing["cpu_seconds"], 6),
+                "chars": timing["chars"],
+                "calls": timing["calls"],
+            }
+            for stage, timing in sorted(self.timings.items(), key=lambda item: -item[1]["wall_seconds"])
+        }
+
+    def to_dict(self) -> dict:
+        """
+            Convert the redaction statistics to a dictionary suitable for JSON output.
+            Returns:
+                dict: redaction statistics dictionary.
+        """
+        self.total_words_redacted = self.names_count + self.dates_count + self.phones_count + self.addresses_count + sum(self.concepts.values())
+        return {
+            "files_processed": self.files_processed,
+            "total_words_redacted": self.total_words_redacted,
+            "names_redacted": self.names_count,
+            "dates_redacted": self.dates_count,
+            "phones_redacted": self.phones_count,
+            "addresses_redacted": self.addresses_count,
+            "concepts_redacted": self.concepts,
+            "model_tier": self.model_tier,
+            "ner_model": self.ner_model,
+            **({"ner_prefilter": self.ner_prefilter_dict()} if self.ner_chars else {}),
+            **({"records": {"processed": self.records_processed, "dropped": self.records_dropped}}
+               if self.records_processed or self.records_dropped else {}),
+            **({"gazetteer_hits": self.gazetteer_hits} if self.gazetteer_hits else {}),
+            **({"paragraph_memo": {
+                "paragraphs": self.memo_paragraphs,
+                "hits": self.memo_hits,
+                "hit_rate": round(self.memo_hits / self.memo_paragraphs, 4),
+            }} if self.memo_paragraphs else {}),
+            **({"timings": self.timings_dict()} if self.timings else {})
+        }
+
+    def ner_prefilter_dict(self) -> dict:
+        """
+            How much text the NER prefilter kept away from the NER model, for JSON output.
+            Returns:
+                dict: Characters considered, characters parsed and the fraction skipped.
+        """
+        return {
+            "chars": self.ner_chars,
+            "parsed_chars": self.ner_chars_parsed,
+            "skipped_fraction": round(1 - self.ner_chars_parsed / self.ner_chars, 4) if self.ner_chars else 0.0,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RedactionStats':
+        """
+            Rebuild RedactionStats from the output of to_dict().
+            Args:
+                data: A statistics dictionary.
+            Returns:
+                RedactionStats: The statistics.
+        """
+        stats = cls()
+        stats.names_count = data.get("names_redacted", 0)
+        stats.dates_count = data.get("dates_redacted", 0)
+        stats.phones_count = data.get("phones_redacted", 0)
+        stats.addresses_count = data.get("addresses_redacted", 0)
+        stats.concepts = dict(data.get("concepts_redacted", {}))
+        stats.files_processed = data.get("files_processed", 0)
+        stats.model_tier = data.get("model_tier")
+        stats.ner_model = data.get("ner_model")
+        stats.ner_chars = data.get("ner_prefilter", {}).get("chars", 0)
+        stats.ner_chars_parsed = data.get("ner_prefilter", {}).get("parsed_chars", 0)
+        stats.records_processed = data.get("records", {}).get("processed", 0)
+        stats.records_dropped = data.get("records", {}).get("dropped", 0)
+        stats.gazetteer_hits = data.get("gazetteer_hits", 0)
+        stats.memo_paragraphs = data.get("paragraph_memo", {}).get("paragraphs", 0)
+        stats.memo_hits = data.get("paragraph_memo", {}).get("hits", 0)
+        for stage, timing in data.get("timings", {}).items():
+            stats.add_timing(stage, timing["wall_seconds"], timing["cpu_seconds"], timing["chars"], timing["calls"])
+        return stats
+
+    def merge(self, other: 'RedactionStats'):
+        """
+            Add the counts of another RedactionStats (e.g. from one file or one worker) into this one.
+            Args:
+                other: The statistics to merge in.
+        """
+        self.names_count += other.names_count
+        self.dates_count += other.dates_count
+        self.phones_count += other.phones_count
+        self.addresses_count += other.addresses_count
+        for concept, count in other.concepts.items():
+            self.concepts[concept] = self.concepts.get(concept, 0) + count
+        self.files_processed += other.files_processed
+        self.ner_chars += other.ner_chars
+        self.ner_chars_parsed += other.ner_chars_parsed
+        self.records_processed += other.records_processed
+        self.records_dropped += other.records_dropped
+        self.gazetteer_hits += other.gazetteer_hits
+        self.gazetteer_learned.update(other.gazetteer_learned)
+        self.memo_paragraphs += other.memo_paragraphs
+        self.memo_hits += other.memo_hits
+        if other.source is not None:
+            self.source = other.source
+        self.seconds += other.seconds
+        self.merge_timings(other)
+
+    def detection_counts(self) -> 'RedactionStats':
+        """
+            Copy only what the detectors counted, leaving out timings and run bookkeeping.
+            Returns:
+                RedactionStats: The detector counts.
+        """
+        counts = RedactionStats()
+        counts.names_count = self.names_count
+        counts.dates_count = self.dates_count
+        counts.phones_count = self.phones_count
+        counts.addresses_count = self.addresses_count
+        counts.concepts = dict(self.concepts)
+        counts.gazetteer_hits = self.gazetteer_hits
+        return counts
+
+    def merge_timings(self, other: 'RedactionStats'):
+        """
+            Add only the stage timings of another RedactionStats into this one.
+            Args:
+                other: The statistics whose timings to merge in.
+        """
+        for stage, timing in other.timings.items():
+            self.add_timing(stage, timing["wall_seconds"], timing["cpu_seconds"], timing["chars"], timing["calls"])
+
+
+def package_version(name: str) -> str:
+    """
+        Version of an installed distribution, without importing it.
+        Args:
+            name: Distribution name, e.g. a spaCy model package.
+        Returns:
+            str: The version, or '' if it is not an installed distribution (e.g. a model path).
+    """
+    from importlib import metadata
+
+    try:
+        return metadata.version(name)
+    except Exception:
+        return ''
+
+
+def release_mapped_pages(mapped: mmap.mmap, start: int, end: int) -> int:
+    """
+        Drop the whole pages of a read-only file mapping within [start, end) from the resident set;
+        they are read back from the file if accessed again. Does nothing where madvise is unavailable.
+        Args:
+            mapped: The memory map.
+            start: Page-aligned start offset.
+            end: End offset, rounded down to a page boundary.
+        Returns:
+            int: The page-aligned offset up to which pages were released.
+    """
+    end = min(end, len(mapped))
+    if end < len(mapped):
+        end -= end % mmap.PAGESIZE
+    if end > start and hasattr(mmap, 'MADV_DONTNEED'):
+        mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+    return max(start, end)
+
+
+def timed_iter(iterable: Iterable) -> Iterator[Tuple[object, float, float]]:
+    """
+        Iterate together with the wall and CPU time spent producing each item, e.g. so batched
+        parsing by nlp.pipe can be attributed to the documents of the batch.
+        Args:
+            iterable: The iterable to time, typically a generator doing the work lazily.
+        Yields:
+            Tuple: The item, wall seconds and CPU seconds.
+    """
+    iterator = iter(iterable)
+    while True:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield item, time.perf_counter() - wall, time.process_time() - cpu
+
+
+class Paragraph:
+    def __init__(self, lines: List[Tuple[int, str]]):
+        """
+            A paragraph normalized for memoization: quote markers and indentation at the start of its lines
+            and whitespace at their end are dropped, so a block quoted in a reply has the same text as the
+            original message. Offsets into the normalized text map back to the document.
+            Args:
+                lines: The document offset and normalized content of each line.
+        """
+        self.text = '\n'.join(content for _, content in lines)
+        self._starts: List[int] = []
+        self._document_starts: List[int] = []
+        position = 0
+        for document_start, content in lines:
+            self._starts.append(position)
+            self._document_starts.append(document_start)
+            position += len(content) + 1
+
+    def translate(self, start: int, end: int) -> Tuple[int, int]:
+        """
+            Map a span of the normalized text to the document.
+            Args:
+                start: Start offset in the normalized text (inclusive).
+                end: End offset in the normalized text (exclusive).
+            Returns:
+                Tuple[int, int]: The span in the document.
+        """
+        def to_document(offset):
+            line = bisect.bisect_right(self._starts, offset) - 1
+            return self._document_starts[line] + offset - self._starts[line]
+
+        return to_document(start), to_document(end - 1) + 1
+
+
+def split_paragraphs(text: str) -> List[Paragraph]:
+    """
+        Split text into normalized paragraphs, separated by lines that are blank once quote markers are
+        removed and by changes of quote depth (so a quoted block is apart from the "... wrote:" line above it).
+        Args:
+            text: The document text.
+        Returns:
+            List[Paragraph]: The paragraphs, in document order.
+    """
+    paragraphs = []
+    lines = []
+    depth = 0
+    position = 0
+    for line in text.split('\n'):
+        prefix = QUOTE_PREFIX.match(line).end()
+        content = line[prefix:].rstrip()
+        line_depth = line.count('>', 0, prefix)
+        if lines and (not content or line_depth != depth):
+            paragraphs.append(Paragraph(lines))
+            lines = []
+        if content:
+            lines.append((position + prefix, content))
+            depth = line_depth
+        position += len(line) + 1
+    if lines:
+        paragraphs.append(Paragraph(lines))
+    return paragraphs
+
+
+class ParagraphMemo:
+    def __init__(self, max_entries: int = PARAGRAPH_MEMO_SIZE):
+        """
+            In-memory LRU memo of the spans (relative to the paragraph) and detector counts found in
+            normalized paragraphs, so quoted replies, forwarded headers and signatures repeated across
+            documents are only analyzed once.
+            Args:
+                max_entries: Paragraphs remembered before the least recently used ones are evicted.
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def key(paragraph: str, config: str) -> bytes:
+        """
+            Memo key of a normalized paragraph under a redaction configuration.
+            Args:
+                paragraph: The normalized paragraph text.
+                config: The serialized Redactor.cache_config().
+            Returns:
+                bytes: The key.
+        """
+        digest = hashlib.sha256(config.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(paragraph.encode('utf-8', 'surrogatepass'))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Tuple[List[tuple], RedactionStats]:
+        """
+            Look up a paragraph, marking it as recently used.
+            Args:
+                key: The memo key.
+            Returns:
+                Tuple: The paragraph's spans and detector counts, or None if it is not remembered.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: bytes, spans: List[tuple], counts: RedactionStats):
+        """
+            Remember a paragraph, evicting the least recently used ones beyond max_entries.
+            Args:
+                key: The memo key.
+                spans: Spans relative to the normalized paragraph.
+                counts: Its detector counts.
+        """
+        self._entries[key] = (spans, counts)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedactionCache:
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        """
+            On-disk cache of the spans and statistics computed for a document, keyed by a hash of its
+            content and everything else that affects the result. Entries are small JSON files;
+            the least recently used ones are evicted once the cache grows beyond max_bytes.
+            Args:
+                cache_dir: Directory holding the cache entries.
+                max_bytes: Size limit of all entries together.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key(text: str, config: str) -> str:
+        """
+            Compute the cache key of a document.
+            Args:
+                text: The document text.
+                config: The serialized Redactor.cache_config(), describing the flags and models used.
+            Returns:
+                str: Hex digest identifying the document and configuration.
+        """
+        digest = hashlib.sha256(config.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _entries(self) -> Iterator[Tuple[float, Path, int]]:
+        for path in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            yield stat.st_mtime, path, stat.st_size
+
+    def get(self, key: str) -> Tuple[RedactionSpans, RedactionStats]:
+        """
+            Look up a cache entry and mark it as recently used.
+            Args:
+                key: The cache key.
+            Returns:
+                Tuple: The cached spans and statistics, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return RedactionSpans(map(tuple, entry["spans"])), RedactionStats.from_dict(entry["stats"])
+
+    def put(self, key: str, spans: RedactionSpans, stats: RedactionStats):
+        """
+            Store a cache entry, evicting old entries if the cache grows too large.
+            Args:
+                key: The cache key.
+                spans: The spans computed for the document.
+                stats: The statistics the document contributed.
+        """
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Timings and memo lookups describe the run that filled the cache, not the documents, so they are not stored
+        stats_dict = stats.to_dict()
+        stats_dict.pop("timings", None)
+        stats_dict.pop("paragraph_memo", None)
+        data = json.dumps({"spans": list(spans), "stats": stats_dict})
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Error writing cache entry {path}: {str(e)}")
+            return
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+            Delete least recently used entries until the cache is below 90% of its size limit.
+        """
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+                self._size -= size
+            except OSError:
+                pass
+
+    def clear(self) -> int:
+        """
+            Delete every cache entry.
+            Returns:
+                int: Number of entries deleted.
+        """
+        removed = 0
+        for _, path, _ in list(self._entries()):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        self._size = 0
+        return removed
+
+
+def file_sha256(path: str) -> str:
+    """
+        Hash a file's bytes without loading it whole.
+        Args:
+            path: The file path.
+        Returns:
+            str: The hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    def __init__(self, path: str, resume: bool = False):
+        """
+            Append-only JSONL record of the files a run has completed, one line per file, written as each
+            file finishes so a killed run can be resumed.
+            Args:
+                path: The manifest file.
+                resume: Keep the records of an earlier run and append to them; otherwise start a new manifest.
+        """
+        self.path = Path(path)
+        self.completed: Dict[str, dict] = self.read(self.path) if resume else {}
+        if resume and self.path.exists() and self.path.stat().st_size:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                # A run killed mid-write leaves a partial last line; start the next record on a new line
+                needs_newline = f.read(1) != b'\n'
+        else:
+            needs_newline = False
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+
+    @staticmethod
+    def read(path: Path) -> Dict[str, dict]:
+        """
+            Read the completed-file records of a manifest, skipping lines that are not valid records.
+            Args:
+                path: The manifest file.
+            Returns:
+                Dict: The latest record per absolute input path.
+        """
+        records = {}
+        if not path.exists():
+            return records
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get("status") == "done":
+                    records[record["path"]] = record
+        return records
+
+    def resumable(self, input_path: str, output_path: Path) -> RedactionStats:
+        """
+            Check whether a file was completed by an earlier run and is unchanged since: its size and
+            modification time are as recorded, or failing that, its content hash is.
+            Tar archives are always processed again, as their members are recorded one by one.
+            Args:
+                input_path: The input file.
+                output_path: Where its output was written.
+            Returns:
+                RedactionStats: The statistics recorded for it, or None if it has to be processed.
+        """
+        record = self.completed.get(os.path.abspath(input_path))
+        if record is None or record["sha256"] is None or not output_path.exists():
+            return None
+        try:
+            stat = os.stat(input_path)
+            if (stat.st_size, stat.st_mtime_ns) != (record.get("size"), record.get("mtime_ns")) and \
+                    file_sha256(input_path) != record["sha256"]:
+                return None
+        except OSError:
+            return None
+        return RedactionStats.from_dict(record["stats"])
+
+    def append(self, input_path: str, output_path: Path, stats: RedactionStats):
+        """
+            Record a completed file. The line is flushed right away, so it survives the process being killed.
+            Args:
+                input_path: The input file, or a tar member ("<archive>::<member>").
+                output_path: Where its output was written.
+                stats: The file's statistics. Its source (the hash, size and modification time of the input as it
+                    was read) is recorded; files without one, such as tar members, are never resumed.
+        """
+        source = stats.source or {"sha256": None}
+        record = {
+            "path": os.path.abspath(input_path),
+            "output": str(output_path),
+            **source,
+            "status": "done",
+            "seconds": round(stats.seconds, 6),
+            "completed_at": round(time.time(), 3),
+            "stats": stats.to_dict(),
+        }
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def load_spacy_model(name: str, exclude: Tuple[str, ...] = ()) -> spacy.language.Language:
+    """
+        Load a spaCy pipeline.
+        Args:
+            name: Package name or path of the pipeline.
+            exclude: Components not to load.
+        Returns:
+            spacy.language.Language: The pipeline.
+    """
+    import spacy
+
+    return spacy.load(name, exclude=list(exclude))
+
+
+def load_sentence_model(name: str):
+    """
+        Load a sentence transformer.
+        Args:
+            name: Hub id or path of the model.
+        Returns:
+            SentenceTransformer: The model.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name)
+
+
+# Loader of each kind of model kept in the ModelRegistry
+MODEL_LOADERS = {'spacy': load_spacy_model, 'sentence_transformer': load_sentence_model}
+
+
+class ModelRegistry:
+    def __init__(self):
+        """
+            Process-wide store of loaded models, keyed by kind, name and loading options, so every Redactor,
+            test and embedding caller of a process shares one copy of each model instead of loading its own.
+            Concurrent requests for a model that is not loaded yet wait for a single load.
+        """
+        self._models: Dict[Tuple, object] = {}
+        self._loading: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind: str, name: str, **options) -> Tuple:
+        """
+            Build the key of a model.
+            Args:
+                kind: A key of MODEL_LOADERS.
+                name: Name or path of the model.
+                options: Keyword arguments of the loader.
+            Returns:
+                Tuple: The hashable key.
+        """
+        return kind, name, tuple(sorted((option, tuple(value) if isinstance(value, list) else value)
+                                        for option, value in options.items()))
+
+    def get(self, kind: str, name: str, **options):
+        """
+            Get a model, loading it on first use. Loading errors are raised to every caller and not remembered,
+            so a later call tries again.
+            Args:
+                kind: A key of MODEL_LOADERS.
+                name: Name or path of the model.
+                options: Keyword arguments of the loader.
+            Returns:
+                The shared model.
+        """
+        key = self.key(kind, name, **options)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            if key not in self._models:
+                self._models[key] = MODEL_LOADERS[kind](name, **options)
+            return self._models[key]
+
+    def spacy(self, name: str) -> spacy.language.Language:
+        """
+            Get a spaCy pipeline without the components no detector needs, as Redactor uses it.
+            Args:
+                name: Package name or path of the pipeline.
+            Returns:
+                spacy.language.Language: The shared pipeline.
+        """
+        return self.get('spacy', name, exclude=UNUSED_SPACY_COMPONENTS)
+
+    def sentence_model(self, name: str = SENTENCE_MODEL):
+        """
+            Get a sentence transformer.
+            Args:
+                name: Hub id or path of the model.
+            Returns:
+                SentenceTransformer: The shared model.
+        """
+        return self.get('sentence_transformer', name)
+
+    def loaded(self) -> List[Tuple]:
+        """
+            Returns:
+                List: The keys of the models currently loaded.
+        """
+        return list(self._models)
+
+    def release(self, kind: str = None, name: str = None) -> int:
+        """
+            Drop models from the registry. Their memory is freed once no Redactor still holds them.
+            Args:
+                kind: Only drop models of this kind.
+                name: Only drop models of this name.
+            Returns:
+                int: The number of models dropped.
+        """
+        with self._lock:
+            keys = [key for key in self._models
+                    if (kind is None or key[0] == kind) and (name is None or key[1] == name)]
+            for key in keys:
+                del self._models[key]
+        return len(keys)
+
+
+# Models shared by everything in this process
+MODELS = ModelRegistry()
+
+
+class Redactor:
+    def __init__(self, model_tier: str = DEFAULT_MODEL_TIER, model: str = None,
+                 address_countries: Iterable[str] = ADDRESS_COUNTRIES):
+        """
+            Compiles regex patterns. The NER and sentence embedding models are taken from the process-wide
+            MODELS registry the first time a detector that needs them runs, so they are loaded once per process.
+            Args:
+                model_tier: Accuracy/speed tier of the spaCy NER pipeline, a key of MODEL_TIERS.
+                model: Optional spaCy package name or path overriding the tier's pipeline.
+                address_countries: Countries whose address formats are detected with pyap.
+        """
+        if model is None and model_tier not in MODEL_TIERS:
+            raise ValueError(f"Unknown model tier: {model_tier}")
+        self.model_tier = model_tier
+        self.model_name = model or MODEL_TIERS[model_tier]
+        self._nlp = None
+        self._sentence_model = None
+        self._sentence_model_loaded = False
+        self.stats = RedactionStats()
+        self._concept_indexes: Dict[Tuple[str, ...], ConceptIndex] = {}
+        # Precomputed index loaded with --concept-store, used whenever its vocabulary is requested
+        self.concept_store: ConceptIndex = None
+        # Line embeddings encoded up front for a batch of texts (see shared_concept_embeddings())
+        self._shared_embeddings: Dict[str, np.ndarray] = None
+
+        self.scanner = RegexScanner(address_countries)
+        self.cache: RedactionCache = None
+        # Record per-stage timings in the statistics (--profile)
+        self.profile = False
+        # Only parse candidate sentences with the NER model (--ner-prefilter)
+        self.ner_prefilter: NerPrefilter = None
+        # Known entities matched in every document (--gazetteer), and whether detected ones are added to it
+        self.gazetteer: Gazetteer = None
+        self.update_gazetteer = False
+        # Spans of paragraphs seen before, reused by offset translation (--paragraph-memo)
+        self.paragraph_memo: ParagraphMemo = None
+        # cache_config() of each detector selection, serialized, and the gazetteer digest it was made with
+        self._cache_configs: Dict[tuple, Tuple[dict, str, str]] = {}
+        # Run the regex and pyap scans on a helper thread while the NER model parses the same text
+        self.concurrent_scan = True
+        self._scan_executor: ThreadPoolExecutor = None
+        # Only hits starting in this [start, end) range are counted (see counting_region())
+        self._count_region: Tuple[int, int] = None
+        self.phone_pattern = self.scanner.phone_pattern
+        self.date_pattern = self.scanner.date_pattern
+        self.address_patterns = self.scanner.address_patterns
+
+        # Load Hugging Face NER model for additional entity recognition
+        # self.tokenizer = AutoTokenizer.from_pretrained("dslim/bert-base-NER")
+        # self.ner_model = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER")
+        # self.ner_pipeline = pipeline("ner", model=self.ner_model, tokenizer=self.tokenizer, aggregation_strategy="simple")
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> 'Redactor':
+        """
+            Create a Redactor configured by the parsed command-line arguments.
+            Args:
+                args: The parsed command-line arguments.
+            Returns:
+                Redactor: The configured Redactor.
+        """
+        redactor = cls(model_tier=args.model_tier, model=args.model, address_countries=args.address_countries)
+        if args.cache_dir:
+            redactor.cache = RedactionCache(args.cache_dir, args.cache_max_size * 1024 * 1024)
+        redactor.profile = bool(args.profile or args.profile_output)
+        if args.ner_prefilter:
+            redactor.ner_prefilter = NerPrefilter()
+        if args.concept_store:
+            redactor.concept_store = ConceptIndex.load(args.concept_store)
+        if args.gazetteer:
+            redactor.gazetteer = Gazetteer.load(args.gazetteer) if os.path.exists(args.gazetteer) else Gazetteer()
+            redactor.update_gazetteer = args.update_gazetteer
+        if args.paragraph_memo:
+            redactor.paragraph_memo = ParagraphMemo(args.paragraph_memo_size)
+        redactor.concurrent_scan = not args.no_concurrent_scan
+        return redactor
+
+    @property
+    def nlp(self) -> spacy.language.Language:
+        """
+            The spaCy pipeline, loaded on first use without the components no detector needs.
+        """
+        return self.load_nlp()
+
+    def load_nlp(self) -> spacy.language.Language:
+        """
+            Load the spaCy pipeline if it is not loaded yet. Called ahead of timed stages, so the load time
+            is recorded under 'load_nlp' rather than in the stage that first uses the model.
+            Returns:
+                spacy.language.Language: The pipeline.
+        """
+        if self._nlp is None:
+            with self.stage('load_nlp'):
+                self._nlp = MODELS.spacy(self.model_name)
+        return self._nlp
+
+    @property
+    def sentence_model(self):
+        """
+            The sentence transformer for semantic concept matching, loaded on first use.
+            None if it could not be loaded.
+        """
+        if not self._sentence_model_loaded:
+            self._sentence_model_loaded = True
+            try:
+                with self.stage('load_sentence_model'):
+                    self._sentence_model = MODELS.sentence_model()
+            except Exception as e:
+                logging.error(f"Error loading sentence transformer: {str(e)}")
+        return self._sentence_model
+
+    def warm_up(self, flags: argparse.Namespace):
+        """
+            Load the models the requested detectors need now, rather than while redacting the first document.
+            Args:
+                flags: Redaction flags.
+        """
+        if self.needs_nlp(flags):
+            self.load_nlp()
+        if flags.concept:
+            self.sentence_model
+
+    def release_models(self):
+        """
+            Drop this Redactor's models and remove them from the MODELS registry, so their memory is freed
+            once no other Redactor holds them. They are loaded again if needed.
+        """
+        MODELS.release('spacy', self.model_name)
+        MODELS.release('sentence_transformer', SENTENCE_MODEL)
+        self._nlp = None
+        self._sentence_model = None
+        self._sentence_model_loaded = False
+
+    def close(self):
+        """
+            Shut down the scan thread of --concurrent-scan (see find_spans()). The Redactor stays usable;
+            the thread is started again when needed.
+        """
+        if self._scan_executor is not None:
+            self._scan_executor.shutdown()
+            self._scan_executor = None
+
+    def parse(self, text: str) -> spacy.tokens.Doc:
+        """
+            Run the NER model over the text, or with the NER prefilter on, over its candidate chunks only.
+            Args:
+                text: The text.
+            Returns:
+                spacy.tokens.Doc: The parsed document, or a PrefilteredDoc.
+        """
+        if self.ner_prefilter is None:
+            return self.nlp(text)
+        doc, _ = next(self.pipe([(text, None)]))
+        return doc
+
+    def pipe(self, items: Iterable[Tuple[str, object]], batch_size: int = 32) -> Iterator[Tuple[spacy.tokens.Doc, object]]:
+        """
+            Like nlp.pipe(items, as_tuples=True), but with the NER prefilter on, only the candidate chunks
+            of the texts are parsed (all chunks in shared batches) and PrefilteredDocs are yielded.
+            Args:
+                items: (text, context) pairs.
+                batch_size: Number of texts, or chunks, per batch.
+            Yields:
+                Tuple: The parsed document and the context, in input order.
+        """
+        if self.ner_prefilter is None:
+            yield from self.nlp.pipe(items, batch_size=batch_size, as_tuples=True)
+            return
+        planned = [(text, context, self.ner_prefilter.candidate_chunks(text)) for text, context in items]
+        parsed = self.nlp.pipe(((text[start:end], start) for text, _, chunks in planned for start, end in chunks),
+                          batch_size=batch_size, as_tuples=True)
+        for text, context, chunks in planned:
+            ents = []
+            for chunk_doc, offset in itertools.islice(parsed, len(chunks)):
+                ents.extend(PrefilteredEntity(ent.text, ent.label_, ent.start_char + offset, ent.end_char + offset)
+                            for ent in chunk_doc.ents)
+            yield PrefilteredDoc(text, ents, sum(end - start for start, end in chunks)), context
+
+    @staticmethod
+    def needs_nlp(flags: argparse.Namespace) -> bool:
+        """
+            Whether any requested detector uses spaCy entities (names, dates and addresses do;
+            phones and concepts do not).
+            Args:
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                bool: True if the NLP pass is required.
+        """
+        return bool(flags.names or flags.dates or flags.address)
+
+    @staticmethod
+    def regex_categories(flags: argparse.Namespace) -> List[str]:
+        """
+            The RegexScanner categories the requested detectors use.
+            Args:
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                List: Categories to pass to RegexScanner.scan().
+        """
+        categories = []
+        if flags.names:
+            categories.append('emails')
+        if flags.dates:
+            categories.append('dates')
+        if flags.phones:
+            categories.append('phones')
+        if flags.address:
+            categories.append('addresses')
+        return categories
+
+    @contextmanager
+    def collecting_stats(self, merge: bool = True) -> Iterator[RedactionStats]:
+        """
+            Collect the statistics of the enclosed redactions in a fresh RedactionStats.
+            Args:
+                merge: Whether to add the collected counts back into self.stats afterwards.
+            Yields:
+                RedactionStats: Statistics for the enclosed redactions only.
+        """
+        outer = self.stats
+        collected = RedactionStats()
+        self.stats = collected
+        try:
+            yield collected
+        finally:
+            self.stats = outer
+            if merge:
+                outer.merge(collected)
+
+    @contextmanager
+    def counting_region(self, start: int, end: int) -> Iterator[None]:
+        """
+            Only count the detector hits starting in [start, end) of the text in the enclosed block. Stream
+            windows are analysed with context lines that their neighbours count.
+            Args:
+                start: Start offset of the counted region.
+                end: End offset of the counted region.
+        """
+        outer = self._count_region
+        self._count_region = (start, end)
+        try:
+            yield
+        finally:
+            self._count_region = outer
+
+    def count_hit(self, counter: str, start: int) -> bool:
+        """
+            Count one detector hit in the statistics. Every hit counts, also when another detector found
+            the same span, unless it starts outside the counting region.
+            Args:
+                counter: The RedactionStats counter, e.g. 'names_count'.
+                start: Start offset of the hit.
+            Returns:
+                bool: Whether the hit was counted.
+        """
+        region = self._count_region
+        if region is not None and not region[0] <= start < region[1]:
+            return False
+        setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+        return True
+
+    @contextmanager
+    def stage(self, name: str, chars: int = 0, stats: RedactionStats = None, thread: bool = False) -> Iterator[dict]:
+        """
+            Time the enclosed block as one run of a pipeline stage, if profiling is on.
+            Args:
+                name: The stage name.
+                chars: Characters of text the block processes.
+                stats: Statistics to record into; the current self.stats if omitted.
+                thread: Count the CPU time of this thread only, for blocks running alongside other stages.
+            Yields:
+                dict: {"chars": chars}, which the block may update once it knows the size (e.g. after reading).
+        """
+        size = {"chars": chars}
+        if not self.profile:
+            yield size
+            return
+        cpu_clock = time.thread_time if thread else time.process_time
+        wall, cpu = time.perf_counter(), cpu_clock()
+        try:
+            yield size
+        finally:
+            (stats or self.stats).add_timing(name, time.perf_counter() - wall, cpu_clock() - cpu, size["chars"])
+
+    def redact_text(self, text: str, redact_chars: str = '█') -> str:
+        """
+            Add redaction character
+            Args:
+                text: text for redaction
+                redact_chars: Defaults to '█'.
+            Returns:
+                str: The redacted text.
+        """
+        return redact_chars * len(text)
+
+    def redact_email(self, email: str) -> str:
+        """
+            Email redaction.
+            Args:
+                email: input email.
+            Returns:
+                str: redacted email
+        """
+        if '@' not in email:
+            return email  # If it's not a valid email, return it unchanged
+
+        local_part, domain = email.split('@', 1)
+        # Redact each alphabetic character in the local part, while preserving numeric parts
+        redacted_local = ''.join('█' if c.isalpha() else c for c in local_part)
+        return f"{redacted_local}@{domain}"
+
+    def redact_names(self, doc: spacy.tokens.Doc, text: str, hits: Dict[str, List[tuple]] = None) -> Set[tuple]:
+        """
+            Find and mark names for redaction.
+            Args:
+                doc: The spaCy document containing the parsed text.
+                text: The original text.
+                hits: RegexScanner.scan() results including 'emails'; scanned here if omitted.
+            Returns:
+                Set: A set of tuples representing the spans (start, end) of names to be redacted.
+        """
+        spans = set()
+
+        # Redact person names identified by spaCy
+        for ent in doc.ents:
+            if ent.label_ == 'PERSON':
+                spans.add((ent.start_char, ent.end_char))
+                self.count_hit('names_count', ent.start_char)
+
+        # Find and redact email addresses
+        if hits is None:
+            hits = self.scanner.scan(text, ['emails'])
+        for start, end in hits['emails']:
+            original_email = text[start:end]
+
+            # Only add to spans and increment count if the email was actually redacted
+            if original_email != self.redact_email(original_email):
+                spans.add((start, end))
+                self.count_hit('names_count', start)
+
+        return spans
+
+    def redact_dates(self, doc: spacy.tokens.Doc, text: str, hits: Dict[str, List[tuple]] = None) -> Set[tuple]:
+        """
+            Redact dates using regex and spaCy NER.
+            Args:
+                doc: The spaCy document containing the parsed text.
+                text: The original text.
+                hits: RegexScanner.scan() results including 'dates'; scanned here if omitted.
+            Returns:
+                Set: A set of tuples representing the spans (start, end) of dates to be redacted.
+        """
+        spans = set()
+
+        # Redact dates identified by spaCy
+        for ent in doc.ents:
+            if ent.label_ == 'DATE':
+                spans.add((ent.start_char, ent.end_char))
+                self.count_hit('dates_count', ent.start_char)
+
+        # Redact dates using regex patterns
+        if hits is None:
+            hits = self.scanner.scan(text, ['dates'])
+        for span in hits['dates']:
+            spans.add(span)
+            self.count_hit('dates_count', span[0])
+
+        return spans
+
+    def redact_phones(self, text: str, hits: Dict[str, List[tuple]] = None) -> Set[tuple]:
+        """
+            Redact phone numbers using regex.
+            Args:
+                text: The original text.
+                hits: RegexScanner.scan() results including 'phones'; scanned here if omitted.
+            Returns:
+                Set: A set of tuples representing the spans (start, end) of phone numbers to be redacted.
+        """
+        spans = set()
+        if hits is None:
+            hits = self.scanner.scan(text, ['phones'])
+        for span in hits['phones']:
+            spans.add(span)
+            self.count_hit('phones_count', span[0])
+        return spans
+
+    def redact_addresses(self, doc: spacy.tokens.Doc, text: str, hits: Dict[str, List[tuple]] = None) -> Set[tuple]:
+        """
+            Find and mark addresses for redaction using enhanced patterns, spaCy NER, and pyap2.
+            Args:
+                doc: The spaCy document containing the parsed text.
+                text: The original text.
+                hits: RegexScanner.scan() results including 'addresses'; scanned here if omitted.
+            Returns:
+                Set: A set of tuples representing the spans (start, end) of addresses to be redacted.
+        """
+        spans = set()
+        if hits is None:
+            hits = self.scanner.scan(text, ['addresses'])
+
+        # Use enhanced regex patterns for address detection; hits already look like complete addresses
+        for span in hits['addresses']:
+            spans.add(span)
+            self.count_hit('addresses_count', span[0])
+
+        # Use spaCy NER to detect location-based entities
+        context = AddressContext(hits['address_patterns'])
+        for ent in doc.ents:
+            if ent.label_ in ['GPE', 'LOC', 'FAC']:
+                # If an address pattern hit is within 30 characters, it appears to be part of an address
+                start = max(0, ent.start_char - self.scanner.address_context)
+                end = min(len(text), ent.end_char + self.scanner.address_context)
+                if context.overlaps(start, end):
+                    spans.add((ent.start_char, ent.end_char))
+                    self.count_hit('addresses_count', ent.start_char)
+
+        # Use pyap to detect addresses in the text, at every place they occur
+        for span in hits['postal_addresses']:
+            spans.add(span)
+            self.count_hit('addresses_count', span[0])
+
+        return spans
+
+    def _concept_index(self, concepts: List[str], semantic: bool = False) -> ConceptIndex:
+        """
+            Get the ConceptIndex of a concept list: the loaded concept store if it has exactly these
+            concepts, otherwise one built in memory once per run.
+            Args:
+                concepts: A list of concepts (keywords or phrases).
+                semantic: Whether the index needs embeddings, which are then encoded if missing.
+            Returns:
+                ConceptIndex: The index.
+        """
+        key = tuple(concepts)
+        if self.concept_store is not None and key == self.concept_store.key:
+            return self.concept_store
+        index = self._concept_indexes.get(key)
+        if index is None or (semantic and index.embeddings is None):
+            index = ConceptIndex.build(concepts, self.sentence_model) if semantic else ConceptIndex(concepts)
+            self._concept_indexes[key] = index
+        return index
+
+    @staticmethod
+    def _concept_lines(text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+            The non-blank lines concept redaction works on.
+            Args:
+                text: The original text.
+            Yields:
+                Tuple[int, int, str]: The start and end of each line and its lowercased text.
+        """
+        current_pos = 0
+        for line in text.split('\n'):
+            if line.strip():
+                yield current_pos, current_pos + len(line), line.lower()
+            current_pos += len(line) + 1
+
+    def _encode_lines(self, lines: List[str]) -> np.ndarray:
+        """
+            Unit-length sentence embeddings of lowercased lines, reusing those of shared_concept_embeddings().
+            Args:
+                lines: The lines to embed.
+            Returns:
+                np.ndarray: One embedding row per line.
+        """
+        if self._shared_embeddings is None:
+            return normalize_rows(self.sentence_model.encode(lines, convert_to_numpy=True))
+        import numpy as np
+
+        missing = list(dict.fromkeys(line for line in lines if line not in self._shared_embeddings))
+        if missing:
+            self._shared_embeddings.update(zip(missing, normalize_rows(
+                self.sentence_model.encode(missing, convert_to_numpy=True))))
+        return np.stack([self._shared_embeddings[line] for line in lines])
+
+    @contextmanager
+    def shared_concept_embeddings(self, texts: List[str], concepts: List[str]):
+        """
+            Embed the concept candidate lines of many short texts (e.g. the fields of a batch of records)
+            in one sentence encoder call, which redact_concepts() then reuses for each text. Lines shared
+            by several texts are only embedded once. Nested uses add to the embeddings of the outer one.
+            Args:
+                texts: The texts about to be redacted.
+                concepts: The requested concepts; nothing is embedded without them.
+        """
+        outermost = self._shared_embeddings is None
+        if outermost:
+            self._shared_embeddings = {}
+        try:
+            if concepts and self.sentence_model:
+                index = self._concept_index(concepts)
+                lines = [line_lower for text in texts for _, _, line_lower in self._concept_lines(text)
+                         if index.exact_match(line_lower) is None]
+                if lines:
+                    try:
+                        with self.stage('concepts', sum(map(len, lines))):
+                            self._encode_lines(lines)
+                    except Exception as e:
+                        # redact_concepts() embeds and reports the lines of each text on its own instead
+                        logging.warning(f"Error embedding concept candidates: {str(e)}")
+            yield
+        finally:
+            if outermost:
+                self._shared_embeddings = None
+
+    def redact_concepts(self, text: str, concepts: List[str]) -> Set[tuple]:
+        """
+            Redact entire lines containing specific concepts.
+            Args:
+                text: The original text.
+                concepts: A list of concepts (keywords or phrases) to search for in the text.
+            Returns:
+                Set: A set of tuples representing the spans (start, end) of lines to be redacted.
+        """
+
+        spans = set()
+        if not text.strip() or not concepts:
+            return spans
+
+        # Lines without an exact match are matched semantically afterwards, all in one batch
+        index = self._concept_index(concepts)
+        candidates = []
+        for start, end, line_lower in self._concept_lines(text):
+            # Check exact matches first
+            matched_concept = index.exact_match(line_lower)
+            if matched_concept is not None:
+                self.stats.concepts[matched_concept] = self.stats.concepts.get(matched_concept, 0) + 1
+                spans.add((start, end))
+            elif self.sentence_model:
+                candidates.append((start, end, line_lower))
+
+        # Try semantic matching if available and no exact match found
+        if candidates:
+            try:
+                line_embeddings = self._encode_lines([line_lower for _, _, line_lower in candidates])
+                index = self._concept_index(concepts, semantic=True)
+                scores, best = index.search(line_embeddings)
+                for (start, end, _), score, concept_index in zip(candidates, scores, best):
+                    if score > CONCEPT_SIMILARITY_THRESHOLD:
+                        concept = index.concepts[concept_index]
+                        self.stats.concepts[concept] = self.stats.concepts.get(concept, 0) + 1
+                        spans.add((start, end))
+            except Exception as e:
+                logging.warning(f"Error in semantic similarity calculation: {str(e)}")
+
+        return spans
+
+    def cache_config(self, flags: argparse.Namespace) -> dict:
+        """
+            Describe everything besides the text that determines a document's spans, for cache keys.
+            Model identifiers are only included for the detectors that use the model.
+            Computed once per detector selection; only the gazetteer digest is looked up on every call,
+            as the gazetteer can grow during a run.
+            Args:
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                dict: JSON-serializable configuration.
+        """
+        return self._cached_config(flags)[0]
+
+    def cache_fingerprint(self, flags: argparse.Namespace) -> str:
+        """
+            The serialized cache_config(), as used by RedactionCache.key() and ParagraphMemo.key().
+            Args:
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                str: The configuration as canonical JSON.
+        """
+        return self._cached_config(flags)[1]
+
+    def _cached_config(self, flags: argparse.Namespace) -> Tuple[dict, str]:
+        key = (bool(flags.names), bool(flags.dates), bool(flags.phones), bool(flags.address),
+               tuple(flags.concept or ()), self.ner_prefilter is not None, id(self.concept_store))
+        gazetteer_digest = None
+        if self.gazetteer is not None:
+            self.gazetteer.automaton()
+            gazetteer_digest = self.gazetteer.digest
+        cached = self._cache_configs.get(key)
+        if cached is None or cached[2] != gazetteer_digest:
+            config = self._build_cache_config(flags) if cached is None else dict(cached[0])
+            config.pop("gazetteer", None)
+            if gazetteer_digest is not None:
+                config["gazetteer"] = gazetteer_digest
+            cached = self._cache_configs[key] = (config, json.dumps(config, sort_keys=True), gazetteer_digest)
+        return cached[:2]
+
+    def _build_cache_config(self, flags: argparse.Namespace) -> dict:
+        config = {
+            "format": CACHE_FORMAT_VERSION,
+            "names": bool(flags.names),
+            "dates": bool(flags.dates),
+            "phones": bool(flags.phones),
+            "address": bool(flags.address),
+            "concept": list(flags.concept or []),
+        }
+        if self.needs_nlp(flags):
+            config["ner_model"] = [self.model_name, package_version(self.model_name), package_version('spacy')]
+            if self.ner_prefilter is not None:
+                config["ner_prefilter"] = True
+        if flags.address:
+            config["address_countries"] = list(self.scanner.address_countries)
+            config["pyap"] = package_version('pyap2') or package_version('pyap')
+        if flags.concept:
+            config["sentence_model"] = [SENTENCE_MODEL, package_version('sentence-transformers')]
+            if self.concept_store is not None and tuple(flags.concept) == self.concept_store.key:
+                config["concept_store"] = self.concept_store.fingerprint
+        return config
+
+    def scan(self, text: str, categories: List[str], stats: RedactionStats = None,
+             thread: bool = False) -> Dict[str, List[tuple]]:
+        """
+            Run the RegexScanner categories (pyap included) over the text, timing each as a scan_<category> stage.
+            Args:
+                text: The original text.
+                categories: RegexScanner categories to scan for.
+                stats: Statistics to record timings into; the current self.stats if omitted.
+                thread: Whether this runs on the scan thread alongside the NER parse.
+            Returns:
+                Dict: The hits of every category, as returned by RegexScanner.scan().
+        """
+        hits = {}
+        for category in categories:
+            with self.stage(f'scan_{category}', len(text), stats, thread):
+                hits.update(self.scanner.scan(text, [category]))
+        return hits
+
+    def detect_entities(self, text: str, flags: argparse.Namespace,
+                        doc: spacy.tokens.Doc = None) -> Dict[str, Set[tuple]]:
+        """
+            Run the requested name, date, phone and address detectors over the text.
+            Args:
+                text: The original text.
+                flags: The parsed command-line arguments containing redaction options.
+                doc: Optional spaCy document already parsed from text (e.g. by nlp.pipe).
+            Returns:
+                Dict: The spans found by each detector, keyed by its RedactionStats counter.
+        """
+        categories = self.regex_categories(flags)
+        scan = None
+        if doc is None and self.needs_nlp(flags):
+            # Loaded before the scans start, so they never overlap a model load
+            self.load_nlp()
+            if categories and self.concurrent_scan:
+                # The scans do not need the parse: they run while the model computes, which releases the GIL
+                if self._scan_executor is None:
+                    self._scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='redactor-scan')
+                scan = self._scan_executor.submit(self.scan, text, categories, self.stats, True)
+            with self.stage('nlp', len(text)):
+                doc = self.parse(text)
+        if isinstance(doc, PrefilteredDoc):
+            self.stats.ner_chars += len(text)
+            self.stats.ner_chars_parsed += doc.parsed_chars
+        hits = scan.result() if scan is not None else self.scan(text, categories)
+
+        detected = {}
+        if flags.names:
+            with self.stage('names'):
+                detected['names_count'] = self.redact_names(doc, text, hits)
+        if flags.dates:
+            with self.stage('dates'):
+                detected['dates_count'] = self.redact_dates(doc, text, hits)
+        if flags.phones:
+            with self.stage('phones'):
+                detected['phones_count'] = self.redact_phones(text, hits)
+        if flags.address:
+            with self.stage('addresses'):
+                detected['addresses_count'] = self.redact_addresses(doc, text, hits)
+        if self.gazetteer is not None:
+            with self.stage('gazetteer', len(text)):
+                self.apply_gazetteer(text, flags, detected)
+        return detected
+
+    def apply_gazetteer(self, text: str, flags: argparse.Namespace, detected: Dict[str, Set[tuple]]):
+        """
+            Learn the names and addresses the detectors found (with --update-gazetteer), then add the
+            gazetteer hits of the requested categories that the detectors missed.
+            Args:
+                text: The original text.
+                flags: The parsed command-line arguments containing redaction options.
+                detected: The spans found by each detector, keyed by RedactionStats counter; updated in place.
+        """
+        if self.update_gazetteer:
+            for category, (_, counter) in GAZETTEER_CATEGORIES.items():
+                for start, end in detected.get(counter, ()):
+                    if self.gazetteer.add(text[start:end], category):
+                        self.stats.gazetteer_learned[text[start:end]] = category
+
+        # Per counter: the starts of the detected spans in order, the furthest end reached by each prefix of
+        # them, and the furthest end of the hits added so far. As hits come in start order, a hit is covered
+        # if a span starting at or before it reaches its end, found by bisection
+        coverage = {}
+        added_end = {}
+        for start, end, category in sorted(self.gazetteer.matches(text), key=lambda hit: (hit[0], -hit[1])):
+            flag, counter = GAZETTEER_CATEGORIES[category]
+            if not getattr(flags, flag):
+                continue
+            found = detected.setdefault(counter, set())
+            if counter not in coverage:
+                spans = sorted(found)
+                coverage[counter] = ([span_start for span_start, _ in spans],
+                                     list(itertools.accumulate((span_end for _, span_end in spans), max)))
+            starts, reach = coverage[counter]
+            i = bisect.bisect_right(starts, start)
+            if (i and reach[i - 1] >= end) or added_end.get(counter, -1) >= end:
+                continue
+            added_end[counter] = end
+            found.add((start, end))
+            if self.count_hit(counter, start):
+                self.stats.gazetteer_hits += 1
+
+    def find_spans(self, text: str, flags: argparse.Namespace, doc: spacy.tokens.Doc = None) -> RedactionSpans:
+        """
+            Run all requested detectors over the text.
+            Args:
+                text: The original text.
+                flags: The parsed command-line arguments containing redaction options.
+                doc: Optional spaCy document already parsed from text (e.g. by nlp.pipe); not needed
+                    when only regex detectors are requested.
+            Returns:
+                RedactionSpans: The spans to be redacted.
+        """
+        spans_to_redact = RedactionSpans()
+        for found in self.detect_entities(text, flags, doc).values():
+            spans_to_redact.update(found)
+
+        if flags.concept:
+            with self.stage('concepts', len(text)):
+                spans_to_redact.update(self.redact_concepts(text, flags.concept))
+
+        return spans_to_redact
+
+    def find_spans_memoized(self, text: str, flags: argparse.Namespace) -> RedactionSpans:
+        """
+            Run all requested detectors paragraph by paragraph, taking the spans and counts of paragraphs seen
+            before from the paragraph memo. The unseen paragraphs of the text are parsed in one nlp.pipe call,
+            and their concept candidate lines embedded in one sentence encoder call. Spans never cross paragraphs.
+            Args:
+                text: The original text.
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                RedactionSpans: The spans to be redacted.
+        """
+        config = self.cache_fingerprint(flags)
+        spans_to_redact = RedactionSpans()
+        missed = []
+        for paragraph in split_paragraphs(text):
+            key = ParagraphMemo.key(paragraph.text, config) if len(paragraph.text) >= PARAGRAPH_MEMO_MIN_CHARS else None
+            entry = None
+            if key is not None:
+                # Paragraphs too short to be remembered are not counted as memo lookups
+                entry = self.paragraph_memo.get(key)
+                self.stats.memo_paragraphs += 1
+            if entry is None:
+                missed.append((paragraph, key))
+                continue
+            spans, counts = entry
+            self.stats.memo_hits += 1
+            self.stats.merge(counts)
+            spans_to_redact.update(paragraph.translate(start, end) for start, end in spans)
+
+        docs = [None] * len(missed)
+        if missed and self.needs_nlp(flags):
+            self.load_nlp()
+            with self.stage('nlp', sum(len(paragraph.text) for paragraph, _ in missed)):
+                docs = [doc for doc, _ in self.pipe([(paragraph.text, i) for i, (paragraph, _) in enumerate(missed)])]
+        with self.shared_concept_embeddings([paragraph.text for paragraph, _ in missed], flags.concept):
+            for (paragraph, key), doc in zip(missed, docs):
+                with self.collecting_stats() as paragraph_stats:
+                    spans = self.find_spans(paragraph.text, flags, doc).merged()
+                if key is not None:
+                    self.paragraph_memo.put(key, spans, paragraph_stats.detection_counts())
+                spans_to_redact.update(paragraph.translate(start, end) for start, end in spans)
+        return spans_to_redact
+
+    def redact_from_cache(self, text: str, flags: argparse.Namespace) -> str:
+        """
+            Redact text from the spans cached for it, if the cache has an entry for it.
+            Args:
+                text: The original text.
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                str: The redacted text, or None if caching is off or the text is not cached.
+        """
+        if self.cache is None:
+            return None
+        with self.stage('cache_lookup', len(text)):
+            cached = self.cache.get(self.cache.key(text, self.cache_fingerprint(flags)))
+        if cached is None:
+            return None
+        spans, cached_stats = cached
+        self.stats.merge(cached_stats)
+        with self.stage('render', len(text)):
+            return spans.render(text)
+
+    def redact_content(self, text: str, flags: argparse.Namespace, doc: spacy.tokens.Doc = None) -> str:
+        """
+            Apply all requested redactions to text that has already been loaded.
+            Args:
+                text: The original text.
+                flags: The parsed command-line arguments containing redaction options.
+                doc: Optional spaCy document already parsed from text (e.g. by nlp.pipe); not needed
+                    when only regex detectors are requested. Callers passing a doc are expected to
+                    have tried redact_from_cache() first.
+            Returns:
+                str: The redacted text.
+        """
+        if doc is None:
+            redacted_text = self.redact_from_cache(text, flags)
+            if redacted_text is not None:
+                return redacted_text
+
+        with self.collecting_stats() as file_stats:
+            if self.paragraph_memo is not None and doc is None:
+                spans_to_redact = self.find_spans_memoized(text, flags)
+            else:
+                spans_to_redact = self.find_spans(text, flags, doc)
+            self.stats.files_processed += 1
+
+        if self.cache is not None:
+            with self.stage('cache_store'):
+                self.cache.put(self.cache.key(text, self.cache_fingerprint(flags)), spans_to_redact, file_stats)
+
+        with self.stage('render', len(text)):
+            return spans_to_redact.render(text)
+
+    def redact_document(self, input_path: str, flags: argparse.Namespace) -> str:
+        """
+            Process a single document and apply all requested redactions.
+            Args:
+                input_path: The path to the input file.
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                str: The redacted text.
+        """
+        with self.stage('read') as size, open_text(input_path, compression=compression_of(input_path)) as f:
+            text = f.read()
+            size["chars"] = len(text)
+
+        return self.redact_content(text, flags)
+
+    def redact_documents(self, input_paths: Iterable[str], flags: argparse.Namespace,
+                         batch_size: int = 32, prefetch: int = 0) -> Iterator[Tuple[str, str, RedactionStats]]:
+        """
+            Process many documents, streaming them through nlp.pipe in length-bucketed batches.
+            Files are read ahead BATCH_SORT_WINDOW batches at a time and grouped by length so
+            short documents are never padded up to long ones in the same batch.
+            Args:
+                input_paths: The paths to the input files.
+                flags: The parsed command-line arguments containing redaction options.
+                batch_size: Number of documents per nlp.pipe batch.
+                prefetch: Number of files a background thread may read ahead (see read_files()).
+            Yields:
+                Tuple[str, str, RedactionStats]: The input path, its redacted text and its statistics,
+                not necessarily in input order.
+        """
+        window = []
+        # Statistics (read and cache lookup timings) of the documents waiting in the window
+        read_stats: Dict[str, RedactionStats] = {}
+        for (input_path, text, error, source), wall, cpu in timed_iter(read_files(input_paths, prefetch)):
+            if error is not None:
+                logging.error(f"Error processing {input_path}: {str(error)}")
+                continue
+            started = time.perf_counter()
+            try:
+                # Cached documents are rendered right away and never reach nlp.pipe
+                with self.collecting_stats(merge=False) as file_stats:
+                    if self.profile:
+                        file_stats.add_timing('read', wall, cpu, len(text))
+                    redacted_text = self.redact_from_cache(text, flags)
+                file_stats.source = source
+                file_stats.seconds += wall + time.perf_counter() - started
+            except Exception as e:
+                logging.error(f"Error processing {input_path}: {str(e)}")
+                continue
+            if redacted_text is not None:
+                self.stats.merge(file_stats)
+                yield input_path, redacted_text, file_stats
+                continue
+            window.append((text, input_path))
+            read_stats[input_path] = file_stats
+
+            if len(window) >= batch_size * BATCH_SORT_WINDOW:
+                yield from self._redact_window(window, flags, batch_size, read_stats)
+                window = []
+
+        if window:
+            yield from self._redact_window(window, flags, batch_size, read_stats)
+
+    def _redact_window(self, window: List[Tuple[str, str]], flags: argparse.Namespace,
+                       batch_size: int, read_stats: Dict[str, RedactionStats] = None
+                       ) -> Iterator[Tuple[str, str, RedactionStats]]:
+        """
+            Redact a window of loaded documents, one nlp.pipe call per length bucket.
+            Args:
+                window: (text, input_path) pairs.
+                flags: The parsed command-line arguments containing redaction options.
+                batch_size: Number of documents per nlp.pipe batch.
+                read_stats: Statistics already collected for the documents while loading them, by path;
+                    entries are consumed.
+            Yields:
+                Tuple[str, str, RedactionStats]: The input path, its redacted text and its statistics.
+        """
+        read_stats = read_stats if read_stats is not None else {}
+        # With the paragraph memo, each document parses only its unseen paragraphs, in one batch of its own
+        if not self.needs_nlp(flags) or self.paragraph_memo is not None:
+            for text, input_path in window:
+                started = time.perf_counter()
+                try:
+                    with self.collecting_stats() as file_stats:
+                        if input_path in read_stats:
+                            file_stats.merge(read_stats.pop(input_path))
+                        redacted_text = self.redact_content(text, flags)
+                except Exception as e:
+                    logging.error(f"Error processing {input_path}: {str(e)}")
+                    continue
+                file_stats.seconds += time.perf_counter() - started
+                yield input_path, redacted_text, file_stats
+            return
+
+        window = sorted(window, key=lambda item: len(item[0]))
+        for _, bucket in itertools.groupby(window, key=lambda item: len(item[0]).bit_length()):
+            bucket = list(bucket)
+            done = set()
+            try:
+                with self.collecting_stats(merge=False) as load_stats:
+                    self.load_nlp()
+                # A model load triggered here is charged to the first document, as in unbatched runs
+                read_stats.setdefault(bucket[0][1], RedactionStats()).merge_timings(load_stats)
+                pipe = self.pipe(bucket, batch_size)
+                for (doc, input_path), wall, cpu in timed_iter(pipe):
+                    done.add(input_path)
+                    started = time.perf_counter()
+                    try:
+                        with self.collecting_stats() as file_stats:
+                            if input_path in read_stats:
+                                file_stats.merge(read_stats.pop(input_path))
+                            if self.profile:
+                                file_stats.add_timing('nlp', wall, cpu, len(doc.text))
+                            redacted_text = self.redact_content(doc.text, flags, doc)
+                    except Exception as e:
+                        logging.error(f"Error processing {input_path}: {str(e)}")
+                        continue
+                    # The document's share of the batch parse is the time the pipe took to produce it
+                    file_stats.seconds += wall + time.perf_counter() - started
+                    yield input_path, redacted_text, file_stats
+            except Exception as e:
+                # A failing batch should only cost its own files, so retry them one at a time
+                logging.warning(f"Batched NLP failed, falling back to per-document processing: {str(e)}")
+                for text, input_path in bucket:
+                    if input_path in done:
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        with self.collecting_stats() as file_stats:
+                            if input_path in read_stats:
+                                file_stats.merge(read_stats.pop(input_path))
+                            redacted_text = self.redact_content(text, flags)
+                    except Exception as e:
+                        logging.error(f"Error processing {input_path}: {str(e)}")
+                        continue
+                    file_stats.seconds += time.perf_counter() - started
+                    yield input_path, redacted_text, file_stats
+
+    def redact_texts(self, items: List[Tuple[str, object]], flags: argparse.Namespace,
+                     batch_size: int = 32) -> Iterator[Tuple[object, str, RedactionStats]]:
+        """
+            Redact many in-memory texts together: they share nlp.pipe calls, grouped by length, and one
+            sentence encoder call for their concept candidate lines. Texts found in the cache are rendered
+            right away and never reach either.
+            Args:
+                items: (text, key) pairs; keys must be unique and are used in error messages.
+                flags: The parsed command-line arguments containing redaction options.
+                batch_size: Number of texts per nlp.pipe batch.
+            Yields:
+                Tuple[object, str, RedactionStats]: The key, the redacted text and its statistics, not
+                necessarily in input order. Texts that failed are logged and left out.
+        """
+        missed = []
+        # Statistics (cache lookup timings) of the texts that were not cached
+        lookup_stats: Dict[object, RedactionStats] = {}
+        for text, key in items:
+            try:
+                with self.collecting_stats(merge=False) as text_stats:
+                    redacted_text = self.redact_from_cache(text, flags)
+            except Exception as e:
+                logging.error(f"Error processing {key}: {str(e)}")
+                continue
+            if redacted_text is not None:
+                self.stats.merge(text_stats)
+                yield key, redacted_text, text_stats
+                continue
+            missed.append((text, key))
+            lookup_stats[key] = text_stats
+
+        with self.shared_concept_embeddings([text for text, _ in missed], flags.concept):
+            yield from self._redact_window(missed, flags, batch_size, lookup_stats)
+
+    def can_redact_mapped(self, flags: argparse.Namespace) -> bool:
+        """
+            Whether redact_mapped() can handle the requested redactions. Only phones qualify: the other
+            detectors also rely on spaCy entities or sentence embeddings, which need decoded text.
+            Args:
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                bool: True if only phones are requested, no cache is in use and outputs are not compressed.
+        """
+        return bool(flags.phones and not (flags.names or flags.dates or flags.address or flags.concept)
+                    and self.cache is None and not getattr(flags, 'compress_output', None))
+
+    def redact_mapped(self, input_path: str, output_path: str, flags: argparse.Namespace) -> bool:
+        """
+            Redact phone numbers by running the byte-level pattern over a memory map of the file and copying
+            unchanged byte ranges straight to the output, without ever decoding the file into a str.
+            The output is identical to redact_document(), so files that pattern could disagree on
+            (non-ASCII or carriage returns) are left to the regular path.
+            Args:
+                input_path: The path to the input file.
+                output_path: The path to write the redacted text to.
+                flags: The parsed command-line arguments; can_redact_mapped(flags) must be true.
+            Returns:
+                bool: True if the file was redacted, False if it has to take the regular path instead.
+        """
+        if compression_of(input_path) or is_tar_archive(input_path):
+            return False
+        fill = '█'.encode('utf-8')
+        tmp_path = temporary_path(Path(output_path))
+        with open(input_path, 'rb') as src:
+            stat = os.fstat(src.fileno())
+            size = stat.st_size
+            digest = hashlib.sha256()
+            # Empty files cannot be mapped, and their output is empty
+            mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            try:
+                # Checked (and hashed for the --manifest) a chunk at a time so the check does not pull the
+                # whole file into memory either
+                for offset in range(0, size, MAPPED_RELEASE_BYTES):
+                    if self.scanner.mapped_unsafe_pattern.search(mapped, offset, offset + MAPPED_RELEASE_BYTES):
+                        return False
+                    digest.update(mapped[offset:offset + MAPPED_RELEASE_BYTES])
+                    release_mapped_pages(mapped, offset, offset + MAPPED_RELEASE_BYTES)
+                if size and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+                phones = 0
+                with self.stage('mmap_phones', size), memoryview(mapped) as view:
+                    try:
+                        with open(tmp_path, 'wb') as dst:
+                            last_end = released = 0
+                            for match in self.scanner.phone_bytes_pattern.finditer(mapped):
+                                start, end = match.span()
+                                dst.write(view[last_end:start])
+                                dst.write(fill * (end - start))
+                                last_end = end
+                                phones += 1
+                                # The scan never looks back, so pages behind it can leave the resident set
+                                if last_end - released >= MAPPED_RELEASE_BYTES:
+                                    released = release_mapped_pages(mapped, released, last_end)
+                            dst.write(view[last_end:])
+                        os.replace(tmp_path, output_path)
+                    except BaseException:
+                        tmp_path.unlink(missing_ok=True)
+                        raise
+            finally:
+                if size:
+                    mapped.close()
+
+        self.stats.phones_count += phones
+        self.stats.files_processed += 1
+        self.stats.source = {"sha256": digest.hexdigest(), "size": size, "mtime_ns": stat.st_mtime_ns}
+        return True
+
+    def redact_stream(self, input_path: str, output_path: str, flags: argparse.Namespace,
+                      window_lines: int = STREAM_WINDOW_LINES, overlap_lines: int = STREAM_OVERLAP_LINES,
+                      source=None):
+        """
+            Redact a file of any size in line windows, writing output as each window is finished.
+            Every window is analysed together with overlap_lines of context on both sides, so entities
+            and addresses crossing a window boundary are still found; memory stays bounded by the
+            window size rather than the file size.
+            Args:
+                input_path: The path to the input file.
+                output_path: The path to write the redacted text to.
+                flags: The parsed command-line arguments containing redaction options.
+                window_lines: Number of lines redacted and written per window.
+                overlap_lines: Number of context lines shared with each neighbouring window.
+                source: Binary file object to read instead of opening input_path, e.g. a tar member.
+                    Input and output are decompressed and compressed according to their extensions.
+        """
+        # Written under a temporary name and renamed when complete, so a failed run leaves no partial output
+        tmp_path = temporary_path(Path(output_path))
+        try:
+            with ExitStack() as inputs, open_text(tmp_path, 'w', compression_of(output_path)) as dst:
+                # Files are hashed as they are read, for the --manifest; tar members are not hashed
+                if source is None:
+                    src, file_source = inputs.enter_context(open_input(input_path))
+                else:
+                    src = inputs.enter_context(open_text(source, compression=compression_of(input_path)))
+                    file_source = None
+                lines = iter(src)
+                left = []
+                body = list(itertools.islice(lines, window_lines))
+                right = list(itertools.islice(lines, overlap_lines))
+                # Spans found by an earlier window that reach into the current body, relative to its start
+                carried = []
+
+                while body:
+                    left_text, body_text = ''.join(left), ''.join(body)
+                    text = left_text + body_text + ''.join(right)
+                    body_start, body_end = len(left_text), len(left_text) + len(body_text)
+
+                    spans = self._redact_stream_window(text, body_start, body_end, flags)
+                    spans.update((start + body_start, end + body_start) for start, end in carried)
+
+                    with self.stage('render', body_end - body_start):
+                        last_end = body_start
+                        carried = []
+                        for start, end in spans:
+                            if end <= body_start or start >= body_end:
+                                if start >= body_end:
+                                    carried.append((start - body_end, end - body_end))
+                                continue
+                            start = max(start, body_start)
+                            dst.write(text[last_end:start])
+                            dst.write(self.redact_text(text[start:min(end, body_end)]))
+                            last_end = min(end, body_end)
+                            if end > body_end:
+                                carried.append((0, end - body_end))
+                        dst.write(text[last_end:body_end])
+
+                    left = (left + body)[-overlap_lines:] if overlap_lines else []
+                    body = right + list(itertools.islice(lines, window_lines - len(right)))
+                    right = list(itertools.islice(lines, overlap_lines))
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self.stats.files_processed += 1
+        self.stats.source = file_source
+
+    def _redact_stream_window(self, text: str, body_start: int, body_end: int,
+                              flags: argparse.Namespace) -> RedactionSpans:
+        """
+            Run all requested detectors over one stream window.
+            Hits are counted as in redact_content(), but only those starting inside the body
+            [body_start, body_end), so entities in the overlap are counted by exactly one window.
+            Args:
+                text: The window text, including its context lines.
+                body_start: Offset of the body within text.
+                body_end: End offset of the body within text.
+                flags: The parsed command-line arguments containing redaction options.
+            Returns:
+                RedactionSpans: The spans to be redacted, relative to text.
+        """
+        with self.counting_region(body_start, body_end):
+            detected = self.detect_entities(text, flags)
+
+        spans = RedactionSpans()
+        for found in detected.values():
+            spans.update(found)
+
+        # Concepts redact whole lines, so the body alone is enough and needs no ownership check
+        if flags.concept:
+            with self.stage('concepts', body_end - body_start):
+                concept_spans = self.redact_concepts(text[body_start:body_end], flags.concept)
+            spans.update((start + body_start, end + body_start) for start, end in concept_spans)
+
+        return spans
+
+
+def setup_argparse() -> argparse.ArgumentParser:
+    """
+    Set up command line argument parsing with flexible argument combinations.
+    Returns:
+        argparse.ArgumentParser: The argument parser with configured options.
+    """
+    parser = argparse.ArgumentParser(description='Redact sensitive information from text files.')
+    
+    # Required argument
+    parser.add_argument('--input', help='Input directory, walked recursively, or files glob pattern (required unless '
+                                         'only running a command such as --clear-cache)')
+    
+    # Optional redaction flags
+    redaction_group = parser.add_argument_group('redaction options')
+    redaction_group.add_argument('--names', action='store_true', help='Redact names')
+    redaction_group.add_argument('--dates', action='store_true', help='Redact dates')
+    redaction_group.add_argument('--phones', action='store_true', help='Redact phone numbers')
+    redaction_group.add_argument('--address', action='store_true', help='Redact addresses')
+    redaction_group.add_argument('--concept', action='append', help='Redact concepts (can be specified multiple times)')
+    redaction_group.add_argument('--concept-file', help='Redact the concepts listed in this file, one per line')
+    redaction_group.add_argument('--concept-store', help='Redact the concepts of a store built with --build-concept-store, '
+                                                         'using its precomputed embeddings')
+    
+    # Output options
+    output_group = parser.add_argument_group('output options')
+    output_group.add_argument('--output', default='files', 
+                              help='Output directory (default: files)')
+    output_group.add_argument('--stats', help='Statistics output file (optional, can be "stdout" or "stderr")')
+    output_group.add_argument('--merge-stats', nargs='+', metavar='FILE',
+                              help='Combine the --stats files of several runs (e.g. one per --shard) into --stats '
+                                   '(default: stdout), then exit')
+    output_group.add_argument('--compress-output', choices=sorted(COMPRESSORS),
+                              help='Compress the .censored outputs (and a --records-output file) in this format')
+
+    # Record options
+    record_group = parser.add_argument_group('record options')
+    record_group.add_argument('--records', choices=RECORD_FORMATS,
+                              help='Redact fields of the JSONL or CSV records in --input (a file, or - for stdin) '
+                                   'instead of whole files')
+    record_group.add_argument('--fields', nargs='+', metavar='FIELD',
+                              help='JSONL fields (dotted paths into nested objects) or CSV columns to redact '
+                                   '(default: every string value or column)')
+    record_group.add_argument('--records-output', default='-',
+                              help='File to write the redacted records to (default: - for stdout)')
+    record_group.add_argument('--record-batch', type=int, default=RECORD_BATCH_SIZE,
+                              help=f'Records whose fields are redacted together (default: {RECORD_BATCH_SIZE})')
+
+    # Model options
+    model_group = parser.add_argument_group('model options')
+    model_group.add_argument('--model-tier', choices=list(MODEL_TIERS), default=DEFAULT_MODEL_TIER,
+                             help='NER accuracy/speed tier: ' +
+                                  ', '.join(f'{tier}={name}' for tier, name in MODEL_TIERS.items()) +
+                                  f' (default: {DEFAULT_MODEL_TIER})')
+    model_group.add_argument('--ner-prefilter', action='store_true',
+                             help='Only run the NER model on sentences with capitalized words, digits or date words')
+    model_group.add_argument('--model', help='spaCy package name or path to use instead of the tier default')
+    model_group.add_argument('--address-countries', nargs='+', type=str.upper, default=list(ADDRESS_COUNTRIES),
+                             help=f'Countries whose address formats pyap detects (default: {" ".join(ADDRESS_COUNTRIES)})')
+
+    # Gazetteer options
+    gazetteer_group = parser.add_argument_group('gazetteer options')
+    gazetteer_group.add_argument('--gazetteer', metavar='FILE',
+                                 help='Also redact the known names, emails and addresses listed in this file, '
+                                      'wherever they occur')
+    gazetteer_group.add_argument('--update-gazetteer', action='store_true',
+                                 help='Add the names, emails and addresses detected in this run to --gazetteer, '
+                                      'matching them in later documents and saving them at the end')
+
+    # Concept store options
+    concept_group = parser.add_argument_group('concept store options')
+    concept_group.add_argument('--build-concept-store', metavar='DIR',
+                               help='Embed the --concept/--concept-file concepts into a store directory, then exit')
+    concept_group.add_argument('--concept-dtype', choices=['float32', 'int8'], default='float32',
+                               help='Embedding precision of a built store; int8 is 4x smaller (default: float32)')
+
+    # Cache options
+    cache_group = parser.add_argument_group('cache options')
+    cache_group.add_argument('--paragraph-memo', action='store_true',
+                             help='Redact paragraphs seen before (e.g. quoted replies and signatures) from remembered '
+                                  'spans instead of running the detectors again')
+    cache_group.add_argument('--paragraph-memo-size', type=int, default=PARAGRAPH_MEMO_SIZE,
+                             help=f'Paragraphs remembered by --paragraph-memo, least recently used evicted first '
+                                  f'(default: {PARAGRAPH_MEMO_SIZE})')
+    cache_group.add_argument('--cache-dir', help='Reuse spans of unchanged files from this on-disk cache (not used by --stream)')
+    cache_group.add_argument('--cache-max-size', type=int, default=DEFAULT_CACHE_MAX_MB,
+                             help=f'Cache size limit in MB; least recently used entries are evicted '
+                                  f'(default: {DEFAULT_CACHE_MAX_MB})')
+    cache_group.add_argument('--clear-cache', action='store_true',
+                             help='Delete all entries of --cache-dir, then exit unless --input is given')
+
+    # Server options
+    server_group = parser.add_argument_group('server options')
+    server_group.add_argument('--serve', action='store_true',
+                              help='Run a redaction server keeping the models loaded, instead of redacting files')
+    server_group.add_argument('--host', default='127.0.0.1', help='Server address (default: 127.0.0.1)')
+    server_group.add_argument('--port', type=int, default=SERVE_PORT, help=f'Server port (default: {SERVE_PORT})')
+    server_group.add_argument('--socket', help='Serve on this Unix socket path instead of TCP')
+    server_group.add_argument('--serve-batch-size', type=int, default=SERVE_BATCH_SIZE,
+                              help=f'Maximum concurrent requests per NLP batch (default: {SERVE_BATCH_SIZE})')
+    server_group.add_argument('--serve-batch-wait', type=float, default=SERVE_BATCH_WAIT_MS,
+                              help=f'Milliseconds to wait for more requests to batch (default: {SERVE_BATCH_WAIT_MS})')
+
+    # Performance options
+    performance_group = parser.add_argument_group('performance options')
+    performance_group.add_argument('--batch-size', type=int, default=1,
+                                   help='Documents per nlp.pipe batch; values above 1 enable batch mode (default: 1)')
+    performance_group.add_argument('--workers', type=int, default=1,
+                                   help='Number of worker processes, each with its own models (default: 1)')
+    performance_group.add_argument('--preload-models', action='store_true',
+                                   help='With --workers, load the models once before starting the workers, which '
+                                        'share them copy-on-write (needs the fork start method, e.g. Linux)')
+    performance_group.add_argument('--shard', type=parse_shard, metavar='i/N',
+                                   help='Only redact shard i (0 to N-1) of N, chosen by a stable hash of each '
+                                        'path relative to the input root, so N nodes can split one input tree')
+    performance_group.add_argument('--stream', action='store_true',
+                                   help='Redact files in bounded-memory line windows, writing output incrementally')
+    performance_group.add_argument('--stream-window', type=int, default=STREAM_WINDOW_LINES,
+                                   help=f'Lines per --stream window (default: {STREAM_WINDOW_LINES})')
+    performance_group.add_argument('--stream-overlap', type=int, default=STREAM_OVERLAP_LINES,
+                                   help=f'Context lines shared between --stream windows (default: {STREAM_OVERLAP_LINES})')
+    performance_group.add_argument('--prefetch', type=int, default=PREFETCH_FILES,
+                                   help='Files read ahead and outputs queued for writing on background threads, '
+                                        f'overlapping I/O with redaction; 0 disables (default: {PREFETCH_FILES})')
+    performance_group.add_argument('--manifest',
+                                   help='Append a JSONL record (path, hash, counts, seconds) for every completed file')
+    performance_group.add_argument('--resume', action='store_true',
+                                   help='Skip files the --manifest records as completed and unchanged, '
+                                        'and count their recorded statistics')
+    performance_group.add_argument('--no-concurrent-scan', action='store_true',
+                                   help='Run the regex and pyap scans after the NER parse instead of alongside it')
+    performance_group.add_argument('--no-mmap', action='store_true',
+                                   help='Do not redact --phones-only runs directly from memory-mapped files')
+    performance_group.add_argument('--profile', action='store_true',
+                                   help='Add per-stage wall/CPU timings, per file and in total, to the --stats output')
+    performance_group.add_argument('--profile-output',
+                                   help='Also write cProfile data of the run to this file (implies --profile; '
+                                        'with --workers only the main process is profiled)')
     
-    for input_path in input_files:
+    return parser
+
+def validate_args(args: argparse.Namespace) -> bool:
+    """
+    Validate command line arguments.
+    
+    Args:
+        args: Parsed command line arguments
+        
+    Returns:
+        bool: True if arguments are valid, False otherwise
+    """
+    if args.merge_stats:
+        return True
+    if args.update_gazetteer and (not args.gazetteer or args.serve):
+        logging.error("Error: --update-gazetteer requires --gazetteer and cannot be used with --serve")
+        return False
+    if args.clear_cache and not args.cache_dir:
+        logging.error("Error: --clear-cache requires --cache-dir")
+        return False
+    if args.build_concept_store:
+        if not args.concept:
+            logging.error("Error: --build-concept-store requires --concept or --concept-file")
+            return False
+        return True
+    if args.serve:
+        if args.serve_batch_size < 1 or args.serve_batch_wait < 0:
+            logging.error("Error: --serve-batch-size must be at least 1 and --serve-batch-wait not negative")
+            return False
+        if args.socket and os.path.lexists(args.socket) and not S_ISSOCK(os.lstat(args.socket).st_mode):
+            logging.error(f"Error: --socket {args.socket} exists and is not a socket")
+            return False
+        return True
+    if not args.input:
+        if args.clear_cache:
+            return True
+        logging.error("Error: --input is required")
+        return False
+
+    # Check if at least one redaction option is specified
+    redaction_options = [args.names, args.dates, args.phones, args.address]
+    if not any(redaction_options) and not args.concept:
+        logging.error("Error: At least one redaction option must be specified "
+                     "(--names, --dates, --phones, --address, or --concept)")
+        return False
+    if args.batch_size < 1:
+        logging.error("Error: --batch-size must be at least 1")
+        return False
+    if args.records:
+        if args.stream or args.workers > 1 or args.shard or args.manifest:
+            logging.error("Error: --records cannot be combined with --stream, --workers, --shard or --manifest")
+            return False
+        if args.record_batch < 1:
+            logging.error("Error: --record-batch must be at least 1")
+            return False
+        if args.stats == 'stdout' and args.records_output == '-':
+            logging.error("Error: --stats stdout would mix with the records written to stdout")
+            return False
+    if args.workers < 1:
+        logging.error("Error: --workers must be at least 1")
+        return False
+    if args.stream and args.batch_size > 1:
+        logging.error("Error: --stream cannot be combined with --batch-size")
+        return False
+    if args.cache_max_size < 1:
+        logging.error("Error: --cache-max-size must be at least 1")
+        return False
+    if args.paragraph_memo_size < 1:
+        logging.error("Error: --paragraph-memo-size must be at least 1")
+        return False
+    if args.resume and not args.manifest:
+        logging.error("Error: --resume requires --manifest")
+        return False
+    if args.prefetch < 0:
+        logging.error("Error: --prefetch must not be negative")
+        return False
+    if args.stream_window < 1 or args.stream_overlap < 0:
+        logging.error("Error: --stream-window must be at least 1 and --stream-overlap not negative")
+        return False
+    return True
+
+
+def read_concept_file(path: str) -> List[str]:
+    """
+    Read a concept vocabulary: one concept per line; blank lines and lines starting with # are skipped.
+
+    Args:
+        path: Path of the concept file
+
+    Returns:
+        List[str]: The concepts, in file order
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+def resolve_concepts(args: argparse.Namespace):
+    """
+    Add the concepts of --concept-file, or else of --concept-store, to args.concept.
+
+    Args:
+        args: Parsed command line arguments, updated in place
+    """
+    if args.concept_file:
+        args.concept = (args.concept or []) + read_concept_file(args.concept_file)
+    elif args.concept_store and not args.concept and not args.build_concept_store:
+        args.concept = ConceptIndex.load(args.concept_store).concepts
+
+
+def check_concept_store(args: argparse.Namespace, redactor: Redactor) -> bool:
+    """
+    Check that the --concept-store holds the concepts of --concept/--concept-file. A store is only used
+    for exactly the vocabulary it was built for, so a mismatch is logged rather than silently ignored.
+
+    Args:
+        args: Parsed command line arguments, with the concepts resolved (see resolve_concepts())
+        redactor: The Redactor set up from args
+
+    Returns:
+        bool: False if a concept store was loaded that the requested concepts will not use
+    """
+    store = redactor.concept_store
+    if store is None or not args.concept or tuple(args.concept) == store.key:
+        return True
+    logging.warning(f"--concept-store {args.concept_store} holds other concepts than --concept/--concept-file "
+                    "and is not used; rebuild it with --build-concept-store")
+    return False
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a --shard value "i/N" (0 <= i < N).
+
+    Args:
+        value: The command line value
+
+    Returns:
+        Tuple[int, int]: The shard index and the number of shards
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not of that form
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 0 and N-1, got {value!r}")
+    return index, count
+
+
+def input_root(pattern: str) -> str:
+    """
+    Get the directory an --input pattern is resolved from: the pattern itself if it is a directory,
+    otherwise its leading path components without glob wildcards.
+
+    Args:
+        pattern: A directory or a glob pattern
+
+    Returns:
+        str: The root directory
+    """
+    if os.path.isdir(pattern):
+        return pattern
+    parts = []
+    for part in Path(pattern).parts[:-1]:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.path.join(*parts) if parts else os.curdir
+
+
+def iter_input_files(pattern: str) -> Iterator[str]:
+    """
+    Lazily list the input files of an --input pattern, without materializing the whole listing.
+    A directory is walked recursively, yielding every regular file below it; anything else is
+    a glob pattern, where ** matches any number of subdirectories.
+
+    Args:
+        pattern: A directory or a glob pattern
+
+    Yields:
+        str: Each input path
+    """
+    if not os.path.isdir(pattern):
+        yield from glob.iglob(pattern, recursive=True)
+        return
+    directories = [pattern]
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except OSError as e:
+            logging.error(f"Error listing {e.filename}: {e.strerror}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+
+
+def shard_of(relative_path: str, shard_count: int) -> int:
+    """
+    Assign a file to a shard by a stable hash of its path relative to the input root, so every node
+    computes the same partition of the same tree, whatever order it lists it in and wherever it is mounted.
+
+    Args:
+        relative_path: Path relative to the input root
+        shard_count: Number of shards
+
+    Returns:
+        int: The shard index, in [0, shard_count)
+    """
+    key = Path(relative_path).as_posix().encode('utf-8', 'surrogateescape')
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], 'big') % shard_count
+
+
+def select_shard(input_paths: Iterable[str], root: str, index: int, count: int) -> Iterator[str]:
+    """
+    Keep only the input files of one shard.
+
+    Args:
+        input_paths: Paths of the input files
+        root: The input root the shard hash is computed relative to
+        index: The shard to keep
+        count: Number of shards
+
+    Yields:
+        str: Each path of the shard, in input order
+    """
+    for input_path in input_paths:
+        if shard_of(os.path.relpath(input_path, root), count) == index:
+            yield input_path
+
+
+def merge_stats_files(paths: Iterable[str]) -> dict:
+    """
+    Combine the --stats JSON files of several runs, e.g. one per --shard, into one.
+    Counts and stage timings are added up, file_timings are combined, and run_seconds is that
+    of the slowest run, since shards run side by side.
+
+    Args:
+        paths: The statistics files
+
+    Returns:
+        dict: The combined statistics
+    """
+    stats = RedactionStats()
+    file_timings = {}
+    run_seconds = None
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        shard_stats = RedactionStats.from_dict(data)
+        if stats.files_processed and shard_stats.ner_model not in (None, stats.ner_model):
+            logging.warning(f"{path} was redacted with {shard_stats.ner_model}, not {stats.ner_model}")
+        stats.model_tier = stats.model_tier or shard_stats.model_tier
+        stats.ner_model = stats.ner_model or shard_stats.ner_model
+        stats.merge(shard_stats)
+        file_timings.update(data.get("file_timings", {}))
+        if "run_seconds" in data:
+            run_seconds = max(run_seconds or 0.0, data["run_seconds"])
+    stats_dict = stats.to_dict()
+    if run_seconds is not None:
+        stats_dict["run_seconds"] = run_seconds
+    if file_timings:
+        stats_dict["file_timings"] = file_timings
+    return stats_dict
+
+
+def write_stats(stats_dict: dict, destination: str):
+    """
+    Write statistics as JSON to a file, or to "stdout" or "stderr".
+
+    Args:
+        stats_dict: The statistics
+        destination: A file path, "stdout" or "stderr"
+    """
+    try:
+        if destination == 'stderr':
+            json.dump(stats_dict, sys.stderr, indent=2)
+            sys.stderr.write('\n')  # Add newline
+        elif destination == 'stdout':
+            json.dump(stats_dict, sys.stdout, indent=2)
+            sys.stdout.write('\n')  # Add newline
+        else:
+            with open(destination, 'w') as f:
+                json.dump(stats_dict, f, indent=2)
+    except Exception as e:
+        logging.error(f"Error writing statistics: {str(e)}")
+
+
+def compression_of(path: str) -> str:
+    """
+    Get the compression format of a file from its extension.
+
+    Args:
+        path: File path (or tar member name)
+
+    Returns:
+        str: A key of COMPRESSORS, or None for uncompressed files
+    """
+    suffix = os.path.splitext(str(path))[1].lower().lstrip('.')
+    return suffix if suffix in COMPRESSORS else None
+
+
+def is_tar_archive(path: str) -> bool:
+    """
+    Check whether an input path is a (possibly compressed) tar archive, judging by its extension.
+
+    Args:
+        path: Input path
+
+    Returns:
+        bool: True for .tar, .tar.gz, .tgz and the like
+    """
+    return str(path).lower().endswith(TAR_SUFFIXES)
+
+
+class SequentialReader(io.RawIOBase):
+    def __init__(self, source, digest=None):
+        """
+        Present a binary file object as a forward-only raw stream. Members of a tar archive opened for
+        streaming cannot answer seekable(), which the io and compression wrappers ask.
+
+        Args:
+            source: Binary file object with a read() method
+            digest: hashlib object to update with every byte read, if given
+        """
+        super().__init__()
+        self.source = source
+        self.digest = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.source.read(len(buffer))
+        if self.digest is not None:
+            self.digest.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_text(source, mode: str = 'r', compression: str = None, newline: str = None):
+    """
+    Open a file as UTF-8 text, decompressing or compressing it on the fly.
+
+    Args:
+        source: A path, or a binary file object to read such as a tar member
+        mode: 'r' or 'w'
+        compression: A key of COMPRESSORS, or None for plain text
+        newline: Newline handling, as for open()
+
+    Returns:
+        A text file object
+    """
+    if not isinstance(source, (str, Path)):
+        source = io.BufferedReader(source if isinstance(source, SequentialReader) else SequentialReader(source))
+    if compression is not None:
+        return COMPRESSORS[compression](source, mode + 't', encoding='utf-8', newline=newline)
+    if isinstance(source, (str, Path)):
+        return open(source, mode, encoding='utf-8', newline=newline)
+    return io.TextIOWrapper(source, encoding='utf-8', newline=newline)
+
+
+@contextmanager
+def open_input(input_path: str) -> Iterator[Tuple[object, dict]]:
+    """
+    Open an input file as text, decompressing it according to its extension and hashing its bytes as they
+    are read, so recording a file for --manifest costs no second read.
+
+    Args:
+        input_path: Path of the input file
+
+    Yields:
+        Tuple[object, dict]: The text file object, and the source record {"sha256", "size", "mtime_ns"} of the
+        file. Size and modification time are taken when it is opened, so a file changing while it is read does
+        not look unchanged later; sha256 is filled in once the file has been read to the end.
+    """
+    with open(input_path, 'rb') as raw:
+        stat = os.fstat(raw.fileno())
+        digest = hashlib.sha256()
+        source = {"sha256": None, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        with open_text(SequentialReader(raw, digest), compression=compression_of(input_path)) as f:
+            yield f, source
+        source["sha256"] = digest.hexdigest()
+
+
+def iter_tar_members(archive_path: str) -> Iterator[Tuple[str, object]]:
+    """
+    Stream the regular files of a tar archive in a single sequential pass, decompressing the archive
+    on the fly, so no member is ever extracted to disk.
+
+    Args:
+        archive_path: Path of the archive
+
+    Yields:
+        Tuple[str, object]: The document path "<archive>::<member name>" and a binary file object of the member,
+        which must be consumed before the next member is requested
+    """
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile():
+                yield f"{archive_path}{TAR_MEMBER_SEPARATOR}{member.name}", archive.extractfile(member)
+
+
+def read_inputs(input_path: str) -> Iterator[Tuple[str, str, Exception, dict]]:
+    """
+    Read the documents of one input: a plain or compressed file, or every member of a tar archive
+    (members may be compressed themselves).
+
+    Args:
+        input_path: Path of the input
+
+    Yields:
+        Tuple[str, str, Exception, dict]: Each document path with its text, or with the error that prevented
+        reading it, and the source record of a file (see open_input(); None for tar members)
+    """
+    if not is_tar_archive(input_path):
+        try:
+            with open_input(input_path) as (f, source):
+                text = f.read()
+        except Exception as e:
+            yield input_path, None, e, None
+            return
+        yield input_path, text, None, source
+        return
+
+    try:
+        for member_path, member in iter_tar_members(input_path):
+            try:
+                with open_text(member, compression=compression_of(member_path)) as f:
+                    text = f.read()
+            except Exception as e:
+                yield member_path, None, e, None
+                continue
+            yield member_path, text, None, None
+    except (OSError, tarfile.TarError) as e:
+        yield input_path, None, e, None
+
+
+def output_root(args: argparse.Namespace) -> str:
+    """
+    Get the directory whose layout the outputs mirror under --output.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        str: The input root, or None if there is no --input pattern (outputs then go straight into --output)
+    """
+    return input_root(args.input) if args.input and args.input != '-' else None
+
+
+def output_path_for(output_dir: Path, input_path: str, compression: str = None, root: str = None) -> Path:
+    """
+    Get the output path <output_dir>/<relative directory>/<input stem>.censored[.<compression>] for an input
+    file, where the relative directory is that of the input below root, so inputs of the same name in
+    different directories do not overwrite each other. The stem leaves out a compression extension.
+    A tar member goes below a directory named after its archive, at the member's path within it.
+
+    Args:
+        output_dir: Output directory
+        input_path: Path of the input file, or "<archive>::<member>"
+        compression: Compression of the output (a key of COMPRESSORS), or None
+        root: Input root the directory layout is mirrored from; None puts every output straight into output_dir
+
+    Returns:
+        Path: The path of the .censored output
+    """
+    archive_path, _, member = input_path.rpartition(TAR_MEMBER_SEPARATOR)
+    parts = []
+    if root is not None:
+        relative = os.path.relpath(archive_path or member, root)
+        if not relative.startswith(os.pardir):
+            parts.extend(Path(relative).parts[:-1])
+    if archive_path:
+        archive_name = Path(archive_path).name
+        suffix = next((suffix for suffix in TAR_SUFFIXES if archive_name.lower().endswith(suffix)), '')
+        parts.append(archive_name[:len(archive_name) - len(suffix)])
+        # Member names are relative, but may still try to climb out of the archive's directory
+        parts.extend(part for part in Path(member).parts[:-1] if part not in (os.pardir, os.curdir, os.sep))
+    name = Path(member).name
+    if compression_of(name):
+        name = os.path.splitext(name)[0]
+    return output_dir.joinpath(*parts, f"{Path(name).stem}.censored" + (f".{compression}" if compression else ""))
+
+
+def temporary_path(path: Path) -> Path:
+    """
+    Get a temporary sibling path to write a file to before renaming it into place, creating the directory
+    if needed.
+
+    Args:
+        path: The final path
+
+    Returns:
+        Path: A path in the same directory, unique to this process and thread
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def write_output(output_dir: Path, input_path: str, redacted_text: str, compression: str = None,
+                 root: str = None):
+    """
+    Write redacted text to its output path (see output_path_for()) atomically: readers see either
+    the previous file or the complete new one, never a partial write.
+
+    Args:
+        output_dir: Output directory
+        input_path: Path of the input file the text was redacted from
+        redacted_text: The redacted text
+        compression: Compress the output in this format (a key of COMPRESSORS); None writes plain text
+        root: Input root whose directory layout is mirrored under output_dir
+    """
+    output_path = output_path_for(output_dir, input_path, compression, root)
+    tmp_path = temporary_path(output_path)
+    try:
+        with open_text(tmp_path, 'w', compression) as f:
+            f.write(redacted_text)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def read_files(input_paths: Iterable[str], prefetch: int = 0) -> Iterator[Tuple[str, str, Exception, dict]]:
+    """
+    Read input files in order, decompressing them and expanding tar archives into their members
+    (see read_inputs()). With prefetch, a background thread reads up to that many files ahead of the
+    consumer, so file I/O overlaps with redaction while memory stays bounded.
+
+    Args:
+        input_paths: Paths of the input files
+        prefetch: Maximum number of files read but not yet consumed; 0 reads each file on demand
+
+    Yields:
+        Tuple[str, str, Exception, dict]: Each document path with its text, or with the error that prevented
+        reading it, and its source record (see read_inputs())
+    """
+    if prefetch < 1:
+        for input_path in input_paths:
+            yield from read_inputs(input_path)
+        return
+
+    files = queue.Queue(maxsize=prefetch)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # Give up once the consumer has gone away instead of blocking on a full queue forever
+        while not stopped.is_set():
+            try:
+                files.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        for input_path in input_paths:
+            for item in read_inputs(input_path):
+                if not put(item):
+                    return
+        put(None)
+
+    threading.Thread(target=reader, name='redactor-reader', daemon=True).start()
+    try:
+        while True:
+            item = files.get()
+            if item is None:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+class OutputWriter:
+    def __init__(self, output_dir: Path, queue_size: int = 0, profile: bool = False, compression: str = None,
+                 root: str = None):
+        """
+        Write .censored outputs, on a background thread if queue_size is positive, so writing one file
+        overlaps with redacting the next. submit() blocks while queue_size outputs are waiting, which
+        bounds memory when storage is slower than redaction.
+
+        Args:
+            output_dir: Output directory
+            queue_size: Maximum number of outputs waiting to be written; 0 writes synchronously
+            profile: Whether to record a "write" stage timing in each file's statistics
+            compression: Compress the outputs in this format (a key of COMPRESSORS); None writes plain text
+            root: Input root whose directory layout is mirrored under output_dir
+        """
+        self.output_dir = output_dir
+        self.profile = profile
+        self.compression = compression
+        self.root = root
+        # (input_path, stats) of the outputs written successfully, in completion order
+        self._written = queue.Queue()
+        self._pending = None
+        self._thread = None
+        if queue_size > 0:
+            self._pending = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name='redactor-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, input_path: str, redacted_text: str, stats: RedactionStats):
+        """
+        Queue (or write) the output of one file. The stats must not be modified by the caller afterwards.
+
+        Args:
+            input_path: Path of the input file the text was redacted from
+            redacted_text: The redacted text
+            stats: The file's statistics, handed back by written() once the output is on disk
+        """
+        if self._pending is None:
+            self._write(input_path, redacted_text, stats)
+        else:
+            self._pending.put((input_path, redacted_text, stats))
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            self._write(*item)
+
+    def _write(self, input_path: str, redacted_text: str, stats: RedactionStats):
+        wall, cpu = time.perf_counter(), time.thread_time()
         try:
-            redacted_text = redactor.redact_document(input_path, args)
-            
-            # Create output file
-            input_file = Path(input_path)
-            output_path = output_dir / f"{input_file.stem}.censored"
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(redacted_text)
-            
+            write_output(self.output_dir, input_path, redacted_text, self.compression, self.root)
         except Exception as e:
             logging.error(f"Error processing {input_path}: {str(e)}")
-            continue
+            return
+        wall = time.perf_counter() - wall
+        stats.seconds += wall
+        if self.profile:
+            stats.add_timing('write', wall, time.thread_time() - cpu, len(redacted_text))
+        self._written.put((input_path, stats))
+
+    def written(self) -> Iterator[Tuple[str, RedactionStats]]:
+        """
+        Collect the outputs written since the last call, without waiting for pending ones.
+
+        Yields:
+            Tuple[str, RedactionStats]: Each written path with its statistics
+        """
+        while True:
+            try:
+                yield self._written.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self):
+        """
+        Wait until every submitted output is written and stop the background thread.
+        """
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def process_files(redactor: Redactor, input_paths: Iterable[str], output_dir: Path,
+                  args: argparse.Namespace) -> Iterator[Tuple[str, RedactionStats]]:
+    """
+    Redact files in this process and write their .censored outputs, mirroring the directories below
+    the --input root (see output_path_for()). Errors are logged per file and do not stop the run.
+
+    Args:
+        redactor: The Redactor to use
+        input_paths: Paths of the input files
+        output_dir: Output directory
+        args: Parsed command line arguments
+
+    Yields:
+        Tuple[str, RedactionStats]: Each successfully processed path with its statistics
+    """
+    root = output_root(args)
+    if not args.no_mmap and redactor.can_redact_mapped(args):
+        # Regex-only runs redact straight from a memory map; files it cannot take go the regular way
+        remaining = []
+        for input_path in input_paths:
+            started = time.perf_counter()
+            try:
+                with redactor.collecting_stats() as file_stats:
+                    redacted = redactor.redact_mapped(input_path, output_path_for(output_dir, input_path, root=root),
+                                                      args)
+            except Exception as e:
+                logging.error(f"Error processing {input_path}: {str(e)}")
+                continue
+            if redacted:
+                file_stats.seconds += time.perf_counter() - started
+                yield input_path, file_stats
+            else:
+                remaining.append(input_path)
+        input_paths = remaining
+
+    if args.stream:
+        for input_path in input_paths:
+            # Tar members are streamed straight out of the archive, one after another
+            documents = iter_tar_members(input_path) if is_tar_archive(input_path) else [(input_path, None)]
+            try:
+                for document_path, source in documents:
+                    started = time.perf_counter()
+                    try:
+                        with redactor.collecting_stats() as file_stats:
+                            redactor.redact_stream(document_path,
+                                                   output_path_for(output_dir, document_path, args.compress_output,
+                                                                   root),
+                                                   args, args.stream_window, args.stream_overlap, source)
+                    except Exception as e:
+                        logging.error(f"Error processing {document_path}: {str(e)}")
+                        continue
+                    file_stats.seconds += time.perf_counter() - started
+                    yield document_path, file_stats
+            except (OSError, tarfile.TarError) as e:
+                logging.error(f"Error processing {input_path}: {str(e)}")
+        return
+
+    # Reading, redaction and writing run as a pipeline: with --prefetch, upcoming files are read and
+    # finished outputs written on background threads while this thread redacts
+    writer = OutputWriter(output_dir, args.prefetch, redactor.profile, args.compress_output, root)
+    try:
+        if args.batch_size > 1:
+            for input_path, redacted_text, file_stats in redactor.redact_documents(
+                    input_paths, args, args.batch_size, args.prefetch):
+                writer.submit(input_path, redacted_text, file_stats)
+                yield from writer.written()
+        else:
+            for (input_path, text, error, source), wall, cpu in timed_iter(read_files(input_paths, args.prefetch)):
+                if error is not None:
+                    logging.error(f"Error processing {input_path}: {str(error)}")
+                    continue
+                started = time.perf_counter()
+                try:
+                    with redactor.collecting_stats() as file_stats:
+                        if redactor.profile:
+                            file_stats.add_timing('read', wall, cpu, len(text))
+                        redacted_text = redactor.redact_content(text, args)
+                    file_stats.source = source
+                    file_stats.seconds += wall + time.perf_counter() - started
+                except Exception as e:
+                    logging.error(f"Error processing {input_path}: {str(e)}")
+                    continue
+                writer.submit(input_path, redacted_text, file_stats)
+                yield from writer.written()
+        writer.close()
+        yield from writer.written()
+    finally:
+        writer.close()
+
+
+def preload_models(args: argparse.Namespace):
+    """
+    Load the models a run needs before the --workers pool is forked, so every worker inherits them
+    copy-on-write instead of loading its own copy.
+
+    Args:
+        args: Parsed command line arguments
+    """
+    if multiprocessing.get_start_method() != 'fork':
+        logging.warning("--preload-models needs the fork start method; each worker loads its own models")
+        return
+    Redactor.from_args(args).warm_up(args)
+    # Move everything loaded so far out of the collector's reach: its passes write to every tracked object,
+    # which would copy the inherited pages into each worker
+    gc.freeze()
+
+
+# Per-process state of --workers pool workers, set up once by _init_worker
+_worker_redactor = None
+_worker_output_dir = None
+_worker_args = None
+_worker_setup_error = None
+
+
+def _init_worker(output_dir: Path, args: argparse.Namespace):
+    """
+    Pool initializer: set up the Redactor once per worker process. Its models come from the MODELS
+    registry, already loaded if the pool was forked after preload_models().
+    A failure is kept and reported by the worker's tasks: an initializer that raises makes the pool
+    replace the worker again and again, so the run would never finish.
+    """
+    global _worker_redactor, _worker_output_dir, _worker_args, _worker_setup_error
+    _worker_output_dir = output_dir
+    _worker_args = args
+    try:
+        _worker_redactor = Redactor.from_args(args)
+    except Exception as e:
+        _worker_setup_error = f"{type(e).__name__}: {str(e)}"
+        return
+    multiprocessing.util.Finalize(_worker_redactor, _worker_redactor.close, exitpriority=0)
+
+
+def _worker_process_files(input_paths: List[str]) -> List[Tuple[str, RedactionStats]]:
+    """
+    Pool task: redact a chunk of files inside a worker process.
+
+    Raises:
+        RuntimeError: If the worker could not be set up
+    """
+    if _worker_setup_error is not None:
+        raise RuntimeError(f"Worker setup failed: {_worker_setup_error}")
+    return list(process_files(_worker_redactor, input_paths, _worker_output_dir, _worker_args))
+
+
+def process_files_parallel(input_paths: Iterable[str], output_dir: Path,
+                           args: argparse.Namespace) -> Iterator[Tuple[str, RedactionStats]]:
+    """
+    Redact files on a pool of args.workers processes pulling from a shared task queue.
+    Each task is one file, or args.batch_size files in batch mode.
+
+    Args:
+        input_paths: Paths of the input files
+        output_dir: Output directory
+        args: Parsed command line arguments
+
+    Yields:
+        Tuple[str, RedactionStats]: Each successfully processed path with its statistics
+    """
+    # The pool's task thread pulls chunks only as results come back, so input_paths is consumed lazily
+    queued = threading.Semaphore(args.workers * WORKER_QUEUED_TASKS)
+    stopped = threading.Event()
+
+    def chunks():
+        input_iter = iter(input_paths)
+        while True:
+            chunk = list(itertools.islice(input_iter, args.batch_size))
+            if not chunk:
+                return
+            while not queued.acquire(timeout=0.1):
+                if stopped.is_set():
+                    return
+            yield chunk
+
+    if args.preload_models:
+        preload_models(args)
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(output_dir, args)) as pool:
+        try:
+            for results in pool.imap_unordered(_worker_process_files, chunks()):
+                queued.release()
+                yield from results
+        finally:
+            stopped.set()
+
+
+def record_fields(record: object, fields: List[str] = None) -> List[Tuple[object, object, str]]:
+    """
+    Find the string values of a JSON record to redact.
+
+    Args:
+        record: The parsed record
+        fields: Dotted paths of the fields to redact (e.g. "user.bio"); every string value,
+            however deeply nested, if None
+
+    Returns:
+        List[Tuple[object, object, str]]: The container (dict or list), key and dotted name of each value
+    """
+    found = []
+    if fields is None:
+        def walk(value, name):
+            items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+            for key, item in items:
+                item_name = f"{name}.{key}" if name else str(key)
+                if isinstance(item, str):
+                    found.append((value, key, item_name))
+                else:
+                    walk(item, item_name)
+
+        walk(record, '')
+        return found
+    for field in fields:
+        container, key, value = None, None, record
+        for part in field.split('.'):
+            if not isinstance(value, dict) or part not in value:
+                value = None
+                break
+            container, key, value = value, part, value[part]
+        if isinstance(value, str):
+            found.append((container, key, field))
+    return found
+
+
+def redact_records(redactor: Redactor, input_stream, output_stream, args: argparse.Namespace,
+                   source: str = '-') -> RedactionStats:
+    """
+    Redact selected fields of a JSONL or CSV stream, writing each batch of records as soon as it is done.
+    The fields of args.record_batch records are redacted together, so they share NLP and sentence
+    encoder calls, while memory stays bounded by the batch. Records that cannot be parsed, or one of
+    whose fields fails, are logged and dropped rather than written unredacted.
+
+    Args:
+        redactor: The Redactor to use
+        input_stream: Text stream to read records from
+        output_stream: Text stream to write redacted records to
+        args: Parsed command line arguments (records, fields, record_batch and the redaction options)
+        source: Name of the input in error messages
+
+    Returns:
+        RedactionStats: Statistics of the stream
+
+    Raises:
+        ValueError: If a CSV column in args.fields is not in the header
+    """
+    with redactor.collecting_stats(merge=False) as stats:
+        if args.records == 'csv':
+            reader = csv.reader(input_stream)
+            writer = csv.writer(output_stream, lineterminator='\n')
+            header = next(reader, None)
+            if header is None:
+                return stats
+            unknown = [field for field in args.fields or [] if field not in header]
+            if unknown:
+                raise ValueError(f"Unknown CSV column(s): {', '.join(unknown)}")
+            columns = [i for i, name in enumerate(header) if args.fields is None or name in args.fields]
+            writer.writerow(header)
+
+            def values(row):
+                return [(row, i, header[i]) for i in columns if i < len(row)]
+
+            write = writer.writerow
+            records = ((reader.line_num, row) for row in reader)
+        else:
+            def parse_lines():
+                for line_number, line in enumerate(input_stream, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        logging.error(f"Error parsing {source}:{line_number}: {str(e)}")
+                        stats.records_dropped += 1
+                        continue
+                    if isinstance(record, str):
+                        # A bare string has no field to write the redacted text back to
+                        logging.error(f"Error parsing {source}:{line_number}: expected a JSON object, got a string")
+                        stats.records_dropped += 1
+                        continue
+                    yield line_number, record
+
+            def values(record):
+                return record_fields(record, args.fields)
+
+            def write(record):
+                output_stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+            records = parse_lines()
+
+        while True:
+            batch = list(itertools.islice(records, args.record_batch))
+            if not batch:
+                break
+            pending = {}
+            for line_number, record in batch:
+                for container, key, name in values(record):
+                    if container[key].strip():
+                        pending[f"{source}:{line_number}:{name}"] = (line_number, container, key)
+            items = [(container[key], field_key) for field_key, (_, container, key) in pending.items()]
+            # Each field's statistics are merged into stats as it is redacted
+            for field_key, redacted_text, _ in redactor.redact_texts(items, args, max(args.batch_size, len(items))):
+                _, container, key = pending.pop(field_key)
+                container[key] = redacted_text
+            # Fields left pending failed, and their errors are already logged
+            failed = {line_number for line_number, _, _ in pending.values()}
+            for line_number, record in batch:
+                if line_number not in failed:
+                    write(record)
+            output_stream.flush()
+            stats.records_processed += len(batch) - len(failed)
+            stats.records_dropped += len(failed)
+        stats.files_processed = 1
+    return stats
+
+
+def redact_record_file(redactor: Redactor, args: argparse.Namespace) -> RedactionStats:
+    """
+    Run --records mode from args.input to args.records_output, either of which may be - for stdin/stdout.
+    Files are decompressed according to their extension; a file output is compressed if it has one of
+    the COMPRESSORS extensions or --compress-output is given, and is written to a temporary file and
+    renamed into place once complete.
+
+    Args:
+        redactor: The Redactor to use
+        args: Parsed command line arguments
+
+    Returns:
+        RedactionStats: Statistics of the stream
+    """
+    def open_stream(path, mode, compression=None):
+        if path == '-':
+            fileno = sys.stdin.fileno() if mode == 'r' else sys.stdout.fileno()
+            return open(fileno, mode, encoding='utf-8', newline='', closefd=False)
+        return open_text(path, mode, compression, newline='')
+
+    if args.records_output == '-':
+        with open_stream(args.input, 'r', compression_of(args.input)) as input_stream, \
+                open_stream('-', 'w') as output_stream:
+            return redact_records(redactor, input_stream, output_stream, args, args.input)
+
+    output_path = Path(args.records_output)
+    tmp_path = temporary_path(output_path)
+    try:
+        compression = compression_of(args.records_output) or args.compress_output
+        with open_stream(args.input, 'r', compression_of(args.input)) as input_stream, \
+                open_stream(str(tmp_path), 'w', compression) as output_stream:
+            stats = redact_records(redactor, input_stream, output_stream, args, args.input)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return stats
+
+
+def update_gazetteer_file(path: str, learned: Dict[str, str]):
+    """
+    Add the entities learned during a run to a gazetteer file, keeping entries added to it meanwhile.
+
+    Args:
+        path: The gazetteer file
+        learned: Entity text mapped to its category
+    """
+    gazetteer = Gazetteer.load(path) if os.path.exists(path) else Gazetteer()
+    added = sum(gazetteer.add(text, category) for text, category in learned.items())
+    gazetteer.save(path)
+    logging.info(f"Added {added} entities to {path} ({len(gazetteer.entries)} in total)")
+
+
+def flags_from_options(options: dict) -> argparse.Namespace:
+    """
+    Build redaction flags from a server request, starting from the command line defaults.
+
+    Args:
+        options: Redaction options keyed like the argparse destinations (names, dates, phones, address, concept)
+
+    Returns:
+        argparse.Namespace: Flags usable with Redactor.redact_content()
+
+    Raises:
+        ValueError: If an option is unknown or has the wrong type, or no redaction option is enabled
+    """
+    flags = setup_argparse().parse_args([])
+    for name, value in options.items():
+        if name not in REQUEST_OPTIONS:
+            raise ValueError(f"Unknown option: {name}")
+        if name == 'concept':
+            if isinstance(value, str):
+                value = [value]
+            if value is not None and not (isinstance(value, list) and all(isinstance(c, str) for c in value)):
+                raise ValueError("concept must be a string or a list of strings")
+            value = value or None
+        elif not isinstance(value, bool):
+            raise ValueError(f"{name} must be true or false")
+        setattr(flags, name, value)
+    if not (flags.names or flags.dates or flags.phones or flags.address or flags.concept):
+        raise ValueError("At least one redaction option must be enabled (names, dates, phones, address, or concept)")
+    return flags
+
+
+class RedactionRequest:
+    def __init__(self, text: str, flags: argparse.Namespace):
+        """
+            One pending server request, completed by the RedactionBatcher thread.
+            Args:
+                text: The text to redact.
+                flags: Redaction flags of the request.
+        """
+        self.text = text
+        self.flags = flags
+        self.redacted_text = None
+        self.stats: RedactionStats = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class RedactionBatcher:
+    def __init__(self, redactor: Redactor, batch_size: int = SERVE_BATCH_SIZE,
+                 batch_wait_ms: float = SERVE_BATCH_WAIT_MS):
+        """
+            Owns the server's Redactor and runs it on a single thread, redacting concurrent requests
+            together: requests arriving within batch_wait_ms of each other share one nlp.pipe call.
+            Args:
+                redactor: The Redactor, with models kept warm for the server's lifetime.
+                batch_size: Maximum number of requests per batch.
+                batch_wait_ms: How long to wait for more requests after the first one of a batch.
+        """
+        self.redactor = redactor
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.queue: queue.Queue = queue.Queue()
+        self.stats = RedactionStats()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='redaction-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str, flags: argparse.Namespace) -> RedactionRequest:
+        """
+            Queue a request and wait until it has been redacted.
+            Args:
+                text: The text to redact.
+                flags: Redaction flags of the request.
+            Returns:
+                RedactionRequest: The completed request.
+        """
+        request = RedactionRequest(text, flags)
+        started = time.perf_counter()
+        self.queue.put(request)
+        request.done.wait()
+        with self._lock:
+            self.requests += 1
+            self.errors += request.error is not None
+            self.latencies.append(time.perf_counter() - started)
+        return request
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            try:
+                self._redact_batch(batch)
+            except BaseException:
+                # The batch's requests were answered with an error; the server keeps serving the next ones
+                logging.exception("Error redacting a batch of requests")
+
+    def _redact_batch(self, batch: List[RedactionRequest]):
+        redactor = self.redactor
+        try:
+            pending = []
+            for request in batch:
+                try:
+                    with redactor.collecting_stats(merge=False) as request.stats:
+                        request.redacted_text = redactor.redact_from_cache(request.text, request.flags)
+                except Exception as e:
+                    request.error = str(e)
+                if request.redacted_text is None and request.error is None:
+                    pending.append(request)
+
+            docs = {}
+            nlp_requests = [request for request in pending if redactor.needs_nlp(request.flags)]
+            if nlp_requests:
+                try:
+                    for doc, request in redactor.pipe([(r.text, r) for r in nlp_requests], self.batch_size):
+                        docs[id(request)] = doc
+                except Exception as e:
+                    # Requests without a doc are parsed one at a time by redact_content below
+                    logging.warning(f"Batched NLP failed, falling back to per-request processing: {str(e)}")
+
+            for request in pending:
+                try:
+                    with redactor.collecting_stats(merge=False) as request.stats:
+                        request.redacted_text = redactor.redact_content(request.text, request.flags,
+                                                                        docs.get(id(request)))
+                except Exception as e:
+                    request.error = str(e)
+
+            with self._lock:
+                self.batches += 1
+                for request in batch:
+                    if request.error is None:
+                        self.stats.merge(request.stats)
+        finally:
+            # Whatever went wrong, every waiting handler gets an answer and the batcher thread keeps running
+            for request in batch:
+                if request.redacted_text is None and request.error is None:
+                    request.error = "Internal error"
+                request.done.set()
+
+    def metrics(self) -> dict:
+        """
+            Health and throughput metrics of the server.
+            Returns:
+                dict: Metrics suitable for JSON output.
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests, errors, batches = self.requests, self.errors, self.batches
+            stats = self.stats.to_dict()
+
+        def percentile(fraction):
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 2) \
+                if latencies else None
+
+        return {
+            "status": "ok" if self._thread.is_alive() else "error",
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "model_tier": self.redactor.model_tier,
+            "ner_model": self.redactor.model_name,
+            "ner_model_loaded": self.redactor._nlp is not None,
+            "sentence_model_loaded": self.redactor._sentence_model is not None,
+            "requests": requests,
+            "errors": errors,
+            "batches": batches,
+            "avg_batch_size": round(requests / batches, 2) if batches else None,
+            "queue_depth": self.queue.qsize(),
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p99": percentile(0.99),
+            "stats": stats,
+        }
+
+
+class RedactionRequestHandler(BaseHTTPRequestHandler):
+    """
+        HTTP API of --serve:
+            POST /redact  {"text": "...", "names": true, "concept": ["wine"], ...}
+                          -> {"redacted": "...", "stats": {...}}
+            GET /health, GET /metrics -> server metrics
+    """
+    batcher: RedactionBatcher = None
+
+    def do_GET(self):
+        if self.path in ('/health', '/metrics'):
+            self._send_json(200, self.batcher.metrics())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/redact':
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError("Invalid Content-Length")
+            if length > SERVE_MAX_REQUEST_BYTES:
+                self._send_json(413, {"error": "Request too large"})
+                return
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+            if not isinstance(body, dict) or not isinstance(body.get('text'), str):
+                raise ValueError("Request body must be a JSON object with a string 'text'")
+            text = body.pop('text')
+            flags = flags_from_options(body)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        request = self.batcher.submit(text, flags)
+        if request.error is not None:
+            self._send_json(500, {"error": request.error})
+        else:
+            self._send_json(200, {"redacted": request.redacted_text, "stats": request.stats.to_dict()})
+
+    def _send_json(self, status: int, data: dict):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # client_address is empty on Unix sockets, so the default implementation cannot be used
+        logging.debug(format % args)
+
+
+class RedactionHTTPServer(ThreadingHTTPServer):
+    # Concurrent clients are expected; the default listen backlog of 5 resets connections under load
+    request_queue_size = 128
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def remove_socket(path: str):
+    """
+    Remove a Unix socket file left behind by an earlier server. Anything else at the path is left alone.
+
+    Args:
+        path: Path of the socket
+
+    Raises:
+        FileExistsError: If the path exists and is not a socket
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.unlink(path)
+
+
+def make_server(args: argparse.Namespace, redactor: Redactor) -> Tuple[socketserver.BaseServer, str]:
+    """
+    Create the redaction server, bound to args.socket if given, else to args.host:args.port.
+
+    Args:
+        args: Parsed command line arguments
+        redactor: The Redactor to serve with
+
+    Returns:
+        Tuple[socketserver.BaseServer, str]: The server, and the address it listens on
+    """
+    handler = type('Handler', (RedactionRequestHandler,),
+                   {'batcher': RedactionBatcher(redactor, args.serve_batch_size, args.serve_batch_wait)})
+    if args.socket:
+        remove_socket(args.socket)
+        return ThreadingUnixHTTPServer(args.socket, handler), args.socket
+    server = RedactionHTTPServer((args.host, args.port), handler)
+    return server, f"http://{args.host}:{server.server_address[1]}"
+
+
+def serve(args: argparse.Namespace, redactor: Redactor = None):
+    """
+    Run the redaction server until interrupted, on args.socket if given, else on args.host:args.port.
+
+    Args:
+        args: Parsed command line arguments
+        redactor: The Redactor to serve with; by default one is created from args
+    """
+    if redactor is None:
+        redactor = Redactor.from_args(args)
+    server, address = make_server(args, redactor)
+
+    logging.warning(f"Redaction server listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        redactor.close()
+        if args.socket:
+            remove_socket(args.socket)
+
+
+def main():
+    """
+        Parses command-line arguments, processes input files, applies redactions, and outputs results.
+    """
+    parser = setup_argparse()
+    args = parser.parse_args()
+
+    try:
+        resolve_concepts(args)
+    except (OSError, ValueError) as e:
+        logging.error(f"Error loading concepts: {str(e)}")
+        sys.exit(1)
+
+    # Validate arguments
+    if not validate_args(args):
+        sys.exit(1)
+
+    if args.merge_stats:
+        try:
+            stats_dict = merge_stats_files(args.merge_stats)
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Error merging statistics: {str(e)}")
+            sys.exit(1)
+        write_stats(stats_dict, args.stats or 'stdout')
+        return
+
+    if args.build_concept_store:
+        sentence_model = Redactor.from_args(args).sentence_model
+        if sentence_model is None:
+            sys.exit(1)
+        ConceptIndex.build(args.concept, sentence_model, quantize=args.concept_dtype == 'int8').save(
+            args.build_concept_store)
+        logging.info(f"Stored {len(args.concept)} concepts in {args.build_concept_store}")
+        return
+
+    if args.clear_cache:
+        removed = RedactionCache(args.cache_dir).clear()
+        logging.info(f"Removed {removed} cache entries from {args.cache_dir}")
+        if not args.input and not args.serve:
+            return
+
+    # Set up the Redactor before anything runs, so a bad --concept-store or --gazetteer is one clean error
+    # rather than a failure in every worker
+    try:
+        redactor = Redactor.from_args(args)
+    except (OSError, ValueError, KeyError) as e:
+        logging.error(f"Error setting up the redactor: {str(e)}")
+        sys.exit(1)
+    check_concept_store(args, redactor)
+
+    if args.serve:
+        serve(args, redactor)
+        return
+
+    if args.records:
+        try:
+            stats = redact_record_file(redactor, args)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error processing {args.input}: {str(e)}")
+            sys.exit(1)
+        finally:
+            redactor.close()
+        stats.model_tier = args.model_tier
+        stats.ner_model = args.model or MODEL_TIERS[args.model_tier]
+        if args.update_gazetteer:
+            try:
+                update_gazetteer_file(args.gazetteer, stats.gazetteer_learned)
+            except (OSError, ValueError) as e:
+                logging.error(f"Error updating gazetteer: {str(e)}")
+        if args.stats:
+            write_stats(stats.to_dict(), args.stats)
+        return
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Input files are listed lazily and consumed as the run goes, so huge trees start right away
+    input_files = iter_input_files(args.input)
+    first_file = next(input_files, None)
+    if first_file is None:
+        logging.error(f"No files found matching pattern: {args.input}")
+        sys.exit(1)
+    input_files = itertools.chain([first_file], input_files)
+    root = output_root(args)
+    if args.shard:
+        input_files = select_shard(input_files, root, *args.shard)
+
+    profiler = None
+    if args.profile_output:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    stats = RedactionStats()
+    stats.model_tier = args.model_tier
+    stats.ner_model = args.model or MODEL_TIERS[args.model_tier]
+    profiling = bool(args.profile or args.profile_output)
+    file_timings = {}
+
+    manifest = RunManifest(args.manifest, resume=args.resume) if args.manifest else None
+    resumed: List[Tuple[str, RedactionStats]] = []
+    if manifest is not None and manifest.completed:
+        def unfinished(input_paths):
+            # Files finished by the interrupted run only contribute their recorded statistics. This runs on
+            # whichever thread lists the inputs, so they are merged once the run is over
+            for input_path in input_paths:
+                recorded = manifest.resumable(input_path, output_path_for(output_dir, input_path,
+                                                                          args.compress_output, root))
+                if recorded is None:
+                    yield input_path
+                else:
+                    resumed.append((input_path, recorded))
+
+        input_files = unfinished(input_files)
+
+    run_start = time.perf_counter()
+    if args.workers > 1:
+        results = process_files_parallel(input_files, output_dir, args)
+    else:
+        results = process_files(redactor, input_files, output_dir, args)
+
+    try:
+        for input_path, file_stats in results:
+            if manifest is not None:
+                manifest.append(input_path, output_path_for(output_dir, input_path, args.compress_output, root),
+                                file_stats)
+            stats.merge(file_stats)
+            if profiling and file_stats.timings:
+                file_timings[input_path] = file_stats.timings_dict()
+    except RuntimeError as e:
+        # A worker process could not be set up
+        logging.error(str(e))
+        sys.exit(1)
+    finally:
+        redactor.close()
+        if manifest is not None:
+            manifest.close()
+    for input_path, recorded in resumed:
+        stats.merge(recorded)
+        if profiling and recorded.timings:
+            file_timings[input_path] = recorded.timings_dict()
+    if resumed:
+        logging.info(f"Resumed: {len(resumed)} files were already done")
+    run_seconds = time.perf_counter() - run_start
+    if args.update_gazetteer:
+        try:
+            update_gazetteer_file(args.gazetteer, stats.gazetteer_learned)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error updating gazetteer: {str(e)}")
+
+    if profiler is not None:
+        profiler.disable()
+        try:
+            profiler.dump_stats(args.profile_output)
+        except OSError as e:
+            logging.error(f"Error writing profile: {str(e)}")
 
     # Handle statistics output
     if args.stats:
-        stats_dict = redactor.stats.to_dict()
-        try:
-            if args.stats == 'stderr':
-                json.dump(stats_dict, sys.stderr, indent=2)
-                sys.stderr.write('\n')  # Add newline
-            elif args.stats == 'stdout':
-                json.dump(stats_dict, sys.stdout, indent=2)
-                sys.stdout.write('\n')  # Add newline
-            else:
-                with open(args.stats, 'w') as f:
-                    json.dump(stats_dict, f, indent=2)
-        except Exception as e:
-            logging.error(f"Error writing statistics: {str(e)}")
+        stats_dict = stats.to_dict()
+        if profiling:
+            stats_dict["run_seconds"] = round(run_seconds, 6)
+            stats_dict["file_timings"] = file_timings
+        write_stats(stats_dict, args.stats)
 
 
 if __name__ == "__main__":
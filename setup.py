@@ -5,7 +5,7 @@ setup(
 	version='1.0',
 	author='Arpita Patnaik',
 	authour_email='arpitapatnaik@ufl.com',
-	packages=find_packages(exclude=('tests', 'docs')),
+	packages=find_packages(exclude=('tests', 'docs', 'benchmarks')),
 	setup_requires=['pytest-runner'],
 	tests_require=['pytest']	
 )
\ No newline at end of file
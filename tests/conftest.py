@@ -1,17 +1,16 @@
 import pytest
 from pathlib import Path
-import spacy
-from redactor import Redactor
+from redactor import Redactor, MODELS, MODEL_TIERS, DEFAULT_MODEL_TIER
 
 @pytest.fixture
 def redactor():
-    """Provide a Redactor instance for testing."""
+    """Provide a Redactor instance for testing. Its models come from the shared registry, so they load once per session."""
     return Redactor()
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def nlp():
-    """Provide a spaCy model for testing."""
-    return spacy.load("en_core_web_trf")
+    """Provide the spaCy model for testing, the same instance Redactor instances use."""
+    return MODELS.spacy(MODEL_TIERS[DEFAULT_MODEL_TIER])
 
 @pytest.fixture
 def sample_text():
@@ -21,4 +20,4 @@ def sample_text():
     Contact him at john.smith@example.com or +1 (123) 456-7890.
     Meeting scheduled for January 15, 2024.
     The wine tasting event is next week.
-    """
\ No newline at end of file
+    """
@@ -1,4 +1,5 @@
 import pytest
+from redactor import AddressContext
 
 class TestAddressRedaction:
     @pytest.mark.parametrize("address", [
@@ -20,4 +21,20 @@ class TestAddressRedaction:
         # Changed assertion to verify that spans are returned
         assert spans, f"No spans found for address: {address}"
 
+    @pytest.mark.parametrize("start,end,expected", [
+        (0, 5, False),
+        (5, 11, True),
+        (25, 40, True),
+        (30, 40, False),
+    ])
+    def test_address_context_lookup(self, start, end, expected):
+        """
+        Test the lookup used to check whether a location entity is near an address pattern hit.
 
+        Args:
+            start (int): Start of the context window.
+            end (int): End of the context window.
+            expected (bool): Whether a pattern hit overlaps the window.
+        """
+        context = AddressContext([(10, 30), (12, 14)])
+        assert context.overlaps(start, end) == expected
@@ -0,0 +1,61 @@
+import pytest
+import redactor as redactor_module
+from redactor import Redactor, process_files, setup_argparse
+from test_pipeline import FakeNlp
+
+
+DOCUMENTS = ["John Smith called 352-555-1234 on 03/14/2024.\n",
+             "Nothing to see here.\n",
+             "Mary Smith wrote back.\n" * 5]
+
+
+class TestRedactionCache:
+    """Test suite for the on-disk cache of spans and statistics."""
+
+    def _run(self, tmp_path, argv, name):
+        """Redact the documents with a fresh Redactor using a counting fake NER model."""
+        args = setup_argparse().parse_args(argv)
+        redactor = Redactor.from_args(args)
+        redactor._nlp = FakeNlp()
+        output_dir = tmp_path / name
+        output_dir.mkdir()
+        paths = sorted(str(path) for path in (tmp_path / "in").iterdir())
+        stats = {path: file_stats.to_dict() for path, file_stats in process_files(redactor, paths, output_dir, args)}
+        outputs = {path.name: path.read_text() for path in output_dir.iterdir()}
+        return redactor, outputs, stats
+
+    @pytest.mark.parametrize("extra_args", [[], ["--batch-size", "2"], ["--prefetch", "2"]])
+    def test_second_run(self, tmp_path, monkeypatch, extra_args):
+        """
+        Test that a second run over the same documents is served from the cache.
+
+        Args:
+            tmp_path: Temporary directory
+            monkeypatch: pytest monkeypatch fixture
+            extra_args (list): Pipeline options
+
+        Tests:
+            - The second run gives identical outputs and statistics without running the NER model
+            - Installed package versions are looked up once per Redactor, not per document
+            - Changing a detector flag misses the cache
+        """
+        (tmp_path / "in").mkdir()
+        for i, text in enumerate(DOCUMENTS):
+            (tmp_path / "in" / f"doc{i}.txt").write_text(text)
+        lookups = []
+        package_version = redactor_module.package_version
+        monkeypatch.setattr(redactor_module, 'package_version', lambda name: lookups.append(name) or package_version(name))
+        argv = ['--names', '--phones', '--cache-dir', str(tmp_path / "cache")] + extra_args
+
+        first, outputs, stats = self._run(tmp_path, argv, "first")
+        assert first._nlp.texts > 0
+        assert "Smith" not in "".join(outputs.values()) and "352" not in "".join(outputs.values())
+        assert len(lookups) == 2
+
+        second, cached_outputs, cached_stats = self._run(tmp_path, argv, "second")
+        assert (second._nlp.texts, second._nlp.pipe_calls) == (0, 0)
+        assert cached_outputs == outputs and cached_stats == stats
+
+        changed, changed_outputs, _ = self._run(tmp_path, argv + ['--dates'], "changed")
+        assert changed._nlp.texts > 0
+        assert "03/14/2024" in outputs["doc0.censored"] and "03/14/2024" not in changed_outputs["doc0.censored"]
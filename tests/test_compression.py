@@ -0,0 +1,149 @@
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import tarfile
+from pathlib import Path
+import pytest
+from redactor import COMPRESSORS, output_path_for, process_files, read_files, setup_argparse
+
+
+TEXT = "Call 352-555-1234 today."
+WRITERS = {'': lambda path, data: path.write_bytes(data), 'gz': lambda path, data: path.write_bytes(gzip.compress(data)),
+           'bz2': lambda path, data: path.write_bytes(bz2.compress(data)),
+           'xz': lambda path, data: path.write_bytes(lzma.compress(data))}
+
+
+def make_archive(path: Path, mode: str = 'w:gz'):
+    """Write a tar archive with a plain member, a gzip-compressed member and a directory."""
+    members = {"notes/a.txt": TEXT.encode('utf-8'), "notes/b.txt.gz": gzip.compress(b"Fax 352-555-9876.")}
+    with tarfile.open(path, mode) as archive:
+        directory = tarfile.TarInfo("notes")
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+class TestCompressedInputs:
+    """Test suite for compressed input files, tar archives and compressed outputs."""
+
+    @pytest.mark.parametrize("compression", ['', 'gz', 'bz2', 'xz'])
+    def test_read_compressed(self, tmp_path, compression):
+        """
+        Test that compressed inputs are read as their decompressed text.
+
+        Args:
+            tmp_path: Temporary directory
+            compression (str): Compression extension, or '' for a plain file
+
+        Tests:
+            - The text is decompressed
+            - The recorded hash is that of the file's bytes as stored
+        """
+        path = tmp_path / ("doc.txt" + (f".{compression}" if compression else ""))
+        WRITERS[compression](path, TEXT.encode('utf-8'))
+        results = list(read_files([str(path)]))
+        assert [(p, t, e) for p, t, e, _ in results] == [(str(path), TEXT, None)]
+        assert results[0][3]["sha256"] == hashlib.sha256(path.read_bytes()).hexdigest()
+
+    @pytest.mark.parametrize("name,mode", [("docs.tar.gz", 'w:gz'), ("docs.tar", 'w'), ("docs.txz", 'w:xz')])
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_read_tar_members(self, tmp_path, name, mode, prefetch):
+        """
+        Test that tar archives are expanded into their regular members.
+
+        Args:
+            tmp_path: Temporary directory
+            name (str): Archive file name
+            mode (str): tarfile write mode
+            prefetch (int): Files read ahead
+
+        Tests:
+            - Members keep their archive order and are named <archive>::<member>
+            - Compressed members are decompressed; directories are skipped
+            - Members have no source record, as they cannot be resumed
+        """
+        archive = tmp_path / name
+        make_archive(archive, mode)
+        results = list(read_files([str(archive)], prefetch))
+        assert [(path, text) for path, text, _, _ in results] == [
+            (f"{archive}::notes/a.txt", TEXT), (f"{archive}::notes/b.txt.gz", "Fax 352-555-9876.")]
+        assert all(source is None for _, _, _, source in results)
+
+    def test_corrupt_input(self, tmp_path):
+        """
+        Test that a corrupt compressed file yields its error instead of stopping the run.
+
+        Args:
+            tmp_path: Temporary directory
+        """
+        corrupt, plain = tmp_path / "bad.txt.gz", tmp_path / "good.txt"
+        corrupt.write_bytes(b"not gzip")
+        plain.write_text(TEXT)
+        results = list(read_files([str(corrupt), str(plain)]))
+        assert results[0][1] is None and isinstance(results[0][2], OSError)
+        assert results[1][:3] == (str(plain), TEXT, None)
+
+    @pytest.mark.parametrize("input_path,compression,expected", [
+        ("in/doc.txt", None, "doc.censored"),
+        ("in/doc.txt.gz", None, "doc.censored"),
+        ("in/doc.txt.bz2", 'xz', "doc.censored.xz"),
+        ("in/docs.tar.gz::notes/b.txt.gz", 'gz', "docs/notes/b.censored.gz"),
+        ("in/docs.tar::../b.txt", None, "docs/b.censored"),
+    ])
+    def test_output_path(self, input_path, compression, expected):
+        """
+        Test output naming for compressed inputs, tar members and compressed outputs.
+
+        Args:
+            input_path (str): Input document path
+            compression (str): Output compression
+            expected (str): Expected output file name
+        """
+        assert output_path_for(Path("out"), input_path, compression) == Path("out") / expected
+
+    @pytest.mark.parametrize("extra_args", [[], ["--prefetch", "2"], ["--batch-size", "2"], ["--stream"]])
+    @pytest.mark.parametrize("compression", [None, 'gz', 'xz'])
+    def test_process_files(self, redactor, tmp_path, extra_args, compression):
+        """
+        Test redacting a compressed file and a tar archive end to end.
+
+        Args:
+            redactor: Redactor instance
+            tmp_path: Temporary directory
+            extra_args (list): Pipeline options
+            compression (str): Output compression
+
+        Tests:
+            - Every document is yielded once with its statistics
+            - Outputs are redacted, compressed as requested and no temporary files are left behind
+        """
+        input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+        input_dir.mkdir()
+        output_dir.mkdir()
+        plain = input_dir / "doc.txt.bz2"
+        WRITERS['bz2'](plain, TEXT.encode('utf-8'))
+        archive = input_dir / "docs.tgz"
+        make_archive(archive)
+        args = setup_argparse().parse_args(["--phones"] + extra_args +
+                                           (["--compress-output", compression] if compression else []))
+
+        results = list(process_files(redactor, [str(plain), str(archive)], output_dir, args))
+        assert sorted(path for path, _ in results) == sorted(
+            [str(plain), f"{archive}::notes/a.txt", f"{archive}::notes/b.txt.gz"])
+        assert all(stats.phones_count == 1 for _, stats in results)
+
+        suffix = f".{compression}" if compression else ""
+        names = sorted(str(p.relative_to(output_dir)) for p in output_dir.rglob("*") if p.is_file())
+        assert names == sorted(f"{stem}.censored{suffix}" for stem in ["doc", "docs/notes/a", "docs/notes/b"])
+        for name in names:
+            path = output_dir / name
+            if compression:
+                output = COMPRESSORS[compression](path, 'rt', encoding='utf-8').read()
+            else:
+                output = path.read_text(encoding='utf-8')
+            assert "352" not in output and output.endswith(".")
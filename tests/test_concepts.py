@@ -19,4 +19,83 @@ class TestConceptRedaction:
         if should_match:
             assert spans, f"Expected to find concept '{concept}' in text: {text}"
         else:
-            assert not spans, f"Unexpectedly found concept '{concept}' in text: {text}"
\ No newline at end of file
+            assert not spans, f"Unexpectedly found concept '{concept}' in text: {text}"
+
+class HashingEncoder:
+    """Deterministic stand-in for the sentence transformer: random unit vectors seeded by the text."""
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        import numpy as np
+
+        vectors = [np.random.default_rng(list(text.encode('utf-8')) or [0]).normal(size=32) for text in texts]
+        return np.array(vectors, dtype=np.float32)
+
+
+class TestConceptIndex:
+    """Test suite for precomputed concept embedding stores."""
+
+    @pytest.mark.parametrize("size, quantize", [(50, False), (50, True), (2000, False), (2000, True)])
+    def test_store_round_trip(self, tmp_path, size, quantize):
+        """
+        Test building, saving, loading and searching a concept store.
+
+        Args:
+            tmp_path: Temporary directory
+            size (int): Vocabulary size; 2000 is large enough to be clustered
+            quantize (bool): Whether embeddings are stored as int8
+
+        Tests:
+            - The loaded store keeps concept order and memory-maps its embeddings
+            - Searching with a concept's own embedding finds that concept
+            - int8 similarities stay close to the float32 ones
+        """
+        np = pytest.importorskip("numpy")
+        from redactor import ConceptIndex, normalize_rows
+
+        concepts = [f"concept {i}" for i in range(size)]
+        encoder = HashingEncoder()
+        ConceptIndex.build(concepts, encoder, quantize=quantize).save(tmp_path / "store")
+        store = ConceptIndex.load(tmp_path / "store")
+
+        assert store.concepts == concepts
+        assert isinstance(store.embeddings, np.memmap)
+        assert (store.centroids is not None) == (size >= 1024)
+        queries = normalize_rows(encoder.encode(concepts[::7]))
+        scores, best = store.search(queries)
+        assert [concepts[i] for i in best] == concepts[::7]
+        assert np.allclose(scores, 1, atol=0.02 if quantize else 1e-5)
+
+    def test_exact_match_order(self):
+        """
+        Test that exact matches are credited to the first listed concept, as without a store.
+        """
+        from redactor import ConceptIndex
+
+        index = ConceptIndex(["Kids", "wine", "red wine"])
+        assert index.exact_match("a glass of red wine") == "wine"
+        assert index.exact_match("the kids are asleep") == "Kids"
+        assert index.exact_match("nothing to see") is None
+
+    @pytest.mark.parametrize("concepts,matches", [(["wine", "beer"], True), (["wine"], False),
+                                                  (["beer", "wine"], False), (None, True)])
+    def test_store_mismatch(self, tmp_path, caplog, concepts, matches):
+        """
+        Test that a concept store built for other concepts than the requested ones is reported.
+
+        Args:
+            tmp_path: Temporary directory
+            caplog: pytest log capture fixture
+            concepts (list): --concept values, or None to take the store's concepts
+            matches (bool): Whether the store is used for them
+        """
+        pytest.importorskip("numpy")
+        from redactor import ConceptIndex, Redactor, check_concept_store, resolve_concepts, setup_argparse
+
+        ConceptIndex.build(["wine", "beer"], HashingEncoder()).save(tmp_path / "store")
+        argv = ['--concept-store', str(tmp_path / "store")]
+        for concept in concepts or []:
+            argv += ['--concept', concept]
+        args = setup_argparse().parse_args(argv)
+        resolve_concepts(args)
+        assert check_concept_store(args, Redactor.from_args(args)) == matches
+        assert ("--concept-store" in caplog.text) != matches
@@ -0,0 +1,150 @@
+import random
+import re
+import pytest
+from redactor import Gazetteer, PrefilteredDoc, PrefilteredEntity, setup_argparse
+from test_pipeline import FakeNlp
+
+
+class TestGazetteer:
+    """Test suite for the Aho-Corasick gazetteer of known entities."""
+
+    def test_matches_brute_force(self):
+        """
+        Test that one automaton pass finds exactly what searching for each entry does.
+
+        Tests:
+            - Overlapping entries and entries sharing prefixes and suffixes are all found
+            - Hits inside longer words are rejected
+        """
+        rng = random.Random(7)
+        entries = {''.join(rng.choices('abAB ', k=rng.randint(3, 6))).strip(): 'names' for _ in range(200)}
+        entries = {text: category for text, category in entries.items() if len(text) >= 3}
+        gazetteer = Gazetteer(entries)
+        text = ''.join(rng.choices('abAB .', k=5000))
+
+        expected = set()
+        for entry in entries:
+            for match in re.finditer(f'(?=({re.escape(entry)}))', text):
+                start, end = match.start(), match.start() + len(entry)
+                if (start == 0 or not (text[start - 1].isalnum() and text[start].isalnum())) and \
+                        (end == len(text) or not (text[end].isalnum() and text[end - 1].isalnum())):
+                    expected.add((start, end))
+        assert {(start, end) for start, end, _ in gazetteer.matches(text)} == expected
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Write to Jane Doe today", ["Jane Doe"]),
+        ("Janet Doherty is someone else", []),
+        ("jane doe in lowercase", []),
+        ("Mail jane.doe@example.com or visit 12 Elm St.", ["jane.doe@example.com", "12 Elm St"]),
+    ])
+    def test_word_boundaries(self, text, expected):
+        """
+        Test that hits are case-sensitive and end on word boundaries.
+
+        Args:
+            text (str): Text to search
+            expected (list): Expected hits
+        """
+        gazetteer = Gazetteer({"Jane Doe": "names", "jane.doe@example.com": "names", "12 Elm St": "addresses"})
+        assert [text[start:end] for start, end, _ in gazetteer.matches(text)] == expected
+
+    def test_round_trip(self, tmp_path):
+        """
+        Test saving and loading a gazetteer file.
+
+        Args:
+            tmp_path: Temporary directory
+
+        Tests:
+            - Entries keep their categories; lines without a category are names
+            - Entries that are too short or have no letters are not added
+        """
+        path = tmp_path / "known.tsv"
+        path.write_text("# known people\nJohn Smith\naddresses\t1 Main St\n\n")
+        gazetteer = Gazetteer.load(str(path))
+        assert gazetteer.entries == {"John Smith": "names", "1 Main St": "addresses"}
+        assert gazetteer.add("Mary  Major", "names")
+        assert not gazetteer.add("Jo", "names") and not gazetteer.add("12-34", "names")
+        gazetteer.save(str(path))
+        assert Gazetteer.load(str(path)).entries == gazetteer.entries
+
+        path.write_text("phones\t352-555-1234\n")
+        with pytest.raises(ValueError):
+            Gazetteer.load(str(path))
+
+    def test_recall_across_documents(self, redactor):
+        """
+        Test that a name found by NER in one document is redacted in later ones where NER missed it.
+
+        Args:
+            redactor: Redactor instance
+
+        Tests:
+            - The learned name is matched once the automaton is rebuilt
+            - Gazetteer hits count as names and are reported separately
+            - Names are not redacted unless --names is requested
+        """
+        redactor.gazetteer = Gazetteer()
+        redactor.update_gazetteer = True
+        flags = setup_argparse().parse_args(['--names'])
+        first = "Meeting with Alice Walker at noon."
+        redactor.detect_entities(first, flags, PrefilteredDoc(
+            first, [PrefilteredEntity("Alice Walker", "PERSON", 13, 25)], len(first)))
+        assert redactor.stats.gazetteer_learned == {"Alice Walker": "names"}
+
+        second = "Forwarded by Alice Walker."
+        redactor.stats.names_count = 0
+        detected = redactor.detect_entities(second, flags, PrefilteredDoc(second, [], len(second)))
+        assert detected["names_count"] == {(13, 25)}
+        assert redactor.stats.names_count == 1 and redactor.stats.gazetteer_hits == 1
+
+        phones_only = setup_argparse().parse_args(['--phones'])
+        assert "names_count" not in redactor.detect_entities(second, phones_only)
+
+    def test_stream_mode(self, redactor, tmp_path):
+        """
+        Test the gazetteer with --stream.
+
+        Args:
+            redactor: Redactor instance
+            tmp_path: Temporary directory
+
+        Tests:
+            - Names found in any window are learned
+            - Gazetteer hits in the overlap lines are counted once, as when redacting the whole file
+        """
+        input_path = tmp_path / "long.txt"
+        input_path.write_text("".join(f"Line {i}: Alice Walker met {'Mary' if i % 2 else 'John'} Smith.\n"
+                                      for i in range(12)))
+        redactor._nlp = FakeNlp()
+        redactor.update_gazetteer = True
+        flags = setup_argparse().parse_args(['--names'])
+
+        redactor.gazetteer = Gazetteer({"Alice Walker": "names"})
+        with redactor.collecting_stats() as expected:
+            redactor.redact_document(str(input_path), flags)
+
+        redactor.gazetteer = Gazetteer({"Alice Walker": "names"})
+        with redactor.collecting_stats() as streamed:
+            redactor.redact_stream(str(input_path), str(tmp_path / "long.censored"), flags, 3, 2)
+        assert streamed.gazetteer_learned == {"Mary Smith": "names", "John Smith": "names"}
+        assert streamed.gazetteer_hits == expected.gazetteer_hits == 12
+        assert streamed.names_count == expected.names_count == 24
+
+    def test_covered_hits(self, redactor):
+        """
+        Test that gazetteer hits inside detected spans, or inside longer hits, are not added again.
+
+        Args:
+            redactor: Redactor instance
+        """
+        redactor.gazetteer = Gazetteer({"Jane Doe": "names", "Mary Jane Doe": "names", "Bob Roe": "names",
+                                        "12 Elm St": "addresses"})
+        flags = setup_argparse().parse_args(['--names', '--address'])
+        text = "Dr. Jane Doe, Mary Jane Doe and Bob Roe live at 12 Elm St."
+        detected = {"names_count": {(0, 12)}, "addresses_count": set()}
+        redactor.apply_gazetteer(text, flags, detected)
+        assert sorted(text[start:end] for start, end in detected["names_count"]) == [
+            "Bob Roe", "Dr. Jane Doe", "Mary Jane Doe"]
+        assert [text[start:end] for start, end in detected["addresses_count"]] == ["12 Elm St"]
+        assert redactor.stats.gazetteer_hits == 3
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sys
+import pytest
+import redactor as redactor_module
+from redactor import RunManifest, RedactionStats, main
+
+
+class TestRunManifest:
+    """Test suite for the resumable run manifest."""
+
+    def _stats(self, phones: int, input_path=None) -> RedactionStats:
+        stats = RedactionStats()
+        stats.files_processed = 1
+        stats.phones_count = phones
+        if input_path is not None:
+            stat = os.stat(input_path)
+            stats.source = {"sha256": hashlib.sha256(input_path.read_bytes()).hexdigest(),
+                            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return stats
+
+    def test_resume(self, tmp_path):
+        """
+        Test that completed files are recognised by a resumed run.
+
+        Args:
+            tmp_path: Temporary directory
+
+        Tests:
+            - Unchanged files with an output are resumable with their recorded stats
+            - Changed inputs and missing outputs are processed again
+            - A new run without resume starts an empty manifest
+        """
+        manifest_path = tmp_path / "run.jsonl"
+        inputs = [tmp_path / f"doc{i}.txt" for i in range(3)]
+        outputs = [tmp_path / f"doc{i}.censored" for i in range(3)]
+        manifest = RunManifest(str(manifest_path))
+        for i, (input_path, output_path) in enumerate(zip(inputs, outputs)):
+            input_path.write_text(f"call 352-555-000{i}")
+            output_path.write_text("redacted")
+            manifest.append(str(input_path), output_path, self._stats(i + 1, input_path))
+        manifest.close()
+
+        inputs[1].write_text("edited since")
+        outputs[2].unlink()
+        manifest = RunManifest(str(manifest_path), resume=True)
+        assert manifest.resumable(str(inputs[0]), outputs[0]).phones_count == 1
+        assert manifest.resumable(str(inputs[1]), outputs[1]) is None
+        assert manifest.resumable(str(inputs[2]), outputs[2]) is None
+        manifest.close()
+
+        assert RunManifest(str(manifest_path)).completed == {}
+
+    @pytest.mark.parametrize("tail", ['{"path": "/tmp/x.txt", "sta', 'not json\n', '[1, 2]\n'])
+    def test_damaged_lines(self, tmp_path, tail):
+        """
+        Test resuming from a manifest whose last line was cut off or is not a record.
+
+        Args:
+            tmp_path: Temporary directory
+            tail (str): Damaged content after the valid records
+
+        Tests:
+            - Damaged lines are skipped and valid records kept
+            - Records appended after a partial line are readable
+        """
+        manifest_path = tmp_path / "run.jsonl"
+        input_path = tmp_path / "doc.txt"
+        input_path.write_text("call 352-555-0000")
+        manifest = RunManifest(str(manifest_path))
+        manifest.append(str(input_path), tmp_path / "doc.censored", self._stats(1, input_path))
+        manifest.close()
+        with open(manifest_path, 'a') as f:
+            f.write(tail)
+
+        manifest = RunManifest(str(manifest_path), resume=True)
+        assert list(manifest.completed) == [str(input_path)]
+        other_path = tmp_path / "other.txt"
+        other_path.write_text("no phones")
+        manifest.append(str(other_path), tmp_path / "other.censored", self._stats(0, other_path))
+        manifest.close()
+
+        records = RunManifest.read(manifest_path)
+        assert set(records) == {str(input_path), str(other_path)}
+        assert json.loads(manifest_path.read_text().splitlines()[-1])["stats"]["phones_redacted"] == 0
+
+    def test_resume_without_hashing(self, tmp_path, monkeypatch):
+        """
+        Test that inputs are only hashed again when their size or modification time changed.
+
+        Args:
+            tmp_path: Temporary directory
+            monkeypatch: pytest monkeypatch fixture
+
+        Tests:
+            - A file with the recorded size and modification time is resumed without reading it
+            - A touched file with unchanged content is resumed after hashing it
+            - Records without a hash are never resumed
+        """
+        manifest_path = tmp_path / "run.jsonl"
+        input_path, output_path = tmp_path / "doc.txt", tmp_path / "doc.censored"
+        input_path.write_text("call 352-555-0000")
+        output_path.write_text("redacted")
+        manifest = RunManifest(str(manifest_path))
+        manifest.append(str(input_path), output_path, self._stats(1, input_path))
+        manifest.append(str(tmp_path / "member.txt"), output_path, self._stats(1))
+        manifest.close()
+
+        hashed = []
+        file_sha256 = redactor_module.file_sha256
+        monkeypatch.setattr(redactor_module, 'file_sha256', lambda path: hashed.append(path) or file_sha256(path))
+        manifest = RunManifest(str(manifest_path), resume=True)
+        assert manifest.resumable(str(input_path), output_path).phones_count == 1
+        assert hashed == []
+
+        stat = os.stat(input_path)
+        os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert manifest.resumable(str(input_path), output_path).phones_count == 1
+        assert hashed == [str(input_path)]
+        assert manifest.resumable(str(tmp_path / "member.txt"), output_path) is None
+        manifest.close()
+
+    @pytest.mark.parametrize("extra_args", [[], ["--no-mmap"], ["--stream"], ["--batch-size", "2"],
+                                            ["--workers", "2"]])
+    def test_run_records(self, tmp_path, monkeypatch, extra_args):
+        """
+        Test the records a run writes to its manifest.
+
+        Args:
+            tmp_path: Temporary directory
+            monkeypatch: pytest monkeypatch fixture
+            extra_args (list): Pipeline options
+
+        Tests:
+            - Each file is recorded with the hash, size and modification time of its input
+            - The wall-clock seconds are recorded, and --manifest does not turn profiling on
+        """
+        input_dir = tmp_path / "in"
+        input_dir.mkdir()
+        for i in range(3):
+            (input_dir / f"doc{i}.txt").write_text(f"Call 352-555-000{i} today.\n")
+        manifest_path = tmp_path / "run.jsonl"
+        monkeypatch.setattr(sys, 'argv', ['redactor.py', '--input', str(input_dir), '--output', str(tmp_path / "out"),
+                                          '--phones', '--manifest', str(manifest_path)] + extra_args)
+        main()
+
+        records = RunManifest.read(manifest_path)
+        assert len(records) == 3
+        for path, record in records.items():
+            stat = os.stat(path)
+            with open(path, 'rb') as f:
+                assert record["sha256"] == hashlib.sha256(f.read()).hexdigest()
+            assert (record["size"], record["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)
+            assert record["seconds"] > 0
+            assert "timings" not in record["stats"]
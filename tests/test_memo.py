@@ -0,0 +1,94 @@
+import pytest
+from redactor import ParagraphMemo, RedactionStats, split_paragraphs, setup_argparse
+
+
+ORIGINAL = "Please call me back at 352-555-0147\nabout the order for Friday."
+REPLY = "Sounds good.\n\nOn Monday Mary wrote:\n> Please call me back at 352-555-0147  \n>   about the order for Friday.\n"
+
+
+class TestParagraphMemo:
+    """Test suite for paragraph-level memoization."""
+
+    def test_split_paragraphs(self):
+        """
+        Test that quoted paragraphs normalize to the original text and map back to the quote.
+
+        Tests:
+            - Quote markers, indentation and trailing whitespace are dropped
+            - A quoted block is a paragraph of its own
+            - Spans of the normalized text translate to the same characters of the document
+        """
+        paragraphs = split_paragraphs(REPLY)
+        assert [paragraph.text for paragraph in paragraphs] == ["Sounds good.", "On Monday Mary wrote:", ORIGINAL]
+        quoted = paragraphs[2]
+        for word in ["352-555-0147", "about the order", "Friday."]:
+            start = quoted.text.index(word)
+            document_start, document_end = quoted.translate(start, start + len(word))
+            assert REPLY[document_start:document_end] == word
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used paragraphs are evicted first.
+        """
+        memo = ParagraphMemo(max_entries=2)
+        keys = [ParagraphMemo.key(f"paragraph {i}", "{}") for i in range(3)]
+        memo.put(keys[0], [(0, 1)], RedactionStats())
+        memo.put(keys[1], [], RedactionStats())
+        assert memo.get(keys[0]) is not None
+        memo.put(keys[2], [], RedactionStats())
+        assert len(memo) == 2 and memo.get(keys[1]) is None and memo.get(keys[0]) is not None
+
+    @pytest.mark.parametrize("texts", [[ORIGINAL, ORIGINAL], [ORIGINAL, REPLY], [REPLY, ORIGINAL + "\n\n" + REPLY]])
+    def test_memoized_redaction(self, redactor, texts):
+        """
+        Test redacting repeated paragraphs from the memo.
+
+        Args:
+            redactor: Redactor instance
+            texts (list): Documents redacted one after another
+
+        Tests:
+            - The output and counts equal those of redacting without the memo
+            - Paragraphs seen before are memo hits
+        """
+        # Concept lines of quoted paragraphs keep their quote markers with the memo, so only unquoted ones match here
+        flags = setup_argparse().parse_args(['--phones', '--concept', 'sounds good'])
+        redactor._sentence_model_loaded = True
+        expected = [redactor.redact_content(text, flags) for text in texts]
+        expected_stats = redactor.stats.to_dict()
+
+        redactor.stats = RedactionStats()
+        redactor.paragraph_memo = ParagraphMemo()
+        assert [redactor.redact_content(text, flags) for text in texts] == expected
+        stats = redactor.stats.to_dict()
+        memo_stats = stats.pop("paragraph_memo")
+        assert stats == expected_stats
+        assert memo_stats["hits"] >= 1
+
+    def test_memo_lookups(self, redactor):
+        """
+        Test the memo statistics and concept embedding of a document with the memo on.
+
+        Args:
+            redactor: Redactor instance
+
+        Tests:
+            - Paragraphs too short to be remembered are not counted as lookups
+            - The missed paragraphs of a document share one sentence encoder call, as without the memo
+        """
+        pytest.importorskip("numpy")
+        from test_records import CountingEncoder
+
+        text = "Hi.\n\n" + "\n\n".join(f"Paragraph {i} talks about the harvest of this year." for i in range(4))
+        flags = setup_argparse().parse_args(['--phones', '--concept', 'wine'])
+        calls = []
+        for memo in [None, ParagraphMemo()]:
+            encoder = CountingEncoder()
+            redactor._sentence_model, redactor._sentence_model_loaded = encoder, True
+            redactor._concept_indexes.clear()
+            redactor.paragraph_memo = memo
+            redactor.stats = RedactionStats()
+            redactor.redact_content(text, flags)
+            calls.append(encoder.calls)
+        assert calls[0] == calls[1] == 2
+        assert (redactor.stats.memo_paragraphs, redactor.stats.memo_hits) == (4, 0)
@@ -0,0 +1,113 @@
+import gc
+import threading
+import time
+import pytest
+import redactor as redactor_module
+from redactor import ModelRegistry, Redactor, MODEL_TIERS, DEFAULT_MODEL_TIER, preload_models, setup_argparse
+
+
+class CountingLoader:
+    """Model loader that counts its calls and returns a new object per load."""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    def __call__(self, name, **options):
+        self.calls.append((name, options))
+        time.sleep(self.delay)
+        return object()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Provide an empty registry, installed as MODELS, whose models are loaded by counting loaders."""
+    registry = ModelRegistry()
+    loaders = {'spacy': CountingLoader(), 'sentence_transformer': CountingLoader()}
+    monkeypatch.setattr(redactor_module, 'MODELS', registry)
+    monkeypatch.setattr(redactor_module, 'MODEL_LOADERS', loaders)
+    return registry, loaders
+
+
+class TestModelRegistry:
+    """Test suite for the process-wide model registry."""
+
+    def test_shared_between_redactors(self, registry):
+        """
+        Test that Redactor instances share one copy of each model.
+
+        Args:
+            registry: Empty registry with counting loaders
+
+        Tests:
+            - Two Redactors of the same tier get the same pipeline, loaded once
+            - Another pipeline name is a separate model
+        """
+        registry, loaders = registry
+        first, second = Redactor(), Redactor()
+        assert first.nlp is second.nlp
+        assert first.sentence_model is second.sentence_model
+        assert len(loaders['spacy'].calls) == 1 and len(loaders['sentence_transformer'].calls) == 1
+        assert Redactor(model_tier="fast").nlp is not first.nlp
+        assert len(registry.loaded()) == 3
+
+    def test_concurrent_load(self, registry):
+        """
+        Test that threads asking for a model that is still loading wait for the one load.
+
+        Args:
+            registry: Empty registry with counting loaders
+        """
+        registry, loaders = registry
+        loaders['spacy'].delay = 0.05
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(registry.spacy("en_core_web_sm")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(loaders['spacy'].calls) == 1 and len({id(model) for model in models}) == 1
+
+    def test_warm_up_and_release(self, registry):
+        """
+        Test loading the models a run needs up front, and releasing them.
+
+        Args:
+            registry: Empty registry with counting loaders
+
+        Tests:
+            - Only the models of the requested detectors are loaded
+            - Released models are loaded again on the next use
+        """
+        registry, loaders = registry
+        redactor = Redactor()
+        redactor.warm_up(setup_argparse().parse_args(['--phones']))
+        assert registry.loaded() == []
+
+        redactor.warm_up(setup_argparse().parse_args(['--names', '--concept', 'wine']))
+        assert len(registry.loaded()) == 2
+        model = redactor.nlp
+
+        redactor.release_models()
+        assert registry.loaded() == []
+        assert redactor.nlp is not model and len(loaders['spacy'].calls) == 2
+
+    def test_preload_models(self, registry, monkeypatch):
+        """
+        Test that preloading leaves the models in the registry for forked workers to inherit.
+
+        Args:
+            registry: Empty registry with counting loaders
+            monkeypatch: pytest monkeypatch fixture
+        """
+        registry, loaders = registry
+        monkeypatch.setattr(redactor_module.multiprocessing, 'get_start_method', lambda: 'fork')
+        args = setup_argparse().parse_args(['--names', '--workers', '2', '--preload-models'])
+        try:
+            preload_models(args)
+        finally:
+            gc.unfreeze()
+        assert len(registry.loaded()) == 1
+        assert Redactor.from_args(args).nlp is registry.spacy(MODEL_TIERS[DEFAULT_MODEL_TIER])
+        assert len(loaders['spacy'].calls) == 1
@@ -1,4 +1,6 @@
+import argparse
 import pytest
+from redactor import process_files, setup_argparse
 
 class TestPhoneRedaction:
     """Test suite for testing phone number redaction functionality."""
@@ -27,3 +29,89 @@ class TestPhoneRedaction:
         spans = redactor.redact_phones(phone_number)
         assert spans == {(0, len(phone_number))}, \
             f"Failed to detect US phone number: {phone_number}"
+
+    def test_scanner_matches_detector(self, redactor):
+        """
+        Test that phone hits from the combined regex scan are counted like a direct scan.
+
+        Args:
+            redactor: Redactor instance
+        """
+        text = "Call 123-456-7890 or 123.456.7890 on 2024-01-31."
+        hits = redactor.scanner.scan(text, ['phones', 'dates', 'emails'])
+        assert hits['emails'] == []
+        assert redactor.redact_phones(text, hits) == redactor.redact_phones(text)
+        assert redactor.stats.phones_count == 2 * len(hits['phones'])
+
+    @pytest.mark.parametrize("text,scanned", [
+        ("Call 123-456-7890 on 2024-01-31 or mail a@b.com.", {'phones', 'dates', 'emails', 'addresses'}),
+        ("Due 31st December 2024, room 12.", {'phones', 'dates', 'addresses'}),
+        ("Dates like 2024年01月31日 and 1.2.2024 count.", {'phones', 'dates', 'addresses'}),
+        ("Item 3 of 5 ships on the 12th.", {'phones', 'addresses'}),
+        ("Item 3 of 5 ships soon.", {'addresses'}),
+        ("Meet in December at the office.", set()),
+    ])
+    def test_scan_signals(self, redactor, monkeypatch, text, scanned):
+        """
+        Test that scan() skips the categories whose signal a text lacks, without changing the hits.
+
+        Args:
+            redactor: Redactor instance
+            monkeypatch: pytest monkeypatch fixture
+            text (str): Text to scan
+            scanned (set): Categories whose patterns are expected to run
+        """
+        scanner = redactor.scanner
+        expected = {'phones': scanner.find_phones(text), 'dates': scanner.find_dates(text),
+                    'emails': scanner.find_emails(text), 'addresses': scanner.find_addresses(text)}
+        called = set()
+        for category, method in [('phones', 'find_phones'), ('dates', 'find_dates'), ('emails', 'find_emails'),
+                                 ('addresses', 'find_address_patterns')]:
+            original = getattr(scanner, method)
+            monkeypatch.setattr(scanner, method,
+                                lambda *args, category=category, original=original: called.add(category) or original(*args))
+        hits = scanner.scan(text, ['phones', 'dates', 'emails', 'addresses'])
+        assert called == scanned
+        assert {category: hits[category] for category in expected} == expected
+
+    @pytest.mark.parametrize("content, mapped", [
+        (b"Call 123-456-7890 or (123) 456 7890.\nFax: +1 123.456.7890\n", True),
+        (b"", True),
+        (b"No numbers here.\n", True),
+        (b"Call 123-456-7890\r\nor 123\r\n456 7890\r\n", False),
+        ("Café 123-456-7890 or ٣٥٢-555-1234\n".encode('utf-8'), False),
+        (b"Call 123\x1c456\x1c7890 now\n", False),
+    ])
+    def test_mapped_matches_document(self, redactor, tmp_path, content, mapped):
+        """
+        Test the memory-mapped fast path against regular document redaction.
+
+        Args:
+            redactor: Redactor instance
+            tmp_path: Temporary directory
+            content (bytes): File content
+            mapped (bool): Whether the fast path can take the file
+
+        Tests:
+            - ASCII files give the same output and count as redact_document()
+            - Non-ASCII and CRLF files, and files with the separators \\x1c-\\x1f that str patterns take as
+              whitespace, are left to the regular path, which redacts them like redact_document()
+        """
+        input_path = tmp_path / "input.txt"
+        input_path.write_bytes(content)
+        output_path = tmp_path / "input.censored"
+        flags = argparse.Namespace(names=False, dates=False, phones=True, address=False, concept=None)
+        assert redactor.can_redact_mapped(flags)
+
+        with redactor.collecting_stats() as mapped_stats:
+            assert redactor.redact_mapped(str(input_path), str(output_path), flags) == mapped
+        with redactor.collecting_stats() as document_stats:
+            expected = redactor.redact_document(str(input_path), flags)
+        if not mapped:
+            assert not output_path.exists()
+            (input_path.parent / "out").mkdir()
+            [(_, mapped_stats)] = process_files(redactor, [str(input_path)], input_path.parent / "out",
+                                                setup_argparse().parse_args(['--phones']))
+            output_path = input_path.parent / "out" / "input.censored"
+        assert output_path.read_text(encoding='utf-8') == expected
+        assert mapped_stats.to_dict() == document_stats.to_dict()
@@ -0,0 +1,262 @@
+import re
+import shutil
+import pytest
+from redactor import Redactor, read_files, process_files, setup_argparse
+
+
+class FakeEntity:
+    def __init__(self, label, start, end, text):
+        self.label_, self.start_char, self.end_char, self.text = label, start, end, text
+
+
+class FakeDoc:
+    def __init__(self, text, ents):
+        self.text, self.ents = text, ents
+
+
+class FakeNlp:
+    """Stand-in NER model tagging capitalized name pairs (also across a line break) and numeric dates."""
+
+    PATTERNS = [("PERSON", re.compile(r"\b(?:John|Mary)\s+Smith\b")), ("DATE", re.compile(r"\b\d\d/\d\d/\d{4}\b"))]
+
+    def __init__(self):
+        self.texts = 0
+        self.pipe_calls = 0
+
+    def __call__(self, text):
+        self.texts += 1
+        return FakeDoc(text, sorted((FakeEntity(label, m.start(), m.end(), m.group()) for label, pattern in self.PATTERNS
+                                     for m in pattern.finditer(text)), key=lambda ent: ent.start_char))
+
+    def pipe(self, items, batch_size=32, as_tuples=False):
+        self.pipe_calls += 1
+        for text, context in items:
+            yield self(text), context
+
+
+class TestFilePipeline:
+    """Test suite for the prefetching reader and background output writer."""
+
+    @pytest.mark.parametrize("prefetch", [0, 1, 4])
+    def test_read_files(self, tmp_path, prefetch):
+        """
+        Test reading files ahead of the consumer.
+
+        Args:
+            tmp_path: Temporary directory
+            prefetch (int): Files read ahead
+
+        Tests:
+            - Files are yielded in input order with their text
+            - An unreadable file yields its error instead of stopping the run
+        """
+        paths = []
+        for i in range(6):
+            path = tmp_path / f"doc{i}.txt"
+            path.write_text(f"document {i}")
+            paths.append(str(path))
+        paths.insert(3, str(tmp_path / "missing.txt"))
+
+        results = list(read_files(paths, prefetch))
+        assert [path for path, _, _, _ in results] == paths
+        assert results[3][1] is None and isinstance(results[3][2], OSError)
+        assert [text for _, text, _, _ in results if text is not None] == [f"document {i}" for i in range(6)]
+
+    @pytest.mark.parametrize("extra_args", [["--prefetch", "0"], ["--prefetch", "2"], ["--batch-size", "3"]])
+    def test_process_files(self, redactor, tmp_path, extra_args):
+        """
+        Test that the pipelined run writes every output completely.
+
+        Args:
+            redactor: Redactor instance
+            tmp_path: Temporary directory
+            extra_args (list): Pipeline options
+
+        Tests:
+            - Every file is yielded once with its statistics
+            - Outputs are redacted and no temporary files are left behind
+        """
+        input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+        input_dir.mkdir()
+        output_dir.mkdir()
+        paths = []
+        for i in range(7):
+            path = input_dir / f"doc{i}.txt"
+            path.write_text(f"Call 352-555-{1000 + i} today.")
+            paths.append(str(path))
+        args = setup_argparse().parse_args(["--phones"] + extra_args)
+
+        results = list(process_files(redactor, paths, output_dir, args))
+        assert sorted(path for path, _ in results) == paths
+        assert all(stats.phones_count == 1 for _, stats in results)
+        assert sorted(p.name for p in output_dir.iterdir()) == [f"doc{i}.censored" for i in range(7)]
+        output = (output_dir / "doc0.censored").read_text()
+        assert output.startswith("Call") and output.endswith(" today.") and "352" not in output
+
+
+class TestConcurrentScan:
+    """Test suite for running the regex scans alongside the NER parse."""
+
+    @pytest.mark.parametrize("concurrent", [True, False])
+    def test_scan_overlaps_parse(self, redactor, concurrent):
+        """
+        Test that the scans run while the model parses, with the same result as running them afterwards.
+
+        Args:
+            redactor: Redactor instance
+            concurrent (bool): Whether the scans run on the scan thread
+
+        Tests:
+            - With concurrent scanning, the scans have started before the parse finishes
+            - The spans and counts are the same either way
+        """
+        import threading
+
+        scanned = threading.Event()
+        scan = redactor.scanner.scan
+
+        def recording_scan(*args, **kwargs):
+            scanned.set()
+            return scan(*args, **kwargs)
+
+        class Doc:
+            def __init__(self, text):
+                self.text = text
+                self.ents = []
+
+        overlapped = []
+
+        def nlp(text):
+            overlapped.append(scanned.wait(timeout=1 if concurrent else 0.01))
+            return Doc(text)
+
+        redactor.scanner.scan = recording_scan
+        redactor._nlp = nlp
+        redactor.concurrent_scan = concurrent
+        text = "Call 352-555-1234 on 01/02/2024 or write to mary@example.com."
+        flags = setup_argparse().parse_args(['--names', '--dates', '--phones'])
+
+        spans = redactor.find_spans(text, flags).merged()
+        assert overlapped == [concurrent]
+        assert text[spans[0][0]:spans[0][1]].strip() == "352-555-1234"
+        assert redactor.stats.phones_count == 1 and redactor.stats.dates_count == 1
+
+
+    def test_close(self, redactor):
+        """
+        Test that close() stops the scan thread and a closed Redactor still works.
+
+        Args:
+            redactor: Redactor instance
+        """
+        redactor._nlp = FakeNlp()
+        flags = setup_argparse().parse_args(['--names', '--phones'])
+        text = "John Smith called 352-555-1234."
+        spans = redactor.find_spans(text, flags).merged()
+        threads = list(redactor._scan_executor._threads)
+        assert threads and all(thread.is_alive() for thread in threads)
+
+        redactor.close()
+        assert not any(thread.is_alive() for thread in threads)
+        assert redactor.find_spans(text, flags).merged() == spans
+        redactor.close()
+
+
+class TestBatching:
+    """Test suite for redacting documents in length-bucketed nlp.pipe batches (--batch-size)."""
+
+    @pytest.mark.parametrize("option", ["--cache-dir", "--paragraph-memo"])
+    def test_batches_match_documents(self, tmp_path, option):
+        """
+        Test that batched redaction gives the same outputs and counts as redacting each document alone.
+
+        Args:
+            tmp_path: Temporary directory
+            option (str): Reuse of earlier results the run has on: the disk cache or the paragraph memo
+
+        Tests:
+            - Documents of very different lengths, parsed in separate length buckets, are redacted alike
+            - Documents found in the cache skip nlp.pipe and report their cached counts
+            - Paragraphs repeated across documents are taken from the memo with the same counts
+        """
+        signature = "Regards,\nMary Smith\n352-555-0000"
+        texts = [f"John Smith called on 03/{i % 28 + 1:02d}/2024." + " Nothing else." * (4 ** (i % 4)) +
+                 f"\n\nCall 352-555-{1000 + i}.\n\n{signature}\n" for i in range(10)]
+        input_dir = tmp_path / "in"
+        input_dir.mkdir()
+        paths = []
+        for i, text in enumerate(texts):
+            (input_dir / f"doc{i}.txt").write_text(text)
+            paths.append(str(input_dir / f"doc{i}.txt"))
+
+        argv = ['--names', '--dates', '--phones', '--batch-size', '3']
+        if option == "--cache-dir":
+            warm = Redactor.from_args(setup_argparse().parse_args(argv + [option, str(tmp_path / "cache")]))
+            warm._nlp = FakeNlp()
+            for text in texts[::3]:
+                warm.redact_content(text, setup_argparse().parse_args(argv))
+            shutil.copytree(tmp_path / "cache", tmp_path / "reference-cache")
+            argv_reference = argv + [option, str(tmp_path / "reference-cache")]
+            argv += [option, str(tmp_path / "cache")]
+        else:
+            argv_reference = argv = argv + [option]
+
+        args = setup_argparse().parse_args(argv)
+        reference = Redactor.from_args(setup_argparse().parse_args(argv_reference))
+        reference._nlp = FakeNlp()
+        expected = {}
+        for path, text in zip(paths, texts):
+            with reference.collecting_stats() as file_stats:
+                redacted = reference.redact_content(text, args)
+            expected[path] = (redacted, file_stats.to_dict())
+
+        redactor = Redactor.from_args(args)
+        redactor._nlp = FakeNlp()
+        results = {path: (redacted, file_stats.to_dict())
+                   for path, redacted, file_stats in redactor.redact_documents(paths, args, args.batch_size)}
+        assert results == expected
+        assert all("Smith" not in redacted and "/2024" not in redacted for redacted, _ in results.values())
+        if option == "--cache-dir":
+            assert redactor._nlp.texts == len(texts) - len(texts[::3])
+            assert 1 < redactor._nlp.pipe_calls < redactor._nlp.texts
+        else:
+            assert redactor.stats.memo_hits >= len(texts) - 1
+
+
+class TestStreaming:
+    """Test suite for redacting files in line windows with --stream."""
+
+    def test_stream_matches_whole_file(self, redactor, tmp_path):
+        """
+        Test that --stream gives the same output and counts as redacting the whole file at once.
+
+        Args:
+            redactor: Redactor instance
+            tmp_path: Temporary directory
+
+        Tests:
+            - Names, phones and dates straddling window boundaries are redacted entirely
+            - Hits that two detectors found (dates from NER and the date pattern) are counted alike
+            - Entities in the overlap lines are counted by one window only
+        """
+        lines = []
+        for i in range(30):
+            if i % 4 == 2:
+                lines += ["Meeting with John\n", f"Smith on 03/{i:02d}/2024, call 352-555-{1000 + i}.\n"]
+            else:
+                lines.append(f"Line {i} mentions Mary Smith on 04/{i:02d}/2023.\n")
+        input_path = tmp_path / "long.txt"
+        input_path.write_text("".join(lines))
+        redactor._nlp = FakeNlp()
+
+        flags = setup_argparse().parse_args(['--names', '--dates', '--phones'])
+        with redactor.collecting_stats() as expected_stats:
+            expected = redactor.redact_document(str(input_path), flags)
+        assert "Smith" not in expected and "352" not in expected and "/2024" not in expected
+
+        for window, overlap in [(3, 1), (5, 2), (1, 1)]:
+            output_path = tmp_path / f"long-{window}-{overlap}.censored"
+            with redactor.collecting_stats() as stream_stats:
+                redactor.redact_stream(str(input_path), str(output_path), flags, window, overlap)
+            assert output_path.read_text() == expected
+            assert stream_stats.to_dict() == expected_stats.to_dict()
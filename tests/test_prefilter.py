@@ -0,0 +1,62 @@
+import pytest
+from redactor import NerPrefilter, PrefilteredDoc
+
+
+class TestNerPrefilter:
+    """Test suite for gating NER to candidate sentences."""
+
+    @pytest.mark.parametrize("sentence,expected", [
+        ("John went home.", True),
+        ("the report was sent to Alice.", True),
+        ("We met on Monday.", True),
+        ("it happened yesterday.", True),
+        ("Total: 42 units", True),
+        ("The weather was nice and warm.", False),
+        ("please see the attached file.", False),
+        ("----------", False),
+    ])
+    def test_is_candidate(self, sentence, expected):
+        """
+        Test the cheap signals that select sentences for NER.
+
+        Args:
+            sentence (str): Sentence to classify
+            expected (bool): Whether it should be parsed
+
+        Tests:
+            - Capitalized words other than a common sentence starter select a sentence
+            - Digits and date words select a sentence
+            - Plain lowercase prose and separators are skipped
+        """
+        assert NerPrefilter().is_candidate(sentence) == expected
+
+    def test_candidate_chunks(self):
+        """
+        Test that adjacent candidate sentences are merged and boilerplate is left out.
+        """
+        text = "the quick fox.  the lazy dog. Mr. Robert Johnson lives here. it was fine.\nCall 555-1234 today."
+        chunks = NerPrefilter().candidate_chunks(text)
+        assert [text[start:end] for start, end in chunks] == [
+            "Mr. Robert Johnson lives here.",
+            "Call 555-1234 today.",
+        ]
+
+    def test_entity_offsets(self, redactor):
+        """
+        Test that entities found in chunks are mapped back to offsets in the whole text.
+
+        Args:
+            redactor: Redactor instance
+
+        Tests:
+            - Every entity's offsets select its text in the original document
+            - The parsed fraction is recorded in the statistics
+        """
+        redactor.ner_prefilter = NerPrefilter()
+        text = "the meeting notes follow.\nthe agenda was long.\nJohn Smith flew to Paris on January 5, 2024."
+        doc = redactor.parse(text)
+
+        assert isinstance(doc, PrefilteredDoc)
+        assert doc.parsed_chars < len(text)
+        assert any(ent.label_ == 'PERSON' for ent in doc.ents)
+        assert all(text[ent.start_char:ent.end_char] == ent.text for ent in doc.ents)
@@ -0,0 +1,134 @@
+import io
+import json
+import pytest
+from redactor import Redactor, redact_records, record_fields, setup_argparse
+from test_concepts import HashingEncoder
+from test_pipeline import FakeNlp
+
+
+class CountingEncoder(HashingEncoder):
+    """HashingEncoder that counts its encode calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls += 1
+        return super().encode(texts, batch_size, convert_to_numpy)
+
+
+class TestRecordMode:
+    """Test suite for redacting fields of JSONL and CSV records."""
+
+    def _run(self, redactor, data, *extra_args):
+        args = setup_argparse().parse_args(['--input', '-', *extra_args])
+        output = io.StringIO()
+        stats = redact_records(redactor, io.StringIO(data), output, args)
+        return output.getvalue(), stats
+
+    @pytest.mark.parametrize("fields,expected", [
+        (None, ["msg", "user.bio", "tags.0"]),
+        (["user.bio", "id", "missing.path"], ["user.bio"]),
+    ])
+    def test_record_fields(self, fields, expected):
+        """
+        Test selecting the string values of a JSON record.
+
+        Args:
+            fields: Dotted paths, or None for every string value
+            expected: Names of the values found
+        """
+        record = {"id": 1, "msg": "hi", "user": {"bio": "text"}, "tags": ["a"]}
+        assert [name for _, _, name in record_fields(record, fields)] == expected
+
+    @pytest.mark.parametrize("record_batch", ["1", "2", "256"])
+    def test_jsonl(self, redactor, record_batch):
+        """
+        Test redacting JSONL records from a stream.
+
+        Args:
+            redactor: Redactor instance
+            record_batch (str): Records redacted together
+
+        Tests:
+            - Only the selected fields are redacted and records keep their order
+            - Lines that are not JSON records are dropped and counted
+        """
+        lines = [{"id": i, "msg": f"call 352-555-{i:04d}", "note": f"fax 352-555-{i:04d}"} for i in range(5)]
+        data = "\n".join(json.dumps(line) for line in lines[:3]) + "\nnot json\n\n" + \
+            "\n".join(json.dumps(line) for line in lines[3:]) + "\n"
+        output, stats = self._run(redactor, data, '--records', 'jsonl', '--phones', '--fields', 'msg',
+                                  '--record-batch', record_batch)
+
+        records = [json.loads(line) for line in output.splitlines()]
+        assert [record["id"] for record in records] == list(range(5))
+        assert all("352" not in record["msg"] and "352" in record["note"] for record in records)
+        assert stats.records_processed == 5 and stats.records_dropped == 1
+        assert stats.phones_count == 5
+
+    def test_csv(self, redactor):
+        """
+        Test redacting CSV columns, including quoted values spanning lines.
+
+        Args:
+            redactor: Redactor instance
+        """
+        data = 'id,msg,note\n1,"call 352-555-1234, ok",352-555-1111\n2,"two\nlines 352-555-2222",\n'
+        output, stats = self._run(redactor, data, '--records', 'csv', '--phones', '--fields', 'msg')
+
+        rows = output.splitlines()
+        assert rows[0] == "id,msg,note"
+        assert rows[1].endswith(",352-555-1111") and "1234" not in rows[1]
+        assert "2222" not in output
+        assert stats.records_processed == 2
+
+        with pytest.raises(ValueError):
+            self._run(redactor, data, '--records', 'csv', '--phones', '--fields', 'missing')
+
+    def test_shared_concept_embeddings(self, redactor):
+        """
+        Test that the fields of a record batch share one sentence encoder call.
+
+        Args:
+            redactor: Redactor instance
+
+        Tests:
+            - A batch makes one encoder call for its lines, besides embedding the concepts
+            - The output is the same as redacting record by record
+        """
+        pytest.importorskip("numpy")
+        data = "".join(json.dumps({"msg": f"line {i}\nsecond line {i % 3}"}) + "\n" for i in range(20))
+        outputs = {}
+        for record_batch in ["1", "20"]:
+            encoder = CountingEncoder()
+            redactor._sentence_model, redactor._sentence_model_loaded = encoder, True
+            redactor._concept_indexes.clear()
+            outputs[record_batch], _ = self._run(redactor, data, '--records', 'jsonl', '--concept', 'wine',
+                                                 '--record-batch', record_batch)
+            if record_batch == "20":
+                assert encoder.calls == 2
+        assert outputs["1"] == outputs["20"]
+
+    def test_cache(self, tmp_path):
+        """
+        Test that record fields are looked up in the --cache-dir before they are parsed.
+
+        Args:
+            tmp_path: Temporary directory
+
+        Tests:
+            - A second run over the same records gives the same output and counts without running the NER model
+            - Only fields missing from the cache are parsed
+        """
+        data = "".join(json.dumps({"msg": f"John Smith called 352-555-{1000 + i}."}) + "\n" for i in range(6))
+        argv = ['--records', 'jsonl', '--names', '--phones', '--cache-dir', str(tmp_path / "cache")]
+        runs = []
+        for text in [data, data, data + json.dumps({"msg": "Mary Smith is new."}) + "\n"]:
+            redactor = Redactor.from_args(setup_argparse().parse_args(['--input', '-', *argv]))
+            redactor._nlp = FakeNlp()
+            output, stats = self._run(redactor, text, *argv)
+            runs.append((output, stats.to_dict(), redactor._nlp.texts))
+
+        assert "Smith" not in runs[0][0] and runs[0][2] == 6
+        assert runs[1] == (runs[0][0], runs[0][1], 0)
+        assert runs[2][0].startswith(runs[0][0]) and runs[2][2] == 1
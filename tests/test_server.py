@@ -0,0 +1,173 @@
+import http.client
+import json
+import socket
+import threading
+import pytest
+import redactor as redactor_module
+from redactor import Redactor, flags_from_options, make_server, remove_socket, setup_argparse, validate_args
+from test_pipeline import FakeNlp
+
+
+@pytest.fixture
+def server(redactor):
+    """Run a redaction server on an ephemeral port, with a fake NER model; yields its port and Redactor."""
+    redactor._nlp = FakeNlp()
+    args = setup_argparse().parse_args(['--serve', '--port', '0', '--serve-batch-wait', '50'])
+    server, _ = make_server(args, redactor)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1], redactor
+    server.shutdown()
+    server.server_close()
+
+
+def request(port, method, path, body=None, headers=None):
+    """Send one request to the server and return its status and decoded JSON response."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+class TestServer:
+    """Test suite for the --serve HTTP API and its request batcher."""
+
+    def test_concurrent_requests(self, server):
+        """
+        Test that concurrent requests are redacted and answered individually.
+
+        Args:
+            server: Port and Redactor of a running server
+
+        Tests:
+            - Each response equals redacting its text alone with that request's options, statistics included
+            - The totals reported by /metrics
+        """
+        port, redactor = server
+        texts = [f"John Smith called 352-555-{1000 + i} on 03/14/2024." for i in range(12)]
+        options = [{"names": True, "phones": True} if i % 2 else {"dates": True} for i in range(12)]
+        responses = [None] * len(texts)
+
+        def send(i):
+            responses[i] = request(port, 'POST', '/redact', json.dumps({"text": texts[i], **options[i]}))
+
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(len(texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        reference = Redactor()
+        reference._nlp = FakeNlp()
+        for (status, data), text, option in zip(responses, texts, options):
+            with reference.collecting_stats() as expected_stats:
+                expected = reference.redact_content(text, flags_from_options(dict(option)))
+            assert status == 200
+            assert data == {"redacted": expected, "stats": expected_stats.to_dict()}
+        assert "Smith" not in responses[1][1]["redacted"] and "03/14/2024" not in responses[0][1]["redacted"]
+
+        status, metrics = request(port, 'GET', '/metrics')
+        assert status == 200 and metrics["status"] == "ok"
+        assert (metrics["requests"], metrics["errors"]) == (12, 0)
+        assert 1 <= metrics["batches"] <= 12 and metrics["stats"]["files_processed"] == 12
+        assert redactor._nlp.texts == 12
+
+    @pytest.mark.parametrize("body,status", [
+        ({"text": "Call 352-555-1234.", "phones": True, "faxes": True}, 400),
+        ({"text": "Call 352-555-1234."}, 400),
+        ({"text": "Call 352-555-1234.", "phones": "yes"}, 400),
+        ({"text": "Call 352-555-1234.", "concept": [1]}, 400),
+        ({"phones": True}, 400),
+        ([1, 2], 400),
+        ("not json", 400),
+    ])
+    def test_invalid_requests(self, server, body, status):
+        """
+        Test that malformed requests and options are rejected before reaching the batcher.
+
+        Args:
+            server: Port and Redactor of a running server
+            body: Request body, JSON-encoded unless it is a string
+            status (int): Expected HTTP status
+        """
+        port, _ = server
+        response_status, data = request(port, 'POST', '/redact', body if isinstance(body, str) else json.dumps(body))
+        assert response_status == status and "error" in data
+
+    def test_request_size(self, server, monkeypatch):
+        """
+        Test the Content-Length checks.
+
+        Args:
+            server: Port and Redactor of a running server
+            monkeypatch: pytest monkeypatch fixture
+
+        Tests:
+            - A negative Content-Length is rejected instead of reading until the client disconnects
+            - Bodies over SERVE_MAX_REQUEST_BYTES are refused
+            - Unknown paths are not found
+        """
+        port, _ = server
+        with socket.create_connection(('127.0.0.1', port), timeout=30) as client:
+            client.sendall(b"POST /redact HTTP/1.1\r\nHost: localhost\r\nContent-Length: -1\r\n\r\n")
+            assert client.recv(1024).startswith(b"HTTP/1.0 400")
+
+        monkeypatch.setattr(redactor_module, 'SERVE_MAX_REQUEST_BYTES', 16)
+        status, _ = request(port, 'POST', '/redact', json.dumps({"text": "Call 352-555-1234.", "phones": True}))
+        assert status == 413
+        assert request(port, 'GET', '/nowhere')[0] == 404
+
+    def test_socket_path(self, tmp_path):
+        """
+        Test that only a stale socket is removed from the --socket path.
+
+        Args:
+            tmp_path: Temporary directory
+
+        Tests:
+            - A leftover socket is removed, a missing one is ignored
+            - A regular file is refused, both by remove_socket() and by the argument checks
+        """
+        path = tmp_path / "redactor.sock"
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(path))
+        stale.close()
+        remove_socket(str(path))
+        assert not path.exists()
+        remove_socket(str(path))
+
+        path.write_text("keep me")
+        with pytest.raises(FileExistsError):
+            remove_socket(str(path))
+        assert not validate_args(setup_argparse().parse_args(['--serve', '--socket', str(path)]))
+        assert path.read_text() == "keep me"
+
+    @pytest.mark.parametrize("failing", ["redact_content", "needs_nlp"])
+    def test_unexpected_error(self, server, monkeypatch, failing):
+        """
+        Test that an unexpected error while redacting a batch answers its requests and keeps the server running.
+
+        Args:
+            server: Port and Redactor of a running server
+            monkeypatch: pytest monkeypatch fixture
+            failing (str): Redactor method that raises, inside or outside the per-request error handling
+        """
+        class Unexpected(BaseException):
+            pass
+
+        def fail(*args, **kwargs):
+            raise Unexpected()
+
+        port, redactor = server
+        monkeypatch.setattr(redactor, failing, fail)
+        body = json.dumps({"text": "John Smith called 352-555-1234.", "names": True, "phones": True})
+        status, data = request(port, 'POST', '/redact', body)
+        assert status == 500 and "error" in data
+
+        monkeypatch.undo()
+        status, data = request(port, 'POST', '/redact', body)
+        assert status == 200 and "352" not in data["redacted"]
+        assert request(port, 'GET', '/health')[1]["status"] == "ok"
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import pytest
+from redactor import (parse_shard, input_root, iter_input_files, select_shard, shard_of,
+                      merge_stats_files, process_files, setup_argparse, RedactionStats)
+
+
+class TestSharding:
+    """Test suite for input discovery, --shard partitioning and merging per-shard statistics."""
+
+    def _tree(self, root):
+        paths = []
+        for i, directory in enumerate(["", "a", "a/b", "c"] * 5):
+            (root / directory).mkdir(parents=True, exist_ok=True)
+            path = root / directory / f"doc{i}.txt"
+            path.write_text(f"document {i}")
+            paths.append(str(path))
+        return paths
+
+    def test_walk(self, tmp_path):
+        """
+        Test recursive discovery of input files.
+
+        Args:
+            tmp_path: Temporary directory
+
+        Tests:
+            - A directory yields every file below it
+            - A ** glob and its root find the same files
+        """
+        paths = self._tree(tmp_path / "tree")
+        assert sorted(iter_input_files(str(tmp_path / "tree"))) == sorted(paths)
+        pattern = str(tmp_path / "tree" / "**" / "*.txt")
+        assert sorted(iter_input_files(pattern)) == sorted(paths)
+        assert input_root(pattern) == str(tmp_path / "tree")
+
+    @pytest.mark.parametrize("count", [1, 2, 3, 7])
+    def test_partition(self, tmp_path, count):
+        """
+        Test that shards split the input into disjoint, stable slices.
+
+        Args:
+            tmp_path: Temporary directory
+            count (int): Number of shards
+
+        Tests:
+            - Every file lands in exactly one shard
+            - The same tree at another location is split the same way
+        """
+        paths = self._tree(tmp_path / "tree")
+        moved = self._tree(tmp_path / "elsewhere" / "copy")
+        shards = [list(select_shard(paths, str(tmp_path / "tree"), index, count)) for index in range(count)]
+        assert sorted(sum(shards, [])) == sorted(paths)
+        for index, shard in enumerate(shards):
+            moved_shard = select_shard(moved, str(tmp_path / "elsewhere" / "copy"), index, count)
+            assert [os.path.relpath(p, tmp_path / "elsewhere" / "copy") for p in moved_shard] == \
+                   [os.path.relpath(p, tmp_path / "tree") for p in shard]
+        assert shard_of("a/b/doc2.txt", count) == shard_of(os.path.join("a", "b", "doc2.txt"), count)
+
+    @pytest.mark.parametrize("extra_args", [[], ["--stream"], ["--names", "--batch-size", "2"]])
+    def test_mirrored_outputs(self, redactor, tmp_path, extra_args):
+        """
+        Test that outputs mirror the input tree, so inputs of the same name do not overwrite each other.
+
+        Args:
+            redactor: Redactor instance
+            tmp_path: Temporary directory
+            extra_args (list): Pipeline options
+        """
+        root, output_dir = tmp_path / "tree", tmp_path / "out"
+        for i, directory in enumerate(["a", "b"]):
+            (root / directory).mkdir(parents=True)
+            (root / directory / "x.txt").write_text(f"From {directory}: call 352-555-100{i}.")
+        args = setup_argparse().parse_args(["--input", str(root), "--phones"] + extra_args)
+
+        results = list(process_files(redactor, iter_input_files(str(root)), output_dir, args))
+        assert len(results) == 2
+        for directory in ["a", "b"]:
+            output = (output_dir / directory / "x.censored").read_text()
+            assert output.startswith(f"From {directory}:") and "352" not in output
+
+    @pytest.mark.parametrize("value,expected", [("0/1", (0, 1)), ("3/4", (3, 4)),
+                                                ("4/4", None), ("1", None), ("a/b", None), ("0/0", None)])
+    def test_parse_shard(self, value, expected):
+        """
+        Test parsing --shard values.
+
+        Args:
+            value (str): The command line value
+            expected: The parsed shard, or None if the value is invalid
+        """
+        if expected is None:
+            with pytest.raises(argparse.ArgumentTypeError):
+                parse_shard(value)
+        else:
+            assert parse_shard(value) == expected
+
+    def test_merge_stats(self, tmp_path):
+        """
+        Test combining the statistics files of several shards.
+
+        Args:
+            tmp_path: Temporary directory
+
+        Tests:
+            - Counts, concepts and stage timings are added up
+            - file_timings are combined and run_seconds is the longest run
+        """
+        paths = []
+        for i in range(3):
+            stats = RedactionStats()
+            stats.files_processed = 2
+            stats.phones_count = i
+            stats.concepts = {"wine": 1}
+            stats.model_tier = "fast"
+            stats.add_timing("nlp", 1.0, 0.5, 100)
+            data = stats.to_dict()
+            data["run_seconds"] = 10.0 + i
+            data["file_timings"] = {f"doc{i}.txt": {}}
+            path = tmp_path / f"shard{i}.json"
+            path.write_text(json.dumps(data))
+            paths.append(str(path))
+
+        merged = merge_stats_files(paths)
+        assert merged["files_processed"] == 6
+        assert merged["phones_redacted"] == 3
+        assert merged["concepts_redacted"] == {"wine": 3}
+        assert merged["model_tier"] == "fast"
+        assert merged["timings"]["nlp"]["calls"] == 3
+        assert merged["run_seconds"] == 12.0
+        assert sorted(merged["file_timings"]) == ["doc0.txt", "doc1.txt", "doc2.txt"]
@@ -0,0 +1,37 @@
+import pytest
+from redactor import RedactionSpans
+
+class TestRedactionSpans:
+    """Test suite for merging and applying redaction spans."""
+
+    @pytest.mark.parametrize("spans,expected", [
+        ([(5, 8), (0, 2)], [(0, 2), (5, 8)]),
+        ([(0, 10), (5, 15)], [(0, 15)]),
+        ([(0, 5), (5, 8)], [(0, 8)]),
+        ([(2, 4), (0, 10)], [(0, 10)]),
+        ([(3, 3)], []),
+    ])
+    def test_merge(self, spans, expected):
+        """
+        Test that spans are merged into a sorted disjoint union.
+
+        Args:
+            spans (list): Spans in detector order
+            expected (list): Expected merged spans
+
+        Tests:
+            - Unsorted input
+            - Partially overlapping spans are unioned, not truncated
+            - Touching and nested spans
+            - Empty spans are ignored
+        """
+        assert RedactionSpans(spans).merged() == expected
+
+    def test_render(self):
+        """
+        Test that overlapping spans are fully redacted in the rendered text.
+        """
+        spans = RedactionSpans()
+        spans.update({(0, 4), (2, 7)})
+        spans.add(12, 15)
+        assert spans.render("John Smith, 555 x") == "███████ith, ███ x"
@@ -0,0 +1,65 @@
+import argparse
+import pytest
+from redactor import RedactionStats
+
+class TestRedactionStats:
+    """Test suite for aggregating redaction statistics."""
+
+    def test_merge(self):
+        """
+        Test merging per-file statistics into a run total.
+
+        Tests:
+            - Category counts are summed
+            - Concept counts are summed per concept
+            - files_processed is summed
+        """
+        total = RedactionStats()
+        first = RedactionStats()
+        first.names_count = 2
+        first.concepts = {"wine": 1}
+        first.files_processed = 1
+        second = RedactionStats()
+        second.phones_count = 3
+        second.concepts = {"wine": 2, "kids": 1}
+        second.files_processed = 1
+
+        total.merge(first)
+        total.merge(second)
+
+        stats = total.to_dict()
+        assert stats["files_processed"] == 2
+        assert stats["names_redacted"] == 2
+        assert stats["phones_redacted"] == 3
+        assert stats["concepts_redacted"] == {"wine": 3, "kids": 1}
+        assert stats["total_words_redacted"] == 9
+
+    def test_timings(self, redactor):
+        """
+        Test per-stage timings recorded with profiling on.
+
+        Tests:
+            - Stages are recorded only when profiling is enabled
+            - Characters and calls are counted per stage
+            - Timings survive merging and a to_dict/from_dict round trip
+        """
+        text = "Call 352-555-1234 or 352-555-9876."
+        flags = argparse.Namespace(names=False, dates=False, phones=True, address=False, concept=None)
+
+        with redactor.collecting_stats() as unprofiled:
+            redactor.redact_content(text, flags)
+        assert unprofiled.timings == {}
+        assert "timings" not in unprofiled.to_dict()
+
+        redactor.profile = True
+        with redactor.collecting_stats() as first:
+            redactor.redact_content(text, flags)
+        assert {"scan_phones", "phones", "render"} <= set(first.timings)
+        assert first.timings["scan_phones"]["chars"] == len(text)
+
+        total = RedactionStats()
+        total.merge(first)
+        total.merge(RedactionStats.from_dict(first.to_dict()))
+        assert total.timings["render"]["calls"] == 2
+        assert total.timings["render"]["chars"] == 2 * len(text)
+        assert total.to_dict()["phones_redacted"] == 4
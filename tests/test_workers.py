@@ -0,0 +1,65 @@
+import sys
+import threading
+import pytest
+from redactor import main, process_files_parallel, setup_argparse
+
+
+class TestWorkerSetup:
+    """Test suite for setup failures of the Redactor with and without worker processes."""
+
+    def _inputs(self, tmp_path):
+        input_dir = tmp_path / "in"
+        input_dir.mkdir()
+        for i in range(3):
+            (input_dir / f"doc{i}.txt").write_text(f"Call 352-555-{1000 + i}.")
+        return input_dir
+
+    @pytest.mark.parametrize("workers", ["1", "2"])
+    @pytest.mark.parametrize("bad_option", ["concept_store", "gazetteer"])
+    def test_bad_setup_exits(self, tmp_path, monkeypatch, workers, bad_option):
+        """
+        Test that a concept store or gazetteer that cannot be loaded ends the run with an error.
+
+        Args:
+            tmp_path: Temporary directory
+            monkeypatch: pytest monkeypatch fixture
+            workers (str): Number of worker processes
+            bad_option (str): The option given an unusable file
+        """
+        input_dir = self._inputs(tmp_path)
+        argv = ['redactor.py', '--input', str(input_dir), '--output', str(tmp_path / "out"), '--phones',
+                '--workers', workers]
+        if bad_option == "concept_store":
+            argv += ['--concept', 'wine', '--concept-store', str(tmp_path / "nonexistent")]
+        else:
+            gazetteer = tmp_path / "known.tsv"
+            gazetteer.write_text("phones\t352-555-1234\n")
+            argv += ['--gazetteer', str(gazetteer)]
+        monkeypatch.setattr(sys, 'argv', argv)
+        with pytest.raises(SystemExit) as exit_info:
+            main()
+        assert exit_info.value.code == 1
+
+    def test_worker_setup_failure(self, tmp_path):
+        """
+        Test that workers which cannot set up their Redactor fail the run instead of hanging it.
+
+        Args:
+            tmp_path: Temporary directory
+        """
+        input_dir = self._inputs(tmp_path)
+        args = setup_argparse().parse_args(['--phones', '--workers', '2', '--concept', 'wine',
+                                            '--concept-store', str(tmp_path / "nonexistent")])
+        errors = []
+
+        def run():
+            try:
+                list(process_files_parallel([str(path) for path in input_dir.iterdir()], tmp_path, args))
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout=60)
+        assert not thread.is_alive()
+        assert len(errors) == 1 and "Worker setup failed" in str(errors[0])